@@ -5,8 +5,9 @@ ComfyUI Little Utility - 简单实用的自定义节点集合
 
 from .nodes.image_info_node import ImageInfoNode
 from .nodes.image_download_node import ImageDownloadNode
-from .nodes.text_combine_node import TextCombineNode
-from .nodes.text_cleanup_node import TextCleanupNode, TextCleanupAdvancedNode
+from .nodes.text_combine_node import TextCombineNode, TextCombineBatchNode
+from .nodes.text_cleanup_node import (TextCleanupNode, TextCleanupAdvancedNode, TextCleanupBatchNode,
+                                      TextCleanupAdvancedBatchNode)
 from .nodes.type_switch_node import TypeSwitchAutoNode
 from .nodes.lora_selector_node import LoraSelectorNode
 from .nodes.latent_utils import EmptyLatentImageWithFlip
@@ -14,16 +15,19 @@ from .nodes.cache_node import CacheNode
 from .nodes.workflow_save_node import WorkflowSaveNode
 
 # 導入 API 路由（這會自動註冊路由到服務器）
-from .nodes.server import lora_api
+from .nodes.server import lora_api, cache_api, prefetch_api
 
 WEB_DIRECTORY = "web"
 NODE_CLASS_MAPPINGS = {
     "ImageInfoNode": ImageInfoNode,
     "ImageDownloadNode": ImageDownloadNode,
     "TextCombineNode": TextCombineNode,
+    "TextCombineBatchNode": TextCombineBatchNode,
     "TextCleanupNode": TextCleanupNode,
     "EmptyLatentImageWithFlip": EmptyLatentImageWithFlip,
     "TextCleanupAdvancedNode": TextCleanupAdvancedNode,
+    "TextCleanupBatchNode": TextCleanupBatchNode,
+    "TextCleanupAdvancedBatchNode": TextCleanupAdvancedBatchNode,
     "TypeSwitchAutoNode": TypeSwitchAutoNode,
     "LoraSelectorNode": LoraSelectorNode,
     "CacheNode": CacheNode,
@@ -35,9 +39,12 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "ImageInfoNode": "Image Info",
     "ImageDownloadNode": "Image Download",
     "TextCombineNode": "Text Combine",
+    "TextCombineBatchNode": "Text Combine (Batch)",
     "TextCleanupNode": "Text Cleanup",
     "EmptyLatentImageWithFlip": "Empty Latent Flip",
     "TextCleanupAdvancedNode": "Text Cleanup Adv",
+    "TextCleanupBatchNode": "Text Cleanup (Batch)",
+    "TextCleanupAdvancedBatchNode": "Text Cleanup Adv (Batch)",
     "TypeSwitchAutoNode": "Type Switch",
     "LoraSelectorNode": "Lora Selector",
     "CacheNode": "Cache Node",
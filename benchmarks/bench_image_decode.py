@@ -0,0 +1,68 @@
+"""
+图片转换基准测试 - 原写法 np.array(img).astype(np.float32) / 255.0 与 pil_to_tensor 的对比
+分别测试 512px、2K、8K 图片的 float32、uint8 与锁页内存输出（没有 CUDA 时跳过锁页内存）
+原写法与测试共用 tests/test_image_decode.py 中的基准函数
+
+运行：
+    python benchmarks/bench_image_decode.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+
+from nodes.image_decode import pil_to_tensor  # noqa: E402
+from tests.test_image_decode import legacy_to_tensor  # noqa: E402
+
+
+SIZES = (("512px", (512, 512), 50), ("2K", (2048, 2048), 10), ("8K", (7680, 4320), 3))
+
+
+def bench(func, img, repeat):
+    func(img)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(img)
+    elapsed = (time.perf_counter() - start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    variants = [
+        ("原写法", legacy_to_tensor),
+        ("float32", pil_to_tensor),
+        ("uint8", lambda img: pil_to_tensor(img, "uint8")),
+    ]
+    if torch.cuda.is_available():
+        variants.append(("float32 锁页", lambda img: pil_to_tensor(img, pin_memory=True)))
+    else:
+        print("没有 CUDA，跳过锁页内存输出")
+
+    for label, (width, height), repeat in SIZES:
+        rng = np.random.default_rng(0)
+        img = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), "RGB")
+        legacy = None
+        columns = []
+        for name, func in variants:
+            result, elapsed, peak = bench(func, img, repeat)
+            if legacy is None:
+                legacy = result
+            elif result.dtype == torch.float32:
+                assert torch.equal(result, legacy)
+            columns.append(f"{name} {elapsed * 1000:8.2f} ms 峰值 {peak / 2 ** 20:7.1f} MiB")
+        print(f"{label:>6}: " + " | ".join(columns))
+
+
+if __name__ == "__main__":
+    main()
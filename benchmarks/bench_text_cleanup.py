@@ -0,0 +1,61 @@
+"""
+文字清理基準測試 - 原來的多遍 re.sub 實現與 text_cleanup_engine 的對比
+原實現與差異測試共用 tests/test_text_cleanup_engine.py 中的基準函數
+
+運行：
+    python benchmarks/bench_text_cleanup.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes.text_cleanup_engine import cleanup, cleanup_lines, cleanup_many  # noqa: E402
+from tests.test_text_cleanup_engine import legacy_cleanup, legacy_cleanup_lines  # noqa: E402
+
+
+TAGS = ["1girl", "solo", "long hair", "looking at viewer", "smile", "(masterpiece:1.2)", "best quality"]
+SEPARATORS = [", ", ",", " , ", ",, ", ",  ,", "  ", "\n", ", \n"]
+
+
+def make_prompt(tag_count, seed=0):
+    """通配符展開後的大型提示詞"""
+    rng = random.Random(seed)
+    return "".join(rng.choice(TAGS) + rng.choice(SEPARATORS) for _ in range(tag_count))
+
+
+def timed(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def report(label, legacy, current):
+    print(f"{label}: 原實現 {legacy * 1000:9.2f} ms | 新實現 {current * 1000:9.2f} ms | {legacy / current:5.1f}x")
+
+
+def main():
+    for tag_count in (20000, 40000):
+        prompt = make_prompt(tag_count)
+        assert cleanup(prompt) == legacy_cleanup(prompt)
+        size = f"{len(prompt) / 1024:.0f} KB"
+        report(f"單段提示詞 {size:>7}", timed(lambda: legacy_cleanup(prompt), 20), timed(lambda: cleanup(prompt), 20))
+
+        batch = [prompt[i:i + 400] for i in range(0, len(prompt), 400)]
+        assert cleanup_many(batch) == [legacy_cleanup(text) for text in batch]
+        report(f"批量 {len(batch):>5} 條     ", timed(lambda: [legacy_cleanup(text) for text in batch], 10),
+               timed(lambda: cleanup_many(batch), 10))
+
+        lines_text = "\n".join(batch)
+        assert cleanup_lines(lines_text) == legacy_cleanup_lines(lines_text)
+        report(f"逐行 {len(batch):>5} 行     ", timed(lambda: legacy_cleanup_lines(lines_text), 10),
+               timed(lambda: cleanup_lines(lines_text), 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+緩存磁盤層 - CacheNode 的第二級緩存
+被淘汰或明確要求持久化的條目寫入本地磁盤，重啟後可按名稱直接載入
+
+文件格式（類似 safetensors，不使用 pickle）：
+    8 字節小端無符號整數：頭部長度 N
+    N 字節 UTF-8 JSON 頭部：{"name", "created", "expires_at", "fingerprint", "value": 值結構, "tensors": [張量描述]}
+    原始張量數據，每個張量起點按 64 字節對齊
+
+值結構只支持 None/bool/int/float/str、以字符串為鍵的 dict、list、tuple 及張量，
+其他對象（如模型引用）不會寫入磁盤。讀取時以內存映射方式把張量映射回來，不做完整拷貝；
+Windows 上被映射的文件在映射釋放前無法替換或刪除，因此改為把數據段完整讀入內存。
+
+環境變量：
+    LITTLE_UTILITY_CACHE_DIR         磁盤緩存目錄（默認為本節點包下的 cache 目錄）
+    LITTLE_UTILITY_CACHE_DISK_BYTES  磁盤緩存總字節預算，超出時按最近訪問時間淘汰
+    LITTLE_UTILITY_CACHE_SPILL       設為 1 時把內存層淘汰的條目自動寫入磁盤
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import numpy as np
+    import torch
+except ImportError:
+    np = None
+    torch = None
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache")
+DEFAULT_MAX_DISK_BYTES = 32 * 1024 ** 3
+FILE_SUFFIX = ".ltc"
+ALIGNMENT = 64
+# 是否以內存映射方式載入張量（Windows 上不映射，見模塊說明）
+MEMORY_MAP = os.name != "nt"
+
+# torch dtype 名稱與 safetensors 風格代碼的對應
+DTYPE_CODES = {
+    "float64": "F64", "float32": "F32", "float16": "F16", "bfloat16": "BF16",
+    "int64": "I64", "int32": "I32", "int16": "I16", "int8": "I8", "uint8": "U8", "bool": "BOOL",
+}
+CODE_DTYPES = {code: name for name, code in DTYPE_CODES.items()}
+
+
+class UnsupportedValue(Exception):
+    """值中包含無法寫入磁盤的對象"""
+
+
+def _is_tensor(value):
+    return torch is not None and isinstance(value, torch.Tensor)
+
+
+def _encode(value, tensors):
+    """把值轉為 JSON 結構，張量放入 tensors 列表並以序號引用"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {"t": "v", "v": value}
+    if _is_tensor(value):
+        dtype = str(value.dtype).replace("torch.", "")
+        if dtype not in DTYPE_CODES:
+            raise UnsupportedValue(f"不支持的張量類型 {value.dtype}")
+        tensors.append(value)
+        return {"t": "tensor", "i": len(tensors) - 1}
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise UnsupportedValue("dict 的鍵必須是字符串")
+        return {"t": "dict", "items": [[k, _encode(v, tensors)] for k, v in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return {"t": "list" if isinstance(value, list) else "tuple", "items": [_encode(v, tensors) for v in value]}
+    raise UnsupportedValue(f"不支持的類型 {type(value).__name__}")
+
+
+def _decode(node, tensors):
+    kind = node["t"]
+    if kind == "v":
+        return node["v"]
+    if kind == "tensor":
+        return tensors[node["i"]]
+    if kind == "dict":
+        return {k: _decode(v, tensors) for k, v in node["items"]}
+    items = [_decode(v, tensors) for v in node["items"]]
+    return items if kind == "list" else tuple(items)
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class DiskTier:
+    """
+    磁盤緩存層
+    每個緩存名稱對應一個文件，文件名為名稱的 SHA1，頭部保存原始名稱
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_DISK_BYTES, spill=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """按環境變量配置創建磁盤層"""
+        try:
+            max_bytes = int(os.environ.get("LITTLE_UTILITY_CACHE_DISK_BYTES", DEFAULT_MAX_DISK_BYTES))
+        except ValueError:
+            max_bytes = DEFAULT_MAX_DISK_BYTES
+        return cls(
+            directory=os.environ.get("LITTLE_UTILITY_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_bytes=max_bytes,
+            spill=os.environ.get("LITTLE_UTILITY_CACHE_SPILL", "0") == "1",
+        )
+
+    def path_for(self, name):
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + FILE_SUFFIX)
+
+    def save(self, name, value, created=None, expires_at=None, value_fingerprint=None):
+        """
+        把值寫入磁盤（先寫臨時文件再原子替換）
+
+        返回:
+            bool: 是否寫入成功；值不支持寫盤時返回 False
+        """
+        if torch is None:
+            return False
+        tensors = []
+        try:
+            tree = _encode(value, tensors)
+        except UnsupportedValue as e:
+            print(f"[CacheDisk] 緩存 '{name}' 無法寫入磁盤: {e}")
+            return False
+
+        # 先轉為連續的 CPU 張量，計算各自的數據偏移
+        cpu_tensors = [t.detach().contiguous().cpu() for t in tensors]
+        descriptors = []
+        offset = 0
+        for original, tensor in zip(tensors, cpu_tensors):
+            offset = _align(offset)
+            size = tensor.numel() * tensor.element_size()
+            descriptors.append({
+                "dtype": DTYPE_CODES[str(tensor.dtype).replace("torch.", "")],
+                "shape": list(tensor.shape),
+                "offsets": [offset, offset + size],
+                "device": str(original.device),
+            })
+            offset += size
+
+        header = json.dumps({
+            "name": name,
+            "created": created or time.time(),
+            "expires_at": expires_at,
+            "fingerprint": value_fingerprint,
+            "value": tree,
+            "tensors": descriptors,
+        }, ensure_ascii=False).encode("utf-8")
+        # 數據段起點對齊
+        header += b" " * (_align(8 + len(header)) - 8 - len(header))
+
+        path = self.path_for(name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=FILE_SUFFIX, dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(struct.pack("<Q", len(header)))
+                    f.write(header)
+                    data_start = f.tell()
+                    for descriptor, tensor in zip(descriptors, cpu_tensors):
+                        f.seek(data_start + descriptor["offsets"][0])
+                        if tensor.numel():
+                            f.write(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except Exception as e:
+            print(f"[CacheDisk] 寫入緩存 '{name}' 失敗: {e}")
+            return False
+
+        self.enforce_budget()
+        return True
+
+    def _read_header(self, path):
+        with open(path, "rb") as f:
+            (length,) = struct.unpack("<Q", f.read(8))
+            return json.loads(f.read(length)), 8 + length
+
+    def peek(self, name):
+        """
+        只讀取頭部信息，不映射數據
+
+        返回:
+            dict 或 None: 頭部信息，不存在、已過期或讀取失敗時返回 None
+        """
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            return None
+        try:
+            header, _ = self._read_header(path)
+        except Exception:
+            return None
+        if header.get("name") != name:
+            return None
+        expires_at = header.get("expires_at")
+        if expires_at is not None and time.time() >= expires_at:
+            return None
+        return header
+
+    def load(self, name):
+        """
+        從磁盤載入緩存，張量位於 CPU，非 Windows 平台上以內存映射方式返回
+
+        返回:
+            tuple 或 None: (值, 頭部信息)，不存在、已過期或讀取失敗時返回 None
+        """
+        if torch is None:
+            return None
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            return None
+        try:
+            header, data_start = self._read_header(path)
+            if header.get("name") != name:
+                return None
+            expires_at = header.get("expires_at")
+            if expires_at is not None and time.time() >= expires_at:
+                self.remove(name)
+                return None
+
+            tensors = []
+            if header["tensors"]:
+                if MEMORY_MAP:
+                    # 寫時複製映射：可寫但不會改動文件，也避免 torch 對只讀數組的警告
+                    data = np.memmap(path, dtype=np.uint8, mode="c")[data_start:]
+                else:
+                    with open(path, "rb") as f:
+                        f.seek(data_start)
+                        data = np.frombuffer(bytearray(f.read()), dtype=np.uint8)
+                for descriptor in header["tensors"]:
+                    start, end = descriptor["offsets"]
+                    dtype = getattr(torch, CODE_DTYPES[descriptor["dtype"]])
+                    raw = torch.from_numpy(data[start:end])
+                    tensors.append(raw.view(dtype).reshape(descriptor["shape"]))
+            value = _decode(header["value"], tensors)
+            # 更新訪問時間供磁盤預算淘汰使用
+            os.utime(path)
+            return value, header
+        except Exception as e:
+            print(f"[CacheDisk] 讀取緩存 '{name}' 失敗: {e}")
+            return None
+
+    def remove(self, name):
+        """
+        刪除磁盤上的緩存文件
+
+        返回:
+            bool: 磁盤上已不存在該緩存時返回 True；文件仍在（例如被佔用）時返回 False
+        """
+        try:
+            os.remove(self.path_for(name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[CacheDisk] 刪除緩存 '{name}' 失敗: {e}")
+            return False
+        return True
+
+    def remove_matching(self, pattern):
+        """
+        刪除名稱符合通配模式（fnmatch）的磁盤緩存
+
+        返回:
+            list: 被刪除的名稱
+        """
+        removed = []
+        for name, path, _, _ in self.list_entries():
+            if fnmatch.fnmatchcase(name, pattern):
+                try:
+                    os.remove(path)
+                    removed.append(name)
+                except OSError:
+                    continue
+        return removed
+
+    def list_entries(self):
+        """
+        列出磁盤上的所有緩存
+
+        返回:
+            list: [(名稱, 文件路徑, 字節數, 最近訪問時間)]
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for item in os.scandir(self.directory):
+            if not item.name.endswith(FILE_SUFFIX) or item.name.startswith(".tmp-"):
+                continue
+            try:
+                header, _ = self._read_header(item.path)
+                st = item.stat()
+                entries.append((header.get("name", ""), item.path, st.st_size, st.st_mtime))
+            except Exception:
+                continue
+        return entries
+
+    def enforce_budget(self):
+        """磁盤緩存超出預算時按最近訪問時間淘汰最舊的文件"""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            entries = self.list_entries()
+            total = sum(size for _, _, size, _ in entries)
+            for _, path, size, _ in sorted(entries, key=lambda e: e[3]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
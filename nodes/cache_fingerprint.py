@@ -0,0 +1,92 @@
+"""
+緩存指紋 - 為緩存值計算穩定的指紋，供 CacheNode.IS_CHANGED 使用
+值未變時返回相同的指紋，ComfyUI 就能沿用下游節點的執行結果
+
+指紋模式：
+    identity  張量按 形狀/類型/設備/數據指針/步長/存儲偏移/版本計數 計算，不讀取數據；
+              緩存持有張量引用，所以相同指針一定是同一塊未被釋放的存儲；
+              步長與偏移區分同一存儲上形狀相同的不同視圖（例如方陣 x 與 x.t()）
+    sampled   張量按 形狀/類型 加等距抽樣的元素內容計算，內容相同的新張量也會得到相同指紋，
+              但抽樣點以外的改動無法察覺
+    full      張量按完整內容計算，最準確但需要讀取全部數據
+字符串與標量一律按值本身計算；其他對象（如模型引用）按對象身份計算
+"""
+
+import hashlib
+import struct
+
+
+FINGERPRINT_MODES = ("identity", "sampled", "full")
+
+# sampled 模式的抽樣元素數
+SAMPLE_ELEMENTS = 4096
+
+
+def _is_tensor(value):
+    return hasattr(value, "data_ptr") and hasattr(value, "numel") and hasattr(value, "dtype")
+
+
+def _tensor_bytes(tensor):
+    """把張量（CPU 上的連續副本）轉為原始字節"""
+    import torch
+    flat = tensor.detach().reshape(-1).contiguous().cpu()
+    return flat.view(torch.uint8).numpy().tobytes()
+
+
+def _feed(h, value, mode, seen):
+    if id(value) in seen:
+        h.update(b"<cycle>")
+        return
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        h.update(type(value).__name__.encode())
+        h.update(repr(value).encode("utf-8", "surrogatepass"))
+        return
+    if _is_tensor(value):
+        h.update(b"tensor")
+        h.update(repr((tuple(value.shape), str(value.dtype))).encode())
+        if mode == "identity":
+            h.update(repr((str(value.device), value.data_ptr(), tuple(value.stride()), value.storage_offset(),
+                           value._version)).encode())
+        elif mode == "full":
+            h.update(_tensor_bytes(value))
+        else:
+            numel = value.numel()
+            step = max(1, numel // SAMPLE_ELEMENTS)
+            h.update(struct.pack("<q", numel))
+            if numel:
+                h.update(_tensor_bytes(value.detach().reshape(-1)[::step][:SAMPLE_ELEMENTS]))
+        return
+
+    seen = seen | {id(value)}
+    if isinstance(value, dict):
+        h.update(b"dict")
+        for key, item in value.items():
+            _feed(h, key, mode, seen)
+            _feed(h, item, mode, seen)
+    elif isinstance(value, (list, tuple)):
+        h.update(type(value).__name__.encode())
+        h.update(struct.pack("<q", len(value)))
+        for item in value:
+            _feed(h, item, mode, seen)
+    else:
+        # 無法讀取內容的對象按身份計算
+        h.update(f"{type(value).__module__}.{type(value).__qualname__}@{id(value)}".encode())
+
+
+def fingerprint(value, mode="identity"):
+    """
+    計算值的指紋
+
+    參數:
+        value: 緩存值
+        mode: identity / sampled / full，見模塊說明
+
+    返回:
+        str: 十六進制指紋
+    """
+    if mode not in FINGERPRINT_MODES:
+        mode = "identity"
+    h = hashlib.blake2b(digest_size=16)
+    h.update(mode.encode())
+    _feed(h, value, mode, frozenset())
+    return h.hexdigest()
@@ -1,3 +1,10 @@
+import time
+
+from .cache_disk import DiskTier
+from .cache_fingerprint import FINGERPRINT_MODES
+from .cache_store import CacheStore
+
+
 class AnyType(str):
     """一個能與任何類型匹配的偽裝類型，解決 ComfyUI 的類型校驗問題"""
     def __ne__(self, __value: object) -> bool:
@@ -14,7 +21,10 @@ class CacheNode:
     輸出：輸入的內容或緩存的內容
     """
     
-    _cache = {}
+    # 有界緩存，預算見 cache_store 模塊說明
+    _cache = CacheStore.from_env()
+    # 磁盤層，配置見 cache_disk 模塊說明
+    _disk = DiskTier.from_env()
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -24,6 +34,9 @@ class CacheNode:
             },
             "optional": {
                 "any_input": (any_type,),
+                "ttl_seconds": ("INT", {"default": 0, "min": 0, "max": 604800, "tooltip": "緩存過期秒數，0 表示不過期"}),
+                "persist": ("BOOLEAN", {"default": False, "label_on": "寫入磁盤", "label_off": "僅內存", "tooltip": "同時把緩存寫入磁盤，重啟後仍可讀取"}),
+                "fingerprint_mode": (list(FINGERPRINT_MODES), {"default": "identity", "tooltip": "判斷緩存內容是否變化的方式，內容不變時下游節點不會重新執行"}),
             }
         }
 
@@ -32,24 +45,60 @@ class CacheNode:
     FUNCTION = "execute"
     CATEGORY = "utils"
 
-    def execute(self, cache_name, any_input=None):
+    def execute(self, cache_name, any_input=None, ttl_seconds=0, persist=False, fingerprint_mode="identity"):
         if any_input is not None:
             # 更新緩存
-            CacheNode._cache[cache_name] = any_input
+            CacheNode._cache.put(cache_name, any_input, ttl=ttl_seconds, fingerprint_mode=fingerprint_mode)
+            saved = False
+            if persist:
+                entry = CacheNode._cache.peek(cache_name)
+                saved = CacheNode._disk.save(cache_name, any_input, created=entry.created,
+                                             expires_at=entry.expires_at, value_fingerprint=entry.fingerprint)
+            # 未寫入新值時移除舊的磁盤副本，避免之後讀到過時的值
+            if not saved and not CacheNode._disk.remove(cache_name):
+                print(f"[CacheNode] 警告: 緩存 '{cache_name}' 的舊磁盤副本無法刪除，重啟後可能讀到過時的值")
             return (any_input,)
         
         # 如果輸入為空，嘗試讀取緩存
-        if cache_name in CacheNode._cache:
-            return (CacheNode._cache[cache_name],)
+        entry = CacheNode._cache.get_entry(cache_name)
+        if entry is not None:
+            return (entry.value,)
+        
+        # 內存中沒有時嘗試從磁盤層映射回來
+        loaded = CacheNode._disk.load(cache_name)
+        if loaded is not None:
+            value, header = loaded
+            expires_at = header.get("expires_at")
+            ttl = max(expires_at - time.time(), 1e-3) if expires_at else 0
+            CacheNode._cache.put(cache_name, value, ttl=ttl, value_fingerprint=header.get("fingerprint"))
+            return (value,)
         
         # 如果連緩存都沒有，返回一個空字串避開某些節點的 None 報錯
         print(f"[CacheNode] 警告: 緩存 '{cache_name}' 為空且無輸入")
         return ("",)
 
     @classmethod
-    def IS_CHANGED(cls, cache_name, any_input=None):
-        # 始終返回 nan 確保節點每次都會執行，以便讀取最新緩存
-        return float("nan")
+    def IS_CHANGED(cls, cache_name, any_input=None, ttl_seconds=0, persist=False, fingerprint_mode="identity"):
+        """
+        返回當前緩存內容的指紋，內容不變時 ComfyUI 可沿用本節點及下游節點的結果
+        連接了輸入時，上游的變化已由 ComfyUI 自身的緩存鍵反映
+        """
+        entry = cls._cache.peek(cache_name)
+        if entry is not None:
+            return f"{cache_name}:{entry.fingerprint}"
+        header = cls._disk.peek(cache_name)
+        if header is not None and header.get("fingerprint"):
+            return f"{cache_name}:{header['fingerprint']}"
+        return f"{cache_name}:<empty>"
+
+def _spill_to_disk(name, entry):
+    """內存層淘汰條目時，若啟用了溢出則寫入磁盤層"""
+    if CacheNode._disk.spill:
+        CacheNode._disk.save(name, entry.value, created=entry.created, expires_at=entry.expires_at,
+                             value_fingerprint=entry.fingerprint)
+
+
+CacheNode._cache.on_evict.append(_spill_to_disk)
 
 NODE_CLASS_MAPPINGS = {
     "CacheNode": CacheNode,
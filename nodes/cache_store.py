@@ -0,0 +1,335 @@
+"""
+緩存存儲 - CacheNode 使用的有界緩存
+支持條目數與字節預算（CPU 與 GPU 等設備上的張量分開計算）、LRU/LFU 淘汰及單條過期時間
+預算可通過環境變量配置，0 表示不限制：
+    LITTLE_UTILITY_CACHE_MAX_ENTRIES       最大條目數
+    LITTLE_UTILITY_CACHE_MAX_CPU_BYTES     CPU 內存中張量的字節預算
+    LITTLE_UTILITY_CACHE_MAX_DEVICE_BYTES  設備（GPU 等）上張量的字節預算
+    LITTLE_UTILITY_CACHE_POLICY            淘汰策略 lru 或 lfu
+"""
+
+import fnmatch
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .cache_fingerprint import fingerprint
+
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_CPU_BYTES = 8 * 1024 ** 3
+DEFAULT_MAX_DEVICE_BYTES = 4 * 1024 ** 3
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"[CacheStore] 環境變量 {name} 不是整數，使用默認值 {default}")
+        return default
+
+
+def estimate_size(value, _seen=None):
+    """
+    估算值佔用的張量內存
+
+    張量按 numel * element_size 計算並區分所在設備，
+    dict/list/tuple（例如 LATENT 的 {"samples": tensor}）遞歸累加，其他對象（如模型引用）計為 0
+
+    返回:
+        tuple: (CPU 字節數, 設備字節數)
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0, 0
+    _seen.add(id(value))
+
+    if hasattr(value, "numel") and hasattr(value, "element_size"):
+        size = value.numel() * value.element_size()
+        device = getattr(value, "device", None)
+        if device is not None and getattr(device, "type", "cpu") != "cpu":
+            return 0, size
+        return size, 0
+    if hasattr(value, "nbytes") and hasattr(value, "dtype"):
+        # numpy 數組
+        return int(value.nbytes), 0
+
+    cpu = device = 0
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return 0, 0
+    for item in items:
+        item_cpu, item_device = estimate_size(item, _seen)
+        cpu += item_cpu
+        device += item_device
+    return cpu, device
+
+
+def collect_devices(value, _seen=None):
+    """收集值中所有張量所在的設備名稱"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return set()
+    _seen.add(id(value))
+    if hasattr(value, "numel") and hasattr(value, "device"):
+        return {str(value.device)}
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return set()
+    devices = set()
+    for item in items:
+        devices |= collect_devices(item, _seen)
+    return devices
+
+
+class CacheEntry:
+    """單條緩存及其統計信息"""
+
+    __slots__ = ("value", "cpu_bytes", "device_bytes", "created", "last_access", "hits", "expires_at",
+                 "identity", "fingerprint")
+
+    def __init__(self, value, ttl=0, identity=None, fingerprint=None):
+        self.value = value
+        self.identity = identity
+        self.fingerprint = fingerprint
+        self.cpu_bytes, self.device_bytes = estimate_size(value)
+        self.created = time.time()
+        self.last_access = self.created
+        self.hits = 0
+        self.expires_at = self.created + ttl if ttl and ttl > 0 else None
+
+    def expired(self, now):
+        return self.expires_at is not None and now >= self.expires_at
+
+
+class CacheStore:
+    """
+    有界緩存
+    寫入後若超出任一預算，按淘汰策略移除其他條目；單條超出預算的新條目仍會保留
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_cpu_bytes=DEFAULT_MAX_CPU_BYTES,
+                 max_device_bytes=DEFAULT_MAX_DEVICE_BYTES, policy="lru"):
+        if policy not in EVICTION_POLICIES:
+            print(f"[CacheStore] 未知的淘汰策略 '{policy}'，改用 lru")
+            policy = "lru"
+        self.max_entries = max_entries
+        self.max_cpu_bytes = max_cpu_bytes
+        self.max_device_bytes = max_device_bytes
+        self.policy = policy
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._cpu_bytes = 0
+        self._device_bytes = 0
+        # 統計計數
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # 淘汰回調：callback(name, entry)
+        self.on_evict = []
+
+    @classmethod
+    def from_env(cls):
+        """按環境變量配置創建緩存"""
+        return cls(
+            max_entries=_env_int("LITTLE_UTILITY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+            max_cpu_bytes=_env_int("LITTLE_UTILITY_CACHE_MAX_CPU_BYTES", DEFAULT_MAX_CPU_BYTES),
+            max_device_bytes=_env_int("LITTLE_UTILITY_CACHE_MAX_DEVICE_BYTES", DEFAULT_MAX_DEVICE_BYTES),
+            policy=os.environ.get("LITTLE_UTILITY_CACHE_POLICY", "lru").lower(),
+        )
+
+    def __contains__(self, name):
+        return self.get_entry(name) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, name):
+        entry = self._entries.pop(name)
+        self._cpu_bytes -= entry.cpu_bytes
+        self._device_bytes -= entry.device_bytes
+        return entry
+
+    def _over_budget(self):
+        return ((self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_cpu_bytes and self._cpu_bytes > self.max_cpu_bytes)
+                or (self.max_device_bytes and self._device_bytes > self.max_device_bytes))
+
+    def _pick_victim(self, keep):
+        """按淘汰策略選出要移除的條目名稱"""
+        candidates = (name for name in self._entries if name != keep)
+        if self.policy == "lfu":
+            return min(candidates, key=lambda n: (self._entries[n].hits, self._entries[n].last_access), default=None)
+        # OrderedDict 按訪問順序排列，最前面的是最久未使用的
+        return next(candidates, None)
+
+    def _evict(self, name, entry):
+        for callback in self.on_evict:
+            try:
+                callback(name, entry)
+            except Exception as e:
+                print(f"[CacheStore] 淘汰回調出錯: {e}")
+
+    def _purge_expired(self):
+        now = time.time()
+        for name in [n for n, e in self._entries.items() if e.expired(now)]:
+            self._remove(name)
+            self.expirations += 1
+
+    def put(self, name, value, ttl=0, fingerprint_mode="identity", value_fingerprint=None):
+        """
+        寫入緩存並按預算淘汰
+
+        參數:
+            name: 緩存名稱
+            value: 緩存值
+            ttl: 過期秒數，0 表示不過期
+            fingerprint_mode: 指紋模式，見 cache_fingerprint 模塊說明
+            value_fingerprint: 已知的指紋（例如從磁盤層載入時），提供時不再重新計算
+        """
+        # 與舊值是同一份數據時沿用舊指紋，否則按模式重新計算（在鎖外計算）
+        identity = fingerprint(value, "identity")
+        with self._lock:
+            previous = self._entries.get(name)
+        if value_fingerprint is None:
+            if previous is not None and previous.identity == identity:
+                value_fingerprint = previous.fingerprint
+            elif fingerprint_mode == "identity":
+                value_fingerprint = identity
+            else:
+                value_fingerprint = fingerprint(value, fingerprint_mode)
+
+        evicted = []
+        with self._lock:
+            if name in self._entries:
+                self._remove(name)
+            entry = CacheEntry(value, ttl, identity, value_fingerprint)
+            self._entries[name] = entry
+            self._cpu_bytes += entry.cpu_bytes
+            self._device_bytes += entry.device_bytes
+
+            self._purge_expired()
+            while self._over_budget():
+                victim = self._pick_victim(keep=name)
+                if victim is None:
+                    print(f"[CacheStore] 警告: 緩存 '{name}' 單獨超出預算")
+                    break
+                evicted.append((victim, self._remove(victim)))
+                self.evictions += 1
+        # 在鎖外執行回調，避免寫盤等操作阻塞其他讀寫
+        for victim, victim_entry in evicted:
+            self._evict(victim, victim_entry)
+
+    def get_entry(self, name):
+        """獲取未過期的緩存條目並更新訪問統計，不存在時返回 None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if entry.expired(now):
+                self._remove(name)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.last_access = now
+            entry.hits += 1
+            self._entries.move_to_end(name)
+            return entry
+
+    def get(self, name, default=None):
+        entry = self.get_entry(name)
+        return default if entry is None else entry.value
+
+    def peek(self, name):
+        """獲取未過期的緩存條目，不更新訪問統計，不存在時返回 None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.expired(time.time()):
+                return None
+            return entry
+
+    def pop(self, name):
+        """移除緩存，返回被移除的條目或 None"""
+        with self._lock:
+            if name not in self._entries:
+                return None
+            return self._remove(name)
+
+    def usage(self):
+        """
+        返回:
+            tuple: (條目數, CPU 字節數, 設備字節數)
+        """
+        with self._lock:
+            return len(self._entries), self._cpu_bytes, self._device_bytes
+
+    def remove_matching(self, pattern):
+        """
+        移除名稱符合通配模式（fnmatch）的所有緩存
+
+        返回:
+            list: 被移除的名稱
+        """
+        with self._lock:
+            names = [name for name in self._entries if fnmatch.fnmatchcase(name, pattern)]
+            for name in names:
+                self._remove(name)
+            return names
+
+    def stats(self):
+        """
+        返回:
+            dict: 命中、未命中、淘汰、過期計數及當前用量與預算
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "cpu_bytes": self._cpu_bytes,
+                "device_bytes": self._device_bytes,
+                "max_entries": self.max_entries,
+                "max_cpu_bytes": self.max_cpu_bytes,
+                "max_device_bytes": self.max_device_bytes,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def describe(self):
+        """
+        返回:
+            list: 每條緩存的名稱、大小、設備、訪問時間等信息（按最近訪問排序）
+        """
+        with self._lock:
+            items = list(self._entries.items())
+        now = time.time()
+        return [{
+            "name": name,
+            "type": type(entry.value).__name__,
+            "cpu_bytes": entry.cpu_bytes,
+            "device_bytes": entry.device_bytes,
+            "devices": sorted(collect_devices(entry.value)),
+            "created": entry.created,
+            "last_access": entry.last_access,
+            "hits": entry.hits,
+            "expires_at": entry.expires_at,
+            "expired": entry.expired(now),
+            "fingerprint": entry.fingerprint,
+        } for name, entry in reversed(items)]
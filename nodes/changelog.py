@@ -0,0 +1,64 @@
+"""
+變動記錄 - 帶版本號的有界變動日誌
+供 Lora 目錄與觸發詞存儲生成 ETag 及增量同步（?since=<version>）使用
+"""
+
+import time
+from collections import deque
+
+
+# 默認保留的變動記錄條數，客戶端版本早於最舊記錄時改為返回完整數據
+MAX_CHANGELOG = 10000
+
+
+class Changelog:
+    """
+    有界變動日誌
+    版本標記形如 "<epoch>.<版本號>"，epoch 為進程啟動標識，保證重啟後舊版本號不會被誤認
+    """
+
+    def __init__(self, max_records=MAX_CHANGELOG):
+        self.epoch = format(time.time_ns(), "x")
+        self.version = 0
+        self._max_records = max_records
+        self._records = deque()
+        # 已被淘汰記錄中的最高版本號
+        self._floor = 0
+
+    @property
+    def token(self):
+        """當前版本標記"""
+        return f"{self.epoch}.{self.version}"
+
+    def record(self, changes):
+        """
+        記錄一批變動，版本號加一
+
+        參數:
+            changes: 變動列表，元素格式由調用方決定
+        """
+        if not changes:
+            return
+        self.version += 1
+        for change in changes:
+            self._records.append((self.version, change))
+        while len(self._records) > self._max_records:
+            self._floor = self._records.popleft()[0]
+
+    def since(self, token):
+        """
+        獲取指定版本之後的所有變動
+
+        參數:
+            token: 客戶端持有的版本標記
+
+        返回:
+            list 或 None: 按順序排列的變動；版本無效或記錄已被淘汰時返回 None
+        """
+        head, _, tail = (token or "").partition(".")
+        if head != self.epoch or not tail.isdigit():
+            return None
+        base = int(tail)
+        if base > self.version or base < self._floor:
+            return None
+        return [change for version, change in self._records if version > base]
@@ -0,0 +1,288 @@
+"""
+HTTP 响应缓存 - ImageDownloadNode 使用的本地内容缓存
+按 URL 保存原始字节及 ETag/Last-Modified 验证器：
+    TTL 内直接返回缓存，不访问网络
+    超过 TTL 后发送条件请求，服务器返回 304 时沿用缓存
+    网络不可用或处于离线模式时返回已有缓存
+总大小超出上限时按最近访问时间淘汰
+
+每个 URL 对应两个文件：<sha256>.bin 保存内容，<sha256>.json 保存元数据
+
+环境变量：
+    LITTLE_UTILITY_HTTP_CACHE_DIR    缓存目录（默认为本节点包下的 cache/http 目录）
+    LITTLE_UTILITY_HTTP_CACHE_BYTES  缓存总字节上限，0 表示不限制
+    LITTLE_UTILITY_HTTP_CACHE_TTL    缓存视为新鲜的秒数，超过后需重新验证
+    LITTLE_UTILITY_HTTP_OFFLINE      设为 1 时只读取缓存，不访问网络
+    LITTLE_UTILITY_HTTP_MAX_BYTES    单个响应的字节上限，超出时中止下载，0 表示不限制
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cache", "http")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_RESPONSE_BYTES = 64 * 1024 ** 2
+
+# 流式读取响应的块大小
+CHUNK_SIZE = 256 * 1024
+
+# 缓存模式
+CACHE_MODES = ("enabled", "offline", "bypass")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"[HttpCache] 环境变量 {name} 不是整数，使用默认值 {default}")
+        return default
+
+
+def _atomic_write(path, data):
+    """先写入同目录的临时文件，再原子替换目标文件"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class CacheMiss(Exception):
+    """离线模式下缓存中没有对应的 URL"""
+
+
+class ResponseTooLarge(Exception):
+    """响应超出字节上限"""
+
+
+def read_limited(response, max_bytes):
+    """
+    分块读取流式响应，超出上限时立即中止
+
+    参数:
+        response: 以 stream=True 发出的 requests 响应
+        max_bytes: 字节上限，0 表示不限制
+
+    返回:
+        bytes: 响应内容
+
+    异常:
+        ResponseTooLarge: 声明的或实际读取的长度超出上限
+    """
+    try:
+        if max_bytes:
+            try:
+                declared = int(response.headers.get("Content-Length", 0))
+            except ValueError:
+                declared = 0
+            if declared > max_bytes:
+                raise ResponseTooLarge(f"响应大小 {declared} 字节超出上限 {max_bytes}")
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                raise ResponseTooLarge(f"响应大小超出上限 {max_bytes} 字节")
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        response.close()
+
+
+class HttpCache:
+    """
+    按 URL 保存响应内容的磁盘缓存
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, offline=False,
+                 max_response_bytes=DEFAULT_MAX_RESPONSE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        self.max_response_bytes = max_response_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """按环境变量配置创建缓存"""
+        return cls(
+            directory=os.environ.get("LITTLE_UTILITY_HTTP_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_bytes=_env_int("LITTLE_UTILITY_HTTP_CACHE_BYTES", DEFAULT_MAX_BYTES),
+            ttl=_env_int("LITTLE_UTILITY_HTTP_CACHE_TTL", DEFAULT_TTL),
+            offline=os.environ.get("LITTLE_UTILITY_HTTP_OFFLINE", "0") == "1",
+            max_response_bytes=_env_int("LITTLE_UTILITY_HTTP_MAX_BYTES", DEFAULT_MAX_RESPONSE_BYTES),
+        )
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".bin", base + ".json"
+
+    def lookup(self, url):
+        """
+        读取缓存
+
+        返回:
+            tuple 或 None: (内容字节, 元数据)，不存在或读取失败时返回 None
+        """
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("url") != url:
+                return None
+            with open(data_path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if len(data) != meta.get("size"):
+            return None
+        # 更新访问时间供 LRU 淘汰使用
+        try:
+            os.utime(data_path)
+        except OSError:
+            pass
+        return data, meta
+
+    def is_fresh(self, meta):
+        """缓存是否仍在 TTL 内"""
+        return self.ttl > 0 and time.time() - meta.get("fetched", 0) < self.ttl
+
+    def store(self, url, data, etag=None, last_modified=None):
+        """保存响应内容及验证器"""
+        data_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched": time.time(),
+            "size": len(data),
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # 先写内容再写元数据，元数据的 size 与内容不符时视为无效缓存
+            _atomic_write(data_path, data)
+            _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        except Exception as e:
+            print(f"[HttpCache] 写入缓存失败: {e}, URL: {url}")
+            return
+        self.enforce_budget()
+
+    def touch(self, url, meta):
+        """重新验证成功（304）后刷新获取时间"""
+        _, meta_path = self._paths(url)
+        meta = dict(meta, fetched=time.time())
+        try:
+            _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        except Exception as e:
+            print(f"[HttpCache] 更新缓存元数据失败: {e}, URL: {url}")
+
+    def enforce_budget(self):
+        """缓存超出上限时按最近访问时间淘汰最旧的条目"""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            entries = []
+            try:
+                items = list(os.scandir(self.directory))
+            except OSError:
+                return
+            for item in items:
+                if not item.name.endswith(".bin") or item.name.startswith(".tmp-"):
+                    continue
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, item.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for victim in (path, path[:-len(".bin")] + ".json"):
+                    try:
+                        os.remove(victim)
+                    except OSError:
+                        pass
+                total -= size
+
+    def fetch(self, session, url, headers=None, mode="enabled", **kwargs):
+        """
+        通过缓存获取 URL 内容
+
+        参数:
+            session: requests.Session（或提供相同 get 接口的对象）
+            url: 请求地址
+            headers: 请求头
+            mode: enabled 使用缓存；offline 只读缓存；bypass 不读也不写缓存
+            **kwargs: 传给 session.get 的其他参数（timeout、proxies 等）
+
+        返回:
+            bytes: 响应内容，以流式分块读取并受 max_response_bytes 限制
+
+        异常:
+            CacheMiss: 离线且没有缓存
+            ResponseTooLarge: 响应超出字节上限
+            其他网络或 HTTP 错误（有缓存时不会抛出）
+        """
+        headers = dict(headers or {})
+        if mode == "bypass":
+            response = session.get(url, headers=headers, stream=True, **kwargs)
+            if not response.ok:
+                response.close()
+            response.raise_for_status()
+            return read_limited(response, self.max_response_bytes)
+
+        cached = self.lookup(url)
+        if mode == "offline" or self.offline:
+            if cached is None:
+                raise CacheMiss(f"离线模式下没有缓存: {url}")
+            return cached[0]
+        if cached is not None and self.is_fresh(cached[1]):
+            return cached[0]
+
+        if cached is not None:
+            meta = cached[1]
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = session.get(url, headers=headers, stream=True, **kwargs)
+            if cached is not None and response.status_code == 304:
+                response.close()
+                self.touch(url, cached[1])
+                return cached[0]
+            if not response.ok:
+                response.close()
+            response.raise_for_status()
+            content = read_limited(response, self.max_response_bytes)
+        except ResponseTooLarge:
+            raise
+        except Exception as e:
+            if cached is None:
+                raise
+            print(f"[HttpCache] 请求失败，使用缓存: {e}, URL: {url}")
+            return cached[0]
+
+        self.store(url, content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return content
+
+
+# 进程内共享的响应缓存
+http_cache = HttpCache.from_env()
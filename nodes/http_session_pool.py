@@ -0,0 +1,113 @@
+"""
+HTTP 会话池 - 按代理复用 requests.Session，保留 TCP/TLS 连接
+同一主机（如 pximg.net、twimg.com）的连续请求无需重复握手
+
+环境变量：
+    LITTLE_UTILITY_HTTP_POOL_CONNECTIONS  每个会话缓存的主机连接池数量
+    LITTLE_UTILITY_HTTP_POOL_MAXSIZE      每个主机保留的最大连接数（即同一主机的最大并发）
+    LITTLE_UTILITY_HTTP_KEEPALIVE         会话空闲超过此秒数后关闭重建，0 表示不限制
+"""
+
+import atexit
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_POOL_CONNECTIONS = 16
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_KEEPALIVE = 120
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"[HttpSessionPool] 环境变量 {name} 不是整数，使用默认值 {default}")
+        return default
+
+
+class HttpSessionPool:
+    """
+    按代理分组的会话池，经不同代理的连接互不混用
+    requests.Session 底层的 urllib3 连接池是线程安全的，多个节点并发执行时可共享同一会话
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 keepalive=DEFAULT_KEEPALIVE):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        # 代理 -> [会话, 最近使用时间]
+        self._sessions = {}
+
+    @classmethod
+    def from_env(cls):
+        """按环境变量配置创建会话池"""
+        return cls(
+            pool_connections=_env_int("LITTLE_UTILITY_HTTP_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS),
+            pool_maxsize=_env_int("LITTLE_UTILITY_HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE),
+            keepalive=_env_int("LITTLE_UTILITY_HTTP_KEEPALIVE", DEFAULT_KEEPALIVE),
+        )
+
+    def _create_session(self, proxy):
+        session = requests.Session()
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+        # 同一适配器同时挂载 http 与 https，共用连接池
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              max_retries=retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, proxy=""):
+        """
+        获取指定代理对应的会话，不存在或空闲过久时创建新会话
+
+        参数:
+            proxy: 代理地址，空字符串表示直连
+
+        返回:
+            requests.Session: 共享会话，调用方不应关闭；代理仍需在每次请求时通过 proxies 传入
+            （会话级 proxies 会被环境变量中的代理覆盖）
+        """
+        proxy = (proxy or "").strip()
+        now = time.time()
+        stale = None
+        with self._lock:
+            item = self._sessions.get(proxy)
+            if item is not None and self.keepalive and now - item[1] > self.keepalive:
+                # 空闲过久的连接多半已被服务器断开，直接换新会话
+                stale = item[0]
+                item = None
+            if item is None:
+                item = [self._create_session(proxy), now]
+                self._sessions[proxy] = item
+            item[1] = now
+            session = item[0]
+        if stale is not None:
+            stale.close()
+        return session
+
+    def close(self):
+        """关闭所有会话及其连接"""
+        with self._lock:
+            sessions = [item[0] for item in self._sessions.values()]
+            self._sessions = {}
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+
+# 进程内共享的会话池
+http_session_pool = HttpSessionPool.from_env()
+
+# 退出时关闭所有连接
+atexit.register(http_session_pool.close)
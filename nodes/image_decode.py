@@ -0,0 +1,48 @@
+"""
+图片转换 - 将 PIL 图片转为 ComfyUI 的 IMAGE 张量
+
+原写法 np.array(img).astype(np.float32) / 255.0 会产生三份完整大小的数组（uint8 副本、float32 副本、除法结果），
+这里在一次运算中把 uint8 像素直接写入预先分配的 float32 张量，可选分配在锁页内存中以加快之后拷贝到 GPU，
+也可以直接输出 uint8 张量供接受该类型的下游节点使用
+"""
+
+import numpy as np
+import torch
+
+
+OUTPUT_DTYPES = ("float32", "uint8")
+
+
+def _pin_available():
+    return torch.cuda.is_available()
+
+
+def pil_to_tensor(img, dtype="float32", pin_memory=False):
+    """
+    将 RGB PIL 图片转为 [H, W, C] 张量
+
+    参数:
+        img: RGB 模式的 PIL 图片
+        dtype: float32 输出 [0, 1] 范围的浮点张量；uint8 输出原始像素值
+        pin_memory: 是否把结果分配在锁页内存中（没有 CUDA 时忽略）
+
+    返回:
+        torch.Tensor: [H, W, C] 张量
+    """
+    # 只读视图，直接引用 PIL 导出的像素缓冲区
+    pixels = np.asarray(img)
+    np_dtype = np.uint8 if dtype == "uint8" else np.float32
+
+    if pin_memory and _pin_available():
+        out = torch.empty(pixels.shape, dtype=getattr(torch, dtype), pin_memory=True)
+        out_np = out.numpy()
+    else:
+        out_np = np.empty(pixels.shape, dtype=np_dtype)
+        out = torch.from_numpy(out_np)
+
+    if np_dtype is np.uint8:
+        np.copyto(out_np, pixels)
+    else:
+        # 读取 uint8 并写入 float32 在同一次运算中完成，与 astype(np.float32) / 255.0 的结果逐位一致
+        np.divide(pixels, np.float32(255.0), out=out_np)
+    return out
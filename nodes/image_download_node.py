@@ -1,18 +1,235 @@
+import hashlib
+import math
+import os
+import threading
 import torch
-import numpy as np
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from PIL import Image, ImageOps
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .cache_store import CacheStore
+from .http_cache import CACHE_MODES, http_cache
+from .http_session_pool import http_session_pool
+from .image_decode import OUTPUT_DTYPES, pil_to_tensor
+
+# 多 URL 下载的并发上限：总线程数与同一主机的并发数
+MAX_DOWNLOAD_WORKERS = 8
+MAX_PER_HOST = 4
+
+# 尺寸不一致时的对齐方式
+SIZE_POLICIES = ("resize", "pad", "crop")
+
+# 解码后的像素数上限，超出时在解码过程中按比例缩小；可通过 LITTLE_UTILITY_DOWNLOAD_MAX_PIXELS 配置
+MAX_PIXELS = 8192 * 8192
+
+# Image.reduce 能直接按像素平均的模式，其余模式（P、1、I;16 等）需先转换
+REDUCIBLE_MODES = ("RGB", "RGBA", "RGBX", "L", "LA", "I", "F", "CMYK")
+
+# 已解码图片的内存缓存，按内容哈希索引；字节预算可通过 LITTLE_UTILITY_DECODE_CACHE_BYTES 配置
+DECODE_CACHE_BYTES = 1024 ** 3
+DECODE_CACHE_ENTRIES = 256
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+_max_pixels = _env_int("LITTLE_UTILITY_DOWNLOAD_MAX_PIXELS", MAX_PIXELS)
+_decoded = CacheStore(max_entries=DECODE_CACHE_ENTRIES,
+                      max_cpu_bytes=_env_int("LITTLE_UTILITY_DECODE_CACHE_BYTES", DECODE_CACHE_BYTES),
+                      max_device_bytes=0)
+
+# 每个主机一个信号量，限制同一主机的并发连接
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+def _host_slot(url):
+    host = urlsplit(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return slot
+
+
+def map_urls(func, urls):
+    """
+    对每个 URL 调用 func，多个 URL 时在线程池中并发执行（总线程数不超过 MAX_DOWNLOAD_WORKERS）
+
+    返回:
+        list: 与 urls 顺序一致的结果
+    """
+    if len(urls) == 1:
+        return [func(urls[0])]
+    with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOAD_WORKERS, len(urls))) as executor:
+        return list(executor.map(func, urls))
+
+
+def parse_urls(url):
+    """
+    解析 URL 输入，支持换行分隔的多个 URL 或列表
+
+    返回:
+        list: 去除空行后的 URL 列表（保持顺序）
+    """
+    if isinstance(url, (list, tuple)):
+        lines = url
+    else:
+        lines = str(url or "").splitlines()
+    return [line.strip() for line in lines if line and line.strip()]
+
+
+def content_hash(data):
+    """图片内容的哈希，作为解码缓存的键"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def decode_key(data, max_side=0, output_dtype="float32", pin_memory=False):
+    """解码缓存的键：内容哈希与解码参数"""
+    return f"{content_hash(data)}:{max_side}:{_max_pixels}:{output_dtype}:{int(bool(pin_memory))}"
+
+
+def peek_decoded(key):
+    """
+    查看解码缓存中的条目，不更新访问统计
+
+    返回:
+        CacheEntry 或 None: 条目（含 cpu_bytes 与 hits），不存在时返回 None
+    """
+    return _decoded.peek(key)
+
+
+def decode_cache_budget():
+    """
+    返回:
+        tuple: 解码缓存的 (条目数上限, 字节预算)
+    """
+    return _decoded.max_entries, _decoded.max_cpu_bytes
+
+
+def target_size(width, height, max_side=0, max_pixels=0):
+    """
+    计算解码目标尺寸：长边不超过 max_side，像素数不超过 max_pixels（0 表示不限制）
+
+    返回:
+        tuple 或 None: (宽, 高)，无需缩小时返回 None
+    """
+    scale = 1.0
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+    if max_pixels and width * height * scale * scale > max_pixels:
+        scale = math.sqrt(max_pixels / (width * height))
+    if scale >= 1.0:
+        return None
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def open_image(data, max_side=0, max_pixels=0):
+    """
+    解码图片并在解码过程中缩小到目标尺寸
+
+    JPEG 使用 draft 模式直接以 1/2、1/4、1/8 的比例解码；其他格式先以整数倍 reduce 缩小，
+    最后再精确缩放到目标尺寸，避免先完整展开大图再缩小
+
+    返回:
+        PIL.Image: 已按 EXIF 方向旋转的 RGB 图片
+    """
+    img = Image.open(BytesIO(data))
+    target = target_size(img.width, img.height, max_side, max_pixels)
+    if target is not None:
+        if img.format == 'JPEG':
+            img.draft('RGB', target)
+        else:
+            factor = min(img.width // target[0], img.height // target[1])
+            if factor >= 2:
+                # reduce 不支持调色板、1 位与 16 位灰度图（PNG、GIF 常见），先转为 RGB 再缩小
+                if img.mode not in REDUCIBLE_MODES:
+                    img = img.convert('RGB')
+                img = img.reduce(factor)
+
+    # 转为RGB，防止RGBA或其他格式导致问题
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # draft/reduce 只能按整数比例缩小，余下部分精确缩放
+    target = target_size(img.width, img.height, max_side, max_pixels)
+    if target is not None:
+        img = img.resize(target, Image.LANCZOS)
+    return img
+
+
+def fit_images(images, policy):
+    """
+    将尺寸不同的图片对齐为同一尺寸
+
+    参数:
+        images: [H, W, C] 图片张量列表
+        policy: resize 缩放到第一张图的尺寸；pad 以最大宽高居中补黑边；crop 以最小宽高居中裁剪
+
+    返回:
+        list: 尺寸一致的图片张量列表
+    """
+    sizes = {tuple(img.shape[:2]) for img in images}
+    if len(sizes) <= 1:
+        return images
+
+    if policy == "pad":
+        height = max(h for h, _ in sizes)
+        width = max(w for _, w in sizes)
+        fitted = []
+        for img in images:
+            h, w = img.shape[:2]
+            if (h, w) == (height, width):
+                fitted.append(img)
+                continue
+            canvas = img.new_zeros((height, width, img.shape[2]))
+            top = (height - h) // 2
+            left = (width - w) // 2
+            canvas[top:top + h, left:left + w] = img
+            fitted.append(canvas)
+        return fitted
+
+    if policy == "crop":
+        height = min(h for h, _ in sizes)
+        width = min(w for _, w in sizes)
+        fitted = []
+        for img in images:
+            top = (img.shape[0] - height) // 2
+            left = (img.shape[1] - width) // 2
+            fitted.append(img[top:top + height, left:left + width])
+        return fitted
+
+    height, width = images[0].shape[:2]
+    fitted = []
+    for img in images:
+        if tuple(img.shape[:2]) == (height, width):
+            fitted.append(img)
+            continue
+        # uint8 图片先转为浮点再缩放，结果四舍五入回 uint8
+        source = img.float() if img.dtype == torch.uint8 else img
+        resized = torch.nn.functional.interpolate(source.permute(2, 0, 1)[None], size=(height, width),
+                                                  mode="bilinear", align_corners=False, antialias=True)
+        resized = resized[0].permute(1, 2, 0)
+        if img.dtype == torch.uint8:
+            fitted.append(resized.round().clamp(0, 255).to(torch.uint8))
+        else:
+            fitted.append(resized.clamp(0, 1))
+    return fitted
+
 
 class ImageDownloadNode:
     """
     图片下载节点
-    输入：URL (STRING)
-    输出：IMAGE
+    输入：URL (STRING)，每行一个 URL 时并发下载并组成一个批次
+    输出：IMAGE，以及每个 URL 的下载状态
     """
-    
+
     @classmethod
     def INPUT_TYPES(cls):
         """
@@ -21,7 +238,7 @@ class ImageDownloadNode:
         return {
             "required": {
                 "url": ("STRING", {
-                    "multiline": False,
+                    "multiline": True,
                     "default": ""
                 }),
             },
@@ -30,84 +247,191 @@ class ImageDownloadNode:
                     "multiline": False,
                     "default": ""
                 }),
+                "size_policy": (list(SIZE_POLICIES), {
+                    "default": "resize",
+                    "tooltip": "多张图片尺寸不一致时：resize 缩放到第一张图的尺寸，pad 补边到最大尺寸，crop 居中裁剪到最小尺寸"
+                }),
+                "max_side": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 16384,
+                    "step": 8,
+                    "tooltip": "解码时把长边缩小到此尺寸以内，JPEG 直接以缩小的分辨率解码；0 表示保持原尺寸"
+                }),
+                "output_dtype": (list(OUTPUT_DTYPES), {
+                    "default": "float32",
+                    "tooltip": "float32 为标准 IMAGE（0~1）；uint8 输出原始像素值，仅供接受 uint8 的下游节点使用"
+                }),
+                "pin_memory": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "把图片分配在锁页内存中，加快之后拷贝到 GPU（没有 CUDA 时忽略）"
+                }),
+                "cache_mode": (list(CACHE_MODES), {
+                    "default": "enabled",
+                    "tooltip": "enabled 使用本地缓存并按需重新验证，offline 只读取缓存，bypass 总是重新下载"
+                }),
             }
         }
-    
-    RETURN_TYPES = ("IMAGE",)
-    RETURN_NAMES = ("IMAGE",)
+
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("IMAGE", "status")
     FUNCTION = "download_image"
     CATEGORY = "utils"
-    
-    def download_image(self, url, proxy=""):
+
+    @staticmethod
+    def fetch_bytes(url, proxy="", cache_mode="enabled"):
+        """
+        下载单个 URL 的原始内容
+
+        返回:
+            bytes: 响应内容
+
+        异常:
+            下载失败时抛出异常
+        """
+        if not url.startswith('http'):
+            raise ValueError("无效的URL")
+
+        # 设置更全的请求头，模仿现代浏览器
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+            'Sec-Ch-Ua-Mobile': '?0',
+            'Sec-Ch-Ua-Platform': '"Windows"',
+            'Sec-Fetch-Dest': 'image',
+            'Sec-Fetch-Mode': 'no-cors',
+            'Sec-Fetch-Site': 'cross-site',
+        }
+
+        # 针对 Pixiv 的特殊处理：必须设置 Referer 否则会 403
+        if 'pximg.net' in url:
+            headers['Referer'] = 'https://www.pixiv.net/'
+
+        # 针对 Twitter/X 的处理
+        if 'twimg.com' in url:
+            headers['Referer'] = 'https://x.com/'
+
+        # 从会话池获取按代理复用的 Session（含重试策略），保留与同一主机的连接
+        session = http_session_pool.get(proxy)
+
+        # 设置代理
+        proxies = None
+        if proxy and proxy.strip():
+            proxies = {
+                "http": proxy.strip(),
+                "https": proxy.strip(),
+            }
+
+        # 经本地缓存获取：TTL 内不访问网络，过期后以 ETag/Last-Modified 条件请求重新验证
+        with _host_slot(url):
+            return http_cache.fetch(session, url, headers, mode=cache_mode,
+                                    timeout=30, allow_redirects=True, proxies=proxies)
+
+    @staticmethod
+    def decode_image(data, max_side=0, output_dtype="float32", pin_memory=False):
+        """
+        解码图片内容，相同内容与参数直接返回缓存中已解码的张量
+        像素数超过 MAX_PIXELS 的图片在解码时按比例缩小
+
+        返回:
+            torch.Tensor: [H, W, C]，float32 时范围 [0, 1]；调用方不应原地修改
+        """
+        key = decode_key(data, max_side, output_dtype, pin_memory)
+        cached = _decoded.get(key)
+        if cached is not None:
+            return cached
+
+        img = open_image(data, max_side, _max_pixels)
+
+        # 一次运算写入预先分配的张量并归一化到 [0, 1]
+        image = pil_to_tensor(img, output_dtype, pin_memory)
+        _decoded.put(key, image)
+        return image
+
+    def fetch_image(self, url, proxy="", cache_mode="enabled", max_side=0, output_dtype="float32", pin_memory=False):
+        """
+        下载并解码单张图片
+
+        返回:
+            torch.Tensor: [H, W, C] 图片张量
+
+        异常:
+            下载或解码失败时抛出异常
+        """
+        return self.decode_image(self.fetch_bytes(url, proxy, cache_mode), max_side, output_dtype, pin_memory)
+
+    def download_image(self, url, proxy="", size_policy="resize", max_side=0, output_dtype="float32",
+                       pin_memory=False, cache_mode="enabled"):
         """
         从指定URL下载图片并转换为ComfyUI格式
+        多个 URL 时并发下载，单个 URL 失败只记录在状态中，不影响其他图片
         """
-        if not url or not url.startswith('http'):
+        urls = parse_urls(url)
+        if not urls:
             print(f"无效的URL: {url}")
-            return (torch.zeros((1, 64, 64, 3), dtype=torch.float32),)
-
-        try:
-            # 设置更全的请求头，模仿现代浏览器
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache',
-                'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                'Sec-Ch-Ua-Mobile': '?0',
-                'Sec-Ch-Ua-Platform': '"Windows"',
-                'Sec-Fetch-Dest': 'image',
-                'Sec-Fetch-Mode': 'no-cors',
-                'Sec-Fetch-Site': 'cross-site',
-            }
-            
-            # 针对 Pixiv 的特殊处理：必须设置 Referer 否则会 403
-            if 'pximg.net' in url:
-                headers['Referer'] = 'https://www.pixiv.net/'
-            
-            # 针对 Twitter/X 的处理
-            if 'twimg.com' in url:
-                headers['Referer'] = 'https://x.com/'
-
-            # 创建 Session 并设置重试策略
-            session = requests.Session()
-            retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-            session.mount('http://', HTTPAdapter(max_retries=retries))
-            session.mount('https://', HTTPAdapter(max_retries=retries))
-
-            # 设置代理
-            proxies = None
-            if proxy and proxy.strip():
-                proxies = {
-                    "http": proxy.strip(),
-                    "https": proxy.strip(),
-                }
-
-            response = session.get(url, headers=headers, timeout=30, allow_redirects=True, proxies=proxies)
-            if response.status_code != 200:
-                print(f"下载失败，状态码: {response.status_code}, URL: {url}")
-            response.raise_for_status()
-            
-            img = Image.open(BytesIO(response.content))
-            
-            # 转为RGB，防止RGBA或其他格式导致问题
-            img = ImageOps.exif_transpose(img)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 转换为numpy数组并归一化到 [0, 1]
-            image_np = np.array(img).astype(np.float32) / 255.0
-            
-            # 增加batch维度 [B, H, W, C]
-            image_tensor = torch.from_numpy(image_np)[None,]
-            
-            return (image_tensor,)
-            
-        except Exception as e:
-            print(f"下载图片失败: {e}")
+            return (torch.zeros((1, 64, 64, 3), dtype=torch.float32), "无效的URL")
+
+        def fetch(item):
+            try:
+                return self.fetch_image(item, proxy, cache_mode, max_side, output_dtype, pin_memory), None
+            except Exception as e:
+                print(f"下载图片失败: {e}, URL: {item}")
+                return None, e
+
+        results = map_urls(fetch, urls)
+
+        images = []
+        status = []
+        for i, (item, (img, error)) in enumerate(zip(urls, results)):
+            if img is None:
+                status.append(f"[{i}] 失败 {item}: {error}")
+            else:
+                status.append(f"[{i}] 成功 {img.shape[1]}x{img.shape[0]} {item}")
+                images.append(img)
+
+        if not images:
             # 返回一个黑色的默认图，以免节点崩溃
-            return (torch.zeros((1, 64, 64, 3), dtype=torch.float32),)
+            return (torch.zeros((1, 64, 64, 3), dtype=torch.float32), "\n".join(status))
+
+        images = fit_images(images, size_policy)
+
+        # 组成 [B, H, W, C]；单张图片时直接使用缓存张量的视图，不复制
+        if len(images) == 1:
+            image_tensor = images[0][None,]
+        elif pin_memory and torch.cuda.is_available():
+            image_tensor = torch.empty((len(images),) + tuple(images[0].shape), dtype=images[0].dtype, pin_memory=True)
+            torch.stack(images, out=image_tensor)
+        else:
+            image_tensor = torch.stack(images)
+
+        return (image_tensor, "\n".join(status))
+
+    @classmethod
+    def IS_CHANGED(cls, url, proxy="", size_policy="resize", max_side=0, output_dtype="float32", pin_memory=False,
+                   cache_mode="enabled"):
+        """
+        返回所有图片内容的哈希，远程图片未变化时 ComfyUI 可跳过本节点及下游节点
+        内容经本地响应缓存并发获取，TTL 内不访问网络，节点执行时直接命中这里写入的缓存；
+        bypass 模式不写缓存，也就无从比较，总是重新执行；任一 URL 获取失败时同样总是重新执行
+        """
+        if cache_mode == "bypass":
+            return float("NaN")
+        urls = parse_urls(url)
+        if not urls:
+            return ""
+
+        def fetch_hash(item):
+            try:
+                return content_hash(cls.fetch_bytes(item, proxy, cache_mode))
+            except Exception:
+                return None
+
+        hashes = map_urls(fetch_hash, urls)
+        if None in hashes:
+            return float("NaN")
+        return hashlib.sha256("".join(hashes).encode()).hexdigest()
 
 # 某些ComfyUI版本可能需要这个
 NODE_CLASS_MAPPINGS = {
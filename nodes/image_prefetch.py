@@ -0,0 +1,222 @@
+"""
+图片预取 - 在节点执行前于后台下载并解码 ImageDownloadNode 的图片
+预取结果写入响应缓存与解码缓存，节点执行时直接命中，GPU 无需等待网络 I/O
+
+已预取但尚未被节点使用的解码结果最多占用解码缓存预算的 PREFETCH_DECODE_SHARE，
+超出后只预取 HTTP 内容（写入响应缓存），由节点执行时再解码，避免大批量预取把
+之前工作流的解码结果挤出缓存；排队中的任务数不超过 MAX_PREFETCH_PENDING
+
+来源：
+    服务器的 on_prompt 钩子：提交到队列的工作流中所有 ImageDownloadNode 的 URL
+    /little-utility/prefetch 端点：显式提交的 URL 或工作流
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .http_cache import CACHE_MODES
+from .image_decode import OUTPUT_DTYPES
+from .image_download_node import ImageDownloadNode, decode_cache_budget, decode_key, parse_urls, peek_decoded
+
+
+# 预取线程数，避免与正在执行的节点争抢带宽
+MAX_PREFETCH_WORKERS = 4
+
+# 预取的解码结果可占用的解码缓存预算比例（条目数与字节数）
+PREFETCH_DECODE_SHARE = 0.5
+
+# 排队中的预取任务上限，超出的 URL 不再预取
+MAX_PREFETCH_PENDING = 1024
+
+NODE_CLASS = "ImageDownloadNode"
+
+# 节点输入的默认值，与 ImageDownloadNode.INPUT_TYPES 一致
+DEFAULT_OPTIONS = {
+    "proxy": "",
+    "max_side": 0,
+    "output_dtype": "float32",
+    "pin_memory": False,
+    "cache_mode": "enabled",
+}
+
+# max_side 的上限，与 ImageDownloadNode.INPUT_TYPES 一致
+MAX_SIDE_LIMIT = 16384
+
+
+def validate_options(options):
+    """
+    按节点输入的类型校验预取参数，未提供或为 None 的参数使用默认值
+
+    返回:
+        dict: 完整的预取参数
+
+    异常:
+        ValueError: 参数类型或取值无效
+    """
+    opts = dict(DEFAULT_OPTIONS)
+    for name, value in options.items():
+        if name not in DEFAULT_OPTIONS or value is None:
+            continue
+        if name == "proxy":
+            if not isinstance(value, str):
+                raise ValueError("proxy 必须是字符串")
+        elif name == "max_side":
+            if isinstance(value, str) and value.strip().isdigit():
+                value = int(value)
+            if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_SIDE_LIMIT:
+                raise ValueError(f"max_side 必须是 0~{MAX_SIDE_LIMIT} 的整数")
+        elif name == "pin_memory":
+            if not isinstance(value, bool):
+                raise ValueError("pin_memory 必须是布尔值")
+        elif name == "output_dtype":
+            if value not in OUTPUT_DTYPES:
+                raise ValueError(f"output_dtype 必须是 {', '.join(OUTPUT_DTYPES)} 之一")
+        elif value not in CACHE_MODES:
+            raise ValueError(f"cache_mode 必须是 {', '.join(CACHE_MODES)} 之一")
+        opts[name] = value
+    return opts
+
+
+class ImagePrefetcher:
+    """
+    后台预取队列
+    相同 URL 与解码参数的任务在完成前只执行一次
+    """
+
+    def __init__(self, max_workers=MAX_PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="LittleUtilityPrefetch")
+        self._lock = threading.Lock()
+        self._pending = set()
+        # 已预取解码、尚未被节点使用的结果：解码缓存键 -> 字节数
+        self._ahead = {}
+        # 正在解码的任务数，计入条目预算
+        self._decoding = 0
+        self.completed = 0
+        self.failed = 0
+        self.bytes_only = 0
+
+    def _reserve_decode(self):
+        """
+        检查预取的解码结果是否仍在预算内，在预算内时占用一个解码名额
+
+        返回:
+            bool: 是否解码；False 时只预取 HTTP 内容
+        """
+        max_entries, max_bytes = decode_cache_budget()
+        with self._lock:
+            # 已被节点使用（命中过）或已被淘汰的结果不再计入
+            for key in list(self._ahead):
+                entry = peek_decoded(key)
+                if entry is None or entry.hits:
+                    del self._ahead[key]
+            if max_entries and len(self._ahead) + self._decoding >= max_entries * PREFETCH_DECODE_SHARE:
+                return False
+            if max_bytes and sum(self._ahead.values()) >= max_bytes * PREFETCH_DECODE_SHARE:
+                return False
+            self._decoding += 1
+            return True
+
+    def _run(self, key):
+        url, proxy, max_side, output_dtype, pin_memory, cache_mode = key
+        node = ImageDownloadNode()
+        try:
+            data = node.fetch_bytes(url, proxy, cache_mode)
+            if self._reserve_decode():
+                try:
+                    image = node.decode_image(data, max_side, output_dtype, pin_memory)
+                    with self._lock:
+                        self._ahead[decode_key(data, max_side, output_dtype, pin_memory)] = \
+                            image.numel() * image.element_size()
+                finally:
+                    with self._lock:
+                        self._decoding -= 1
+            else:
+                with self._lock:
+                    self.bytes_only += 1
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            print(f"[ImagePrefetch] 预取失败: {e}, URL: {url}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def submit(self, url, **options):
+        """
+        提交预取任务
+
+        参数:
+            url: 单个 URL、换行分隔的多个 URL 或列表
+            **options: proxy / max_side / output_dtype / pin_memory / cache_mode，与节点输入同名
+
+        返回:
+            int: 新加入队列的 URL 数量
+
+        异常:
+            ValueError: 参数无效，见 validate_options
+        """
+        opts = validate_options(options)
+        # bypass 模式不写缓存，预取没有意义
+        if opts["cache_mode"] == "bypass":
+            return 0
+
+        queued = 0
+        skipped = 0
+        for item in parse_urls(url):
+            if not item.startswith("http"):
+                continue
+            key = (item, opts["proxy"], opts["max_side"], opts["output_dtype"], bool(opts["pin_memory"]),
+                   opts["cache_mode"])
+            with self._lock:
+                if key in self._pending:
+                    continue
+                if len(self._pending) >= MAX_PREFETCH_PENDING:
+                    skipped += 1
+                    continue
+                self._pending.add(key)
+            self._executor.submit(self._run, key)
+            queued += 1
+        if skipped:
+            print(f"[ImagePrefetch] 预取队列已满，跳过 {skipped} 个 URL")
+        return queued
+
+    def submit_prompt(self, prompt):
+        """
+        扫描工作流（API 格式），预取其中所有 ImageDownloadNode 的图片
+        来自其他节点连线的输入无法预知，使用默认值；url 为连线时跳过该节点
+
+        返回:
+            int: 新加入队列的 URL 数量
+        """
+        if not isinstance(prompt, dict):
+            return 0
+        queued = 0
+        for node in prompt.values():
+            if not isinstance(node, dict) or node.get("class_type") != NODE_CLASS:
+                continue
+            inputs = node.get("inputs") or {}
+            url = inputs.get("url")
+            if not isinstance(url, str):
+                continue
+            # 连线输入在 API 格式中是 [节点 ID, 输出序号]
+            options = {k: v for k, v in inputs.items() if k in DEFAULT_OPTIONS and not isinstance(v, list)}
+            try:
+                queued += self.submit(url, **options)
+            except ValueError as e:
+                print(f"[ImagePrefetch] 跳过参数无效的节点: {e}")
+        return queued
+
+    def status(self):
+        """
+        返回:
+            dict: 排队中、已完成（其中只预取了 HTTP 内容的）与失败的任务数
+        """
+        with self._lock:
+            return {"pending": len(self._pending), "completed": self.completed, "bytes_only": self.bytes_only,
+                    "failed": self.failed}
+
+
+# 进程内共享的预取队列
+image_prefetcher = ImagePrefetcher()
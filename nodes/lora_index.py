@@ -0,0 +1,424 @@
+"""
+Lora 索引 - 進程內共享、可增量更新的 Lora 文件目錄
+啟動後只完整掃描一次 lora 文件夾，之後只重新列出有變動的目錄並套用增刪差異
+有安裝 watchdog 時使用文件系統事件（inotify 等）標記變動目錄，否則按目錄修改時間輪詢
+"""
+
+import os
+import threading
+import time
+
+import folder_paths
+
+from .changelog import Changelog
+from .lora_search import LoraSearchIndex
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# 支持的 Lora 文件擴展名
+LORA_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.bin')
+
+# 兩次目錄修改時間輪詢之間的最短間隔（秒），避免每次按鍵都觸發 stat
+STALE_CHECK_INTERVAL = 2.0
+
+# 一批變動超過此數量時不再增量更新搜索索引，改為在鎖外重建
+SEARCH_INDEX_MAX_DELTA = 256
+
+
+def _lora_roots():
+    """
+    獲取規範化的 lora 根目錄：去掉結尾分隔符等，使文件系統事件的路徑與目錄快照的鍵一致
+
+    返回:
+        tuple: 絕對路徑形式的根目錄
+    """
+    return tuple(os.path.abspath(root) for root in folder_paths.get_folder_paths("loras"))
+
+
+class _DirState:
+    """單個目錄的快照：修改時間、其中的 Lora 文件名及子目錄名"""
+
+    __slots__ = ("root", "mtime", "files", "subdirs")
+
+    def __init__(self, root, mtime, files, subdirs):
+        self.root = root
+        self.mtime = mtime
+        self.files = files
+        self.subdirs = subdirs
+
+
+class _DirtyDirHandler(FileSystemEventHandler):
+    """文件系統事件處理器：只記錄受影響的目錄，實際更新在下次訪問時進行"""
+
+    def __init__(self, index):
+        self._index = index
+
+    def _mark(self, path, is_directory):
+        # 與 _dirs 的鍵一致：根目錄經 _lora_roots 規範化，其下路徑由 os.path.join 生成
+        path = os.path.abspath(os.fsdecode(path))
+        if is_directory:
+            self._index.mark_dirty(path)
+        self._index.mark_dirty(os.path.dirname(path))
+
+    def on_any_event(self, event):
+        self._mark(event.src_path, event.is_directory)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self._mark(dest_path, event.is_directory)
+
+
+class LoraIndex:
+    """
+    Lora 文件目錄
+    保存每個目錄的快照，只對變動的目錄重新列出並套用增刪差異，
+    Lora 選擇器節點與 API 共享同一個實例
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._roots = ()
+        self._dirs = {}
+        self._items = {}
+        self._entries = []
+        self._names = None
+        self._sorted = True
+        self._search_index = None
+        self._search_build_lock = threading.Lock()
+        self._built = False
+        self._last_check = 0.0
+        self._changelog = Changelog()
+        self._dirty_dirs = set()
+        self._observer = None
+
+    # ---------- 目錄快照 ----------
+
+    def _list_dir(self, root, path):
+        """列出單個目錄，返回 _DirState；目錄不存在或無法讀取時返回 None"""
+        files = set()
+        subdirs = set()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for item in it:
+                    try:
+                        if item.is_dir():
+                            # 與 os.walk 默認行為一致：不進入符號鏈接的目錄，避免鏈接成環時無限遞歸
+                            if not item.is_symlink():
+                                subdirs.add(item.name)
+                        elif item.name.endswith(LORA_EXTENSIONS):
+                            files.add(item.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        return _DirState(root, mtime, files, subdirs)
+
+    def _make_entry(self, root, path, file):
+        """生成 Lora 文件信息"""
+        # 計算相對路徑並統一使用正斜線
+        full_name = os.path.relpath(os.path.join(path, file), root).replace('\\', '/')
+        # 移除擴展名
+        lora_name = os.path.splitext(full_name)[0]
+        return {
+            "name": lora_name,
+            "filename": full_name,
+            "folder": os.path.dirname(lora_name) if '/' in lora_name else "",
+            # 所屬根目錄的序號：多個根目錄下可能有相同的相對路徑
+            "root": self._roots.index(root),
+        }
+
+    def _add_tree(self, root, path, changes):
+        """遞歸加入一個新目錄及其下所有 Lora 文件"""
+        state = self._list_dir(root, path)
+        if state is None:
+            return
+        self._dirs[path] = state
+        for file in state.files:
+            self._add_file(root, path, file, changes)
+        for sub in state.subdirs:
+            self._add_tree(root, os.path.join(path, sub), changes)
+
+    def _remove_tree(self, path, changes):
+        """移除一個目錄及其下所有已知目錄與文件"""
+        state = self._dirs.pop(path, None)
+        if state is None:
+            return
+        for file in state.files:
+            self._remove_file(path, file, changes)
+        for sub in state.subdirs:
+            self._remove_tree(os.path.join(path, sub), changes)
+
+    def _add_file(self, root, path, file, changes):
+        key = os.path.join(path, file)
+        entry = self._make_entry(root, path, file)
+        self._items[key] = entry
+        changes.append(("add", entry))
+
+    def _remove_file(self, path, file, changes):
+        entry = self._items.pop(os.path.join(path, file), None)
+        if entry is not None:
+            changes.append(("remove", entry))
+
+    def _relist(self, path, changes):
+        """重新列出一個已知目錄並套用與舊快照的差異"""
+        old = self._dirs.get(path)
+        if old is None:
+            return
+        new = self._list_dir(old.root, path)
+        if new is None:
+            self._remove_tree(path, changes)
+            return
+        if new.mtime == old.mtime and new.files == old.files and new.subdirs == old.subdirs:
+            return
+        self._dirs[path] = new
+        for file in old.files - new.files:
+            self._remove_file(path, file, changes)
+        for file in new.files - old.files:
+            self._add_file(old.root, path, file, changes)
+        for sub in old.subdirs - new.subdirs:
+            self._remove_tree(os.path.join(path, sub), changes)
+        for sub in new.subdirs - old.subdirs:
+            self._add_tree(old.root, os.path.join(path, sub), changes)
+
+    def _apply(self, changes):
+        """記錄一批差異，排序後的列表在下次讀取時重建，搜索索引就地增量更新"""
+        if not changes:
+            return
+        self._changelog.record(changes)
+        self._sorted = False
+        self._names = None
+        if self._search_index is not None:
+            if len(changes) <= SEARCH_INDEX_MAX_DELTA:
+                self._search_index.apply(changes)
+            else:
+                self._search_index = None
+
+    # ---------- 文件系統監聽 ----------
+
+    def mark_dirty(self, path):
+        """標記目錄需要重新列出（由文件系統事件線程調用）"""
+        with self._lock:
+            self._dirty_dirs.add(path)
+
+    def _start_watching(self):
+        """為所有存在的根目錄啟動文件系統監聽，watchdog 不可用時退回輪詢"""
+        self._stop_watching()
+        if Observer is None:
+            return
+        try:
+            observer = Observer()
+            handler = _DirtyDirHandler(self)
+            for root in self._roots:
+                if os.path.isdir(root):
+                    observer.schedule(handler, root, recursive=True)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+        except Exception as e:
+            print(f"[LoraIndex] 文件監聽啟動失敗，改用目錄輪詢: {e}")
+            self._observer = None
+
+    def _stop_watching(self):
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    # ---------- 對外接口 ----------
+
+    def refresh(self):
+        """強制完整重新掃描所有 lora 目錄"""
+        with self._lock:
+            try:
+                roots = _lora_roots()
+            except Exception as e:
+                print(f"[LoraIndex] 獲取 Lora 目錄時出錯: {e}")
+                return self._sorted_entries()
+            changes = [("remove", entry) for entry in self._items.values()]
+            self._dirs = {}
+            self._items = {}
+            self._dirty_dirs.clear()
+            self._roots = roots
+            for root in roots:
+                if os.path.isdir(root):
+                    self._add_tree(root, root, changes)
+            self._apply(changes)
+            self._built = True
+            self._last_check = time.monotonic()
+            self._start_watching()
+            return self._sorted_entries()
+
+    def ensure_fresh(self):
+        """
+        套用自上次訪問以來的目錄變動
+        有文件監聽時只處理被標記的目錄；否則輪詢所有目錄的修改時間（受 STALE_CHECK_INTERVAL 節流）
+        """
+        with self._lock:
+            if not self._built:
+                self.refresh()
+                return
+            now = time.monotonic()
+            if self._observer is not None:
+                dirty = self._dirty_dirs
+                self._dirty_dirs = set()
+            else:
+                if now - self._last_check < STALE_CHECK_INTERVAL:
+                    return
+                dirty = set()
+                for path, state in self._dirs.items():
+                    try:
+                        if os.stat(path).st_mtime_ns != state.mtime:
+                            dirty.add(path)
+                    except OSError:
+                        dirty.add(path)
+            self._last_check = now
+
+            try:
+                roots = _lora_roots()
+            except Exception as e:
+                print(f"[LoraIndex] 獲取 Lora 目錄時出錯: {e}")
+                return
+            # 根目錄設置變動，或之前不存在的根目錄後來被創建：完整重建
+            if roots != self._roots or any(root not in self._dirs and os.path.isdir(root) for root in roots):
+                self.refresh()
+                return
+
+            changes = []
+            # 先處理上層目錄，被移除的子樹不必再單獨列出
+            for path in sorted(dirty, key=len):
+                self._relist(path, changes)
+            self._apply(changes)
+
+    def _sorted_entries(self):
+        if not self._sorted:
+            # 根據名稱排序
+            self._entries = sorted(self._items.values(), key=lambda x: x["name"].lower())
+            self._sorted = True
+        return self._entries
+
+    @property
+    def version(self):
+        """目錄版本標記 "<epoch>.<版本號>"，每套用一批變動版本號加一"""
+        with self._lock:
+            self.ensure_fresh()
+            return self._changelog.token
+
+    def snapshot(self):
+        """
+        原子地獲取版本標記與排序後的 Lora 列表
+
+        返回:
+            tuple: (版本標記, Lora 文件信息列表)
+        """
+        with self._lock:
+            self.ensure_fresh()
+            return self._changelog.token, self._sorted_entries()
+
+    def changes_since(self, since):
+        """
+        計算自指定版本以來的淨變動
+
+        參數:
+            since: 客戶端持有的版本標記
+
+        返回:
+            tuple 或 None: (當前版本標記, 新增的 Lora 信息列表, 移除的 {"root", "filename"} 列表)，
+            版本無效或變動記錄已被淘汰時返回 None。
+            項目以 (root, filename) 識別，客戶端應先移除出現在任一列表中的項目，再加入新增項目
+        """
+        with self._lock:
+            self.ensure_fresh()
+            changes = self._changelog.since(since)
+            if changes is None:
+                return None
+            added = {}
+            removed = set()
+            for op, entry in changes:
+                key = (entry["root"], entry["filename"])
+                if op == "add":
+                    added[key] = entry
+                else:
+                    added.pop(key, None)
+                    removed.add(key)
+            return (self._changelog.token, list(added.values()),
+                    [{"root": root, "filename": filename} for root, filename in sorted(removed)])
+
+    def entries(self):
+        """
+        獲取所有 Lora 文件信息（已按名稱排序）
+
+        返回:
+            list: Lora 文件信息列表，調用方不應修改
+        """
+        with self._lock:
+            self.ensure_fresh()
+            return self._sorted_entries()
+
+    def names(self):
+        """
+        獲取去重後的 Lora 名稱（不含擴展名）
+
+        返回:
+            list: 排序後的 Lora 名稱列表，調用方不應修改
+        """
+        with self._lock:
+            self.ensure_fresh()
+            if self._names is None:
+                self._names = sorted({entry["name"] for entry in self._items.values()})
+            return self._names
+
+    def build_search_index(self):
+        """
+        建立搜索索引：在鎖外按快照建立，再補上建立期間的變動後換入
+        同一時間只有一個線程建立，其他線程等待並直接使用其結果
+
+        返回:
+            LoraSearchIndex: 當前的搜索索引
+        """
+        with self._search_build_lock:
+            while True:
+                with self._lock:
+                    self.ensure_fresh()
+                    if self._search_index is not None:
+                        return self._search_index
+                    token = self._changelog.token
+                    entries = list(self._items.values())
+                search_index = LoraSearchIndex(entries)
+                with self._lock:
+                    changes = self._changelog.since(token)
+                    if changes is not None and len(changes) <= SEARCH_INDEX_MAX_DELTA:
+                        search_index.apply(changes)
+                        self._search_index = search_index
+                        return search_index
+                # 建立期間變動過多或變動記錄已被淘汰，按新快照重新建立
+
+    def search(self, query, limit=50, offset=0):
+        """
+        排序搜索 Lora 名稱；搜索索引隨目錄變動增量更新，只有大批變動後才在鎖外重建
+
+        參數:
+            query: 搜索關鍵字
+            limit: 最多返回的結果數
+            offset: 跳過的結果數
+
+        返回:
+            tuple: (當頁的 Lora 文件信息列表, 匹配總數)
+        """
+        with self._lock:
+            self.ensure_fresh()
+            search_index = self._search_index
+        if search_index is None:
+            search_index = self.build_search_index()
+        return search_index.search(query, limit, offset)
+
+
+# 進程內共享的 Lora 索引
+lora_index = LoraIndex()
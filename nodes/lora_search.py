@@ -0,0 +1,335 @@
+"""
+Lora 搜索引擎 - 基於預建索引的排序模糊搜索
+索引包含小寫名稱、分詞、三字元組（trigram）倒排表，以及雙字元組與單字元的位圖，排序規則為：
+前綴匹配 > 單詞邊界匹配 > 子字符串匹配 > 模糊（子序列）匹配
+"""
+
+import bisect
+import heapq
+import re
+import threading
+
+
+# 分詞用的分隔符：路徑斜線、底線、連字號、點、空白
+TOKEN_SPLIT = re.compile(r'[/\\_\-.\s]+')
+
+# 模糊匹配最多評分的候選數，以及選取候選時最多考慮的 query 雙字元組數
+MAX_FUZZY_CANDIDATES = 128
+MAX_FUZZY_BIGRAMS = 12
+
+
+def fuzzy_score(query, name):
+    """
+    子序列模糊匹配評分
+
+    參數:
+        query: 小寫搜索關鍵字
+        name: 小寫 Lora 名稱
+
+    返回:
+        int 或 None: 分數越小越好，不匹配時返回 None
+    """
+    pos = -1
+    first = -1
+    gaps = 0
+    for ch in query:
+        found = name.find(ch, pos + 1)
+        if found == -1:
+            return None
+        if first == -1:
+            first = found
+        elif found != pos + 1:
+            gaps += 1
+        pos = found
+    # 間斷越少、起點越靠前、匹配跨度越短越好
+    return gaps * 1000 + first * 10 + (pos - first)
+
+
+def _grams(name, n):
+    return {name[j:j + n] for j in range(len(name) - n + 1)}
+
+
+def _bit_indices(mask):
+    """按從小到大的順序列出位圖中所有為 1 的位"""
+    bits = bin(mask)[:1:-1]
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+def _ids_to_mask(ids, size):
+    """由序號列表構建位圖"""
+    buf = bytearray((size + 7) // 8)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+class LoraSearchIndex:
+    """
+    Lora 搜索索引
+    由 Lora 文件信息列表建立，之後可按目錄的增刪差異增量更新，查詢只查索引不遍歷全部名稱
+    查詢與更新可在不同線程進行，由索引自身的鎖保護
+    """
+
+    def __init__(self, entries=()):
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # id(Lora 文件信息) -> 序號；文件信息對象由 LoraIndex 持有，增刪差異中傳入的是同一個對象
+        self._ids = {}
+        self.entries = {}
+        self.names = {}
+        # 三字元組與單字元倒排表（序號集合）
+        self._trigrams = {}
+        self._chars = {}
+
+        # 前綴查找：按小寫名稱排序的 (名稱, 序號)
+        by_name = []
+        # 單詞邊界查找：按分詞排序的 (分詞, 序號, 分詞位置)
+        tokens = []
+        bigram_ids = {}
+        for entry in entries:
+            i, name = self._register(entry)
+            by_name.append((name, i))
+            tokens.extend(self._tokenize(name, i))
+            for gram in _grams(name, 2):
+                bigram_ids.setdefault(gram, []).append(i)
+        by_name.sort()
+        tokens.sort()
+        self._by_name = by_name
+        self._tokens = tokens
+
+        # 模糊匹配選取候選用的位圖：第 i 位表示序號 i 的名稱含有該雙字元組或字元
+        size = self._next_id
+        self._bigram_bits = {gram: _ids_to_mask(ids, size) for gram, ids in bigram_ids.items()}
+        self._char_bits = {ch: _ids_to_mask(ids, size) for ch, ids in self._chars.items()}
+
+    @staticmethod
+    def _tokenize(name, i):
+        return [(token, i, position) for position, token in enumerate(t for t in TOKEN_SPLIT.split(name) if t)]
+
+    def _register(self, entry):
+        """為文件信息分配序號並加入倒排表"""
+        i = self._next_id
+        self._next_id += 1
+        name = entry["name"].lower()
+        self._ids[id(entry)] = i
+        self.entries[i] = entry
+        self.names[i] = name
+        for gram in _grams(name, 3):
+            self._trigrams.setdefault(gram, set()).add(i)
+        for ch in set(name):
+            self._chars.setdefault(ch, set()).add(i)
+        return i, name
+
+    def _add(self, entry):
+        if id(entry) in self._ids:
+            return
+        i, name = self._register(entry)
+        bisect.insort(self._by_name, (name, i))
+        for token in self._tokenize(name, i):
+            bisect.insort(self._tokens, token)
+        bit = 1 << i
+        for gram in _grams(name, 2):
+            self._bigram_bits[gram] = self._bigram_bits.get(gram, 0) | bit
+        for ch in set(name):
+            self._char_bits[ch] = self._char_bits.get(ch, 0) | bit
+
+    def _remove(self, entry):
+        i = self._ids.pop(id(entry), None)
+        if i is None:
+            return
+        del self.entries[i]
+        name = self.names.pop(i)
+        del self._by_name[bisect.bisect_left(self._by_name, (name, i))]
+        for token in self._tokenize(name, i):
+            del self._tokens[bisect.bisect_left(self._tokens, token)]
+        for gram in _grams(name, 3):
+            self._discard(self._trigrams, gram, i)
+        for ch in set(name):
+            self._discard(self._chars, ch, i)
+        bit = ~(1 << i)
+        for gram in _grams(name, 2):
+            self._clear_bit(self._bigram_bits, gram, bit)
+        for ch in set(name):
+            self._clear_bit(self._char_bits, ch, bit)
+
+    @staticmethod
+    def _discard(postings, key, i):
+        posting = postings[key]
+        posting.discard(i)
+        if not posting:
+            del postings[key]
+
+    @staticmethod
+    def _clear_bit(masks, key, bit):
+        mask = masks[key] & bit
+        if mask:
+            masks[key] = mask
+        else:
+            del masks[key]
+
+    def apply(self, changes):
+        """
+        套用 LoraIndex 的增刪差異
+
+        參數:
+            changes: [("add" 或 "remove", Lora 文件信息), ...]
+        """
+        with self._lock:
+            for op, entry in changes:
+                if op == "add":
+                    self._add(entry)
+                else:
+                    self._remove(entry)
+
+    def _prefix_ids(self, query):
+        """所有以 query 開頭的名稱序號"""
+        start = bisect.bisect_left(self._by_name, (query,))
+        end = bisect.bisect_left(self._by_name, (query + "\uffff",), start)
+        return [i for _, i in self._by_name[start:end]]
+
+    def _word_hits(self, query):
+        """所有有分詞以 query 開頭的名稱：{序號: 最早分詞位置}"""
+        start = bisect.bisect_left(self._tokens, (query,))
+        end = bisect.bisect_left(self._tokens, (query + "\uffff",), start)
+        hits = {}
+        for _, i, position in self._tokens[start:end]:
+            if i not in hits or position < hits[i]:
+                hits[i] = position
+        return hits
+
+    def _intersect(self, postings):
+        """從最短的倒排表開始求交集"""
+        if not postings or any(p is None for p in postings):
+            return set()
+        postings = sorted(postings, key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def _substring_ids(self, query):
+        """所有包含 query 的名稱序號，先用三字元組或單字元倒排表縮小候選範圍"""
+        names = self.names
+        if len(query) == 1:
+            return list(self._chars.get(query, ()))
+        if len(query) >= 3:
+            grams = _grams(query, 3)
+            candidates = self._intersect([self._trigrams.get(gram) for gram in grams])
+        else:
+            candidates = self._intersect([self._chars.get(ch) for ch in set(query)])
+        return [i for i in candidates if query in names[i]]
+
+    def _fuzzy_candidates(self, query, exclude):
+        """
+        模糊匹配的候選名稱，最多 MAX_FUZZY_CANDIDATES 個
+
+        候選必須含有 query 的全部字元；間斷越少的匹配保留越多 query 的雙字元組，
+        因此按含有的 query 雙字元組數從多到少選取。計數以位圖運算完成，不逐個遍歷名稱
+        """
+        required = None
+        for ch in set(query):
+            mask = self._char_bits.get(ch, 0)
+            required = mask if required is None else required & mask
+            if not required:
+                return []
+
+        grams = list(dict.fromkeys(query[j:j + 2] for j in range(len(query) - 1)))[:MAX_FUZZY_BIGRAMS]
+        # at_least[k]：含有至少 k 個 query 雙字元組（且含有全部字元）的名稱
+        at_least = [required] + [0] * len(grams)
+        for gram in grams:
+            mask = self._bigram_bits.get(gram, 0) & required
+            if not mask:
+                continue
+            for k in range(len(grams), 0, -1):
+                at_least[k] |= at_least[k - 1] & mask
+
+        result = []
+        taken = 0
+        for level in reversed(at_least):
+            for i in _bit_indices(level & ~taken):
+                if i not in exclude:
+                    result.append(i)
+                    if len(result) >= MAX_FUZZY_CANDIDATES:
+                        return result
+            taken |= level
+        return result
+
+    def _fuzzy_ids(self, query, exclude):
+        """子序列模糊匹配：{序號: 分數}，只評分 _fuzzy_candidates 選出的名稱"""
+        # 每個字元之後跳到下一個字元的首次出現，與 fuzzy_score 逐字元 find 的位置相同；
+        # 每段跳過的內容是一個分組，非空的分組即一處間斷
+        pattern = re.compile("".join(f"{re.escape(ch)}([^{re.escape(nxt)}]*)" for ch, nxt in zip(query, query[1:]))
+                             + re.escape(query[-1]))
+        names = self.names
+        scores = {}
+        for i in self._fuzzy_candidates(query, exclude):
+            match = pattern.search(names[i])
+            if match is not None:
+                groups = match.groups()
+                gaps = len(groups) - groups.count("")
+                scores[i] = gaps * 1000 + match.start() * 10 + (match.end() - 1 - match.start())
+        return scores
+
+    def search(self, query, limit=50, offset=0):
+        """
+        搜索 Lora 名稱並排序分頁
+        每一層只對落在當前頁範圍內的部分做局部排序
+
+        參數:
+            query: 搜索關鍵字
+            limit: 最多返回的結果數
+            offset: 跳過的結果數
+
+        返回:
+            tuple: (當頁的 Lora 文件信息列表, 匹配總數)
+            模糊匹配只在前三層結果不足以填滿當前頁時計算，此時總數才包含模糊結果；
+            模糊匹配最多評分 MAX_FUZZY_CANDIDATES 個候選，總數中的模糊部分不一定完整
+        """
+        query = query.lower().strip()
+        with self._lock:
+            if not query:
+                return [self.entries[i] for _, i in self._by_name[offset:offset + limit]], len(self._by_name)
+            return self._search(query, limit, offset)
+
+    def _search(self, query, limit, offset):
+        names = self.names
+        seen = set()
+        page = []
+        skip = offset
+        total = 0
+
+        def take(ids, key):
+            # 從本層取出落在當前頁範圍內的結果
+            nonlocal skip, total
+            total += len(ids)
+            if skip >= len(ids):
+                skip -= len(ids)
+                return
+            want = limit - len(page)
+            if want > 0:
+                ordered = heapq.nsmallest(skip + want, ids, key=key)
+                page.extend(ordered[skip:])
+                skip = 0
+
+        # 1. 前綴匹配：短名稱優先
+        prefix = self._prefix_ids(query)
+        take(prefix, lambda i: (len(names[i]), names[i]))
+        seen.update(prefix)
+
+        # 2. 單詞邊界匹配：分詞越靠前越好
+        hits = self._word_hits(query)
+        words = [i for i in hits if i not in seen]
+        take(words, lambda i: (hits[i], len(names[i]), names[i]))
+        seen.update(words)
+
+        # 3. 子字符串匹配：出現位置越靠前越好
+        substring = [i for i in self._substring_ids(query) if i not in seen]
+        take(substring, lambda i: (names[i].find(query), len(names[i]), names[i]))
+
+        # 4. 模糊匹配：只在前面的結果不足以填滿當前頁時才計算
+        if len(page) < limit:
+            seen.update(substring)
+            scores = self._fuzzy_ids(query, seen)
+            take(list(scores), lambda i: (scores[i], len(names[i]), names[i]))
+
+        return [self.entries[i] for i in page], total
@@ -4,35 +4,8 @@ Lora 選擇器節點 - 提供自動補全功能的 Lora 文件選擇器
 支持管理 Lora 觸發詞並自動輸出
 """
 
-import folder_paths
-import os
-import json
-
-
-# 觸發詞配置文件路徑
-TRIGGER_WORDS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "lora_trigger_words.json")
-
-
-def load_trigger_words():
-    """載入觸發詞配置"""
-    if os.path.exists(TRIGGER_WORDS_FILE):
-        try:
-            with open(TRIGGER_WORDS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"[LoraSelectorNode] 載入觸發詞配置失敗: {e}")
-    return {}
-
-
-def save_trigger_words(data):
-    """保存觸發詞配置"""
-    try:
-        with open(TRIGGER_WORDS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"[LoraSelectorNode] 保存觸發詞配置失敗: {e}")
-        return False
+from .lora_index import lora_index
+from .trigger_word_store import trigger_word_store
 
 
 class LoraSelectorNode:
@@ -64,49 +37,44 @@ class LoraSelectorNode:
     @classmethod
     def IS_CHANGED(cls, lora_name):
         """
-        當觸發詞配置文件變動時，強制節點重新執行
+        以所選 Lora 的觸發詞作為變動標識，只有相關觸發詞變動時節點才重新執行
         """
-        if os.path.exists(TRIGGER_WORDS_FILE):
-            try:
-                # 使用修改時間作為變動標識
-                return os.path.getmtime(TRIGGER_WORDS_FILE)
-            except Exception:
-                pass
-        return float("NaN")
+        return cls.collect_trigger_words(lora_name)
     
     @classmethod
-    def get_lora_list(cls):
+    def collect_trigger_words(cls, lora_name):
         """
-        獲取所有可用的 Lora 文件列表
+        從共享的觸發詞存儲中收集所選 Lora 的觸發詞
         
+        參數:
+            lora_name: Lora 文件名（可用逗號分隔多個）
+            
         返回:
-            list: Lora 文件名列表（不含擴展名）
+            str: 以逗號合併的觸發詞
         """
-        lora_list = []
+        # 解析逗號分隔的 Lora 名稱
+        lora_names = [name.strip() for name in lora_name.split(",") if name.strip()]
         
-        try:
-            # 獲取 lora 文件夾路徑
-            lora_paths = folder_paths.get_folder_paths("loras")
-            
-            for lora_path in lora_paths:
-                if os.path.exists(lora_path):
-                    # 遍歷文件夾獲取所有 lora 文件
-                    for root, dirs, files in os.walk(lora_path):
-                        for file in files:
-                            if file.endswith(('.safetensors', '.ckpt', '.pt', '.bin')):
-                                # 計算相對路徑
-                                rel_path = os.path.relpath(os.path.join(root, file), lora_path)
-                                # 移除擴展名
-                                lora_name = os.path.splitext(rel_path)[0]
-                                # 統一使用正斜線
-                                lora_name = lora_name.replace('\\', '/')
-                                lora_list.append(lora_name)
-        except Exception as e:
-            print(f"[LoraSelectorNode] 獲取 Lora 列表時出錯: {e}")
+        # 收集所有觸發詞
+        all_trigger_words = []
+        for trigger in trigger_word_store.get_many(lora_names):
+            trigger = trigger.strip()
+            if trigger:
+                all_trigger_words.append(trigger)
+        
+        # 合併觸發詞
+        return ", ".join(all_trigger_words)
+    
+    @classmethod
+    def get_lora_list(cls):
+        """
+        獲取所有可用的 Lora 文件列表
         
-        # 去重並排序
-        lora_list = sorted(list(set(lora_list)))
-        return lora_list
+        返回:
+            list: 去重並排序後的 Lora 文件名列表（不含擴展名）
+        """
+        # 與 API 共享同一個增量更新的 Lora 目錄，不再單獨遍歷文件夾
+        return list(lora_index.names())
     
     def select_lora(self, lora_name: str):
         """
@@ -118,24 +86,7 @@ class LoraSelectorNode:
         返回:
             tuple: (lora_names, trigger_words)
         """
-        # 解析逗號分隔的 Lora 名稱
-        lora_names = [name.strip() for name in lora_name.split(",") if name.strip()]
-        
-        # 載入觸發詞配置
-        trigger_words_config = load_trigger_words()
-        
-        # 收集所有觸發詞
-        all_trigger_words = []
-        for name in lora_names:
-            if name in trigger_words_config:
-                trigger = trigger_words_config[name].strip()
-                if trigger:
-                    all_trigger_words.append(trigger)
-        
-        # 合併觸發詞
-        combined_trigger_words = ", ".join(all_trigger_words)
-        
-        return (lora_name, combined_trigger_words)
+        return (lora_name, self.collect_trigger_words(lora_name))
 
 
 # ComfyUI 節點註冊
@@ -3,6 +3,6 @@ Little Utility Server API 模組
 包含自定義 API 路由端點
 """
 
-from . import lora_api
+from . import lora_api, cache_api, prefetch_api
 
-__all__ = ['lora_api']
+__all__ = ['lora_api', 'cache_api', 'prefetch_api']
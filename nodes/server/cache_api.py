@@ -0,0 +1,112 @@
+"""
+緩存 API 路由 - 查看 CacheNode 緩存的用量與統計，並按名稱或通配模式清除緩存
+"""
+
+from aiohttp import web
+import server
+
+from ..cache_node import CacheNode
+from .executor import run_blocking
+
+
+def _release_device_memory():
+    """清除緩存後讓 ComfyUI 釋放未使用的顯存（不在 ComfyUI 環境中時忽略）"""
+    try:
+        import comfy.model_management
+        comfy.model_management.soft_empty_cache()
+    except Exception:
+        pass
+
+
+def get_cache_info():
+    """
+    收集內存層與磁盤層的緩存信息
+
+    返回:
+        dict: 統計計數、內存條目詳情及磁盤條目列表
+    """
+    disk = CacheNode._disk
+    disk_entries = [{
+        "name": name,
+        "bytes": size,
+        "last_access": mtime,
+    } for name, _, size, mtime in sorted(disk.list_entries(), key=lambda e: e[3], reverse=True)]
+    return {
+        "stats": CacheNode._cache.stats(),
+        "entries": CacheNode._cache.describe(),
+        "disk": {
+            "directory": disk.directory,
+            "max_bytes": disk.max_bytes,
+            "spill": disk.spill,
+            "bytes": sum(entry["bytes"] for entry in disk_entries),
+            "entries": disk_entries,
+        },
+    }
+
+
+def remove_cache(name=None, pattern=None):
+    """
+    從內存層與磁盤層移除緩存
+
+    參數:
+        name: 精確的緩存名稱
+        pattern: 通配模式（如 "latent_*"），提供 name 時忽略
+
+    返回:
+        dict: 分別從內存與磁盤移除的名稱
+    """
+    if name is not None:
+        memory = [name] if CacheNode._cache.pop(name) is not None else []
+        disk = [name] if CacheNode._disk.remove(name) else []
+    else:
+        memory = CacheNode._cache.remove_matching(pattern)
+        disk = CacheNode._disk.remove_matching(pattern)
+    if memory:
+        _release_device_memory()
+    return {"memory": memory, "disk": disk}
+
+
+@server.PromptServer.instance.routes.get("/little-utility/cache")
+async def get_cache(request):
+    """
+    API 端點：獲取緩存統計與條目詳情
+
+    返回:
+        JSON: 命中/未命中/淘汰/過期計數、用量與預算、每條緩存的大小、設備與訪問時間，以及磁盤層列表
+    """
+    return web.json_response(await run_blocking(get_cache_info))
+
+
+@server.PromptServer.instance.routes.delete("/little-utility/cache")
+async def delete_cache_matching(request):
+    """
+    API 端點：按通配模式清除緩存
+
+    查詢參數:
+        pattern: fnmatch 通配模式，"*" 表示全部
+
+    返回:
+        JSON: 被移除的名稱
+    """
+    pattern = request.query.get("pattern", "")
+    if not pattern:
+        return web.json_response({"success": False, "error": "缺少 pattern 參數"}, status=400)
+    removed = await run_blocking(remove_cache, None, pattern)
+    return web.json_response({"success": True, "pattern": pattern, "removed": removed})
+
+
+@server.PromptServer.instance.routes.delete("/little-utility/cache/{cache_name:.*}")
+async def delete_cache(request):
+    """
+    API 端點：按名稱清除緩存
+
+    返回:
+        JSON: 移除結果，名稱不存在時返回 404
+    """
+    cache_name = request.match_info.get("cache_name", "")
+    if not cache_name:
+        return web.json_response({"success": False, "error": "緩存名稱不能為空"}, status=400)
+    removed = await run_blocking(remove_cache, cache_name)
+    if not removed["memory"] and not removed["disk"]:
+        return web.json_response({"success": False, "error": f"緩存 '{cache_name}' 不存在"}, status=404)
+    return web.json_response({"success": True, "cache_name": cache_name, "removed": removed})
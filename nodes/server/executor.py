@@ -0,0 +1,53 @@
+"""
+後台執行器 - 將阻塞的文件 I/O 移出 aiohttp 事件循環
+相同鍵的並發請求會合併為同一個進行中的任務
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 有界線程池，避免大量請求同時佔滿磁盤或網絡存儲
+MAX_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="LittleUtilityIO")
+
+# 進行中的合併任務：key -> asyncio.Future
+_inflight = {}
+
+
+async def run_blocking(func, *args):
+    """
+    在後台線程池中執行阻塞函數
+
+    參數:
+        func: 要執行的同步函數
+        *args: 傳給函數的參數
+
+    返回:
+        函數的返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+
+async def run_coalesced(key, func, *args):
+    """
+    在後台線程池中執行阻塞函數，相同 key 的並發調用共享同一次執行
+
+    參數:
+        key: 合併用的鍵，相同鍵視為相同的工作
+        func: 要執行的同步函數
+        *args: 傳給函數的參數
+
+    返回:
+        函數的返回值
+    """
+    future = _inflight.get(key)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_executor, func, *args)
+        _inflight[key] = future
+        future.add_done_callback(lambda done: _inflight.pop(key, None) if _inflight.get(key) is done else None)
+    # shield：單個請求被取消時不影響其他等待同一任務的請求
+    return await asyncio.shield(future)
@@ -3,77 +3,107 @@ Lora API 路由 - 提供 Lora 列表和觸發詞管理的 REST API 端點
 """
 
 from aiohttp import web
-import folder_paths
-import os
 import json
+import threading
 import server
 
+from ..lora_index import lora_index
+from ..trigger_word_store import trigger_word_store
+from .executor import run_blocking, run_coalesced
+from .wire import SerializedCache, encode_compact, negotiate_encoding, serialize
 
-# 觸發詞配置文件路徑
-TRIGGER_WORDS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "lora_trigger_words.json")
+
+# 搜索結果分頁
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+
+# 導出觸發詞時每次寫出的行數
+EXPORT_CHUNK_LINES = 1000
 
 
 def get_lora_list():
     """
-    獲取所有可用的 Lora 文件列表
+    獲取所有可用的 Lora 文件列表（由共享索引提供，不再每次遍歷文件夾）
     
     返回:
         list: Lora 文件信息列表
     """
-    lora_list = []
-    
-    try:
-        # 獲取 lora 文件夾路徑
-        lora_paths = folder_paths.get_folder_paths("loras")
-        
-        for lora_path in lora_paths:
-            if os.path.exists(lora_path):
-                # 遍歷文件夾獲取所有 lora 文件
-                for root, dirs, files in os.walk(lora_path):
-                    for file in files:
-                        if file.endswith(('.safetensors', '.ckpt', '.pt', '.bin')):
-                            # 計算相對路徑
-                            rel_path = os.path.relpath(os.path.join(root, file), lora_path)
-                            # 移除擴展名
-                            lora_name = os.path.splitext(rel_path)[0]
-                            # 統一使用正斜線
-                            lora_name = lora_name.replace('\\', '/')
-                            # 取得完整文件名（含擴展名）
-                            full_name = rel_path.replace('\\', '/')
-                            
-                            lora_list.append({
-                                "name": lora_name,
-                                "filename": full_name,
-                                "folder": os.path.dirname(lora_name) if '/' in lora_name else ""
-                            })
-    except Exception as e:
-        print(f"[LoraAPI] 獲取 Lora 列表時出錯: {e}")
-    
-    # 根據名稱排序
-    lora_list.sort(key=lambda x: x["name"].lower())
-    return lora_list
+    return lora_index.entries()
 
 
-def load_trigger_words():
-    """載入觸發詞配置"""
-    if os.path.exists(TRIGGER_WORDS_FILE):
-        try:
-            with open(TRIGGER_WORDS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"[LoraAPI] 載入觸發詞配置失敗: {e}")
-    return {}
+# Lora 完整列表的預序列化緩存
+_lora_list_bodies = SerializedCache()
 
+def warm_up_lora_index():
+    """掃描 lora 目錄並建立搜索索引"""
+    lora_index.refresh()
+    lora_index.build_search_index()
 
-def save_trigger_words(data):
-    """保存觸發詞配置"""
-    try:
-        with open(TRIGGER_WORDS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"[LoraAPI] 保存觸發詞配置失敗: {e}")
+
+# 啟動時在後台線程預先建立索引，首次請求無需等待完整掃描
+threading.Thread(target=warm_up_lora_index, name="LoraIndexWarmup", daemon=True).start()
+
+
+def parse_trigger_word_item(item):
+    """
+    解析批量請求中的單個項目
+
+    參數:
+        item: {"lora_name": 名稱, "trigger_word": 觸發詞}，觸發詞為空或 "delete": true 時表示刪除
+
+    返回:
+        tuple: (Lora 名稱, 觸發詞)
+
+    異常:
+        ValueError: 項目格式無效
+    """
+    if not isinstance(item, dict):
+        raise ValueError("項目必須是 JSON 對象")
+    lora_name = item.get("lora_name")
+    trigger_word = item.get("trigger_word") or ""
+    if not isinstance(lora_name, str) or not lora_name.strip():
+        raise ValueError("Lora 名稱不能為空")
+    if not isinstance(trigger_word, str):
+        raise ValueError("觸發詞必須是字符串")
+    if item.get("delete"):
+        trigger_word = ""
+    return lora_name.strip(), trigger_word.strip()
+
+
+def make_etag(prefix, version):
+    """由版本標記生成 ETag"""
+    return f'"{prefix}-{version}"'
+
+
+def etag_matches(request, etag):
+    """檢查請求的 If-None-Match 是否與當前 ETag 相符"""
+    header = request.headers.get("If-None-Match", "")
+    if not header:
         return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        # 忽略弱校驗前綴 W/
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def versioned_response(request, etag, payload):
+    """
+    返回帶 ETag 的 JSON 響應，客戶端已持有相同版本時返回 304
+
+    參數:
+        etag: 當前數據的 ETag
+        payload: 返回 JSON 內容的無參函數，僅在需要時調用
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return web.Response(status=304, headers=headers)
+    return web.json_response(payload(), headers=headers)
 
 
 @server.PromptServer.instance.routes.get("/little-utility/loras")
@@ -81,11 +111,53 @@ async def get_loras(request):
     """
     API 端點：獲取所有 Lora 文件列表
     
+    查詢參數:
+        since: 客戶端持有的版本標記（可選），有效時只返回增量變動
+        format: "compact" 時返回共享文件夾表與擴展名表的列式結構（見 wire.encode_compact）
+        
     返回:
-        JSON: Lora 列表
+        JSON: Lora 列表及版本標記；帶 since 時返回 added/removed 增量；
+        If-None-Match 與當前 ETag 相符時返回 304。
+        完整列表按 Accept-Encoding 以 br/gzip 壓縮，並按版本緩存序列化結果
     """
-    loras = get_lora_list()
-    return web.json_response({"loras": loras})
+    since = request.query.get("since")
+    compact = request.query.get("format") == "compact"
+    
+    if since:
+        delta = await run_coalesced(("loras/since", since), lora_index.changes_since, since)
+        if delta is not None:
+            version, added, removed = delta
+            return versioned_response(request, make_etag("loras", version), lambda: {
+                "version": version,
+                "delta": True,
+                "added": added,
+                "removed": removed
+            })
+    
+    # 完整列表：每個版本、格式、壓縮方式只序列化一次；增量請求成功時不需要完整快照
+    version, loras = await run_coalesced("loras", lora_index.snapshot)
+    encoding = negotiate_encoding(request)
+    list_format = "compact" if compact else "full"
+    etag = make_etag(f"loras-{list_format}-{encoding}", version)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, etag):
+        return web.Response(status=304, headers=headers)
+    
+    def build():
+        if compact:
+            payload = {"version": version, "format": "compact", **encode_compact(loras)}
+        else:
+            payload = {"version": version, "loras": loras}
+        return serialize(payload, encoding)
+    
+    body = await run_blocking(_lora_list_bodies.get, version, (list_format, encoding), build)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=body, content_type="application/json", charset="utf-8", headers=headers)
 
 
 @server.PromptServer.instance.routes.get("/little-utility/loras/search")
@@ -95,22 +167,39 @@ async def search_loras(request):
     
     查詢參數:
         q: 搜索關鍵字
+        limit: 最多返回的結果數（默認 50，上限 500）
+        offset: 跳過的結果數
         
     返回:
-        JSON: 匹配的 Lora 列表
+        JSON: 按相關度排序的當頁 Lora 列表及匹配總數
     """
     query = request.query.get("q", "").lower().strip()
-    loras = get_lora_list()
+    try:
+        limit = min(max(int(request.query.get("limit", DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        offset = max(int(request.query.get("offset", 0)), 0)
+    except ValueError:
+        return web.json_response({"error": "limit 和 offset 必須是整數"}, status=400)
     
-    if query:
-        # 過濾匹配的 Lora
-        filtered = [
-            lora for lora in loras 
-            if query in lora["name"].lower()
-        ]
-        return web.json_response({"loras": filtered, "query": query})
+    filtered, total = await run_coalesced(("loras/search", query, limit, offset), lora_index.search, query, limit, offset)
+    return web.json_response({
+        "loras": filtered,
+        "query": query,
+        "total": total,
+        "limit": limit,
+        "offset": offset
+    })
+
+
+@server.PromptServer.instance.routes.post("/little-utility/loras/refresh")
+async def refresh_loras(request):
+    """
+    API 端點：強制重新掃描 Lora 文件夾
     
-    return web.json_response({"loras": loras, "query": ""})
+    返回:
+        JSON: 刷新後的 Lora 數量
+    """
+    loras = await run_coalesced("loras/refresh", lora_index.refresh)
+    return web.json_response({"success": True, "count": len(loras)})
 
 
 @server.PromptServer.instance.routes.get("/little-utility/trigger-words")
@@ -118,11 +207,120 @@ async def get_trigger_words(request):
     """
     API 端點：獲取所有觸發詞配置
     
+    查詢參數:
+        since: 客戶端持有的版本標記（可選），有效時只返回增量變動
+        
     返回:
-        JSON: 觸發詞配置
+        JSON: 觸發詞配置及版本標記；帶 since 時返回 updated/removed 增量；
+        If-None-Match 與當前 ETag 相符時返回 304
     """
-    trigger_words = load_trigger_words()
-    return web.json_response({"trigger_words": trigger_words})
+    since = request.query.get("since")
+    
+    if since:
+        delta = await run_coalesced(("trigger-words/since", since), trigger_word_store.changes_since, since)
+        if delta is not None:
+            version, updated, removed = delta
+            return versioned_response(request, make_etag("trigger-words", version), lambda: {
+                "version": version,
+                "delta": True,
+                "updated": updated,
+                "removed": removed
+            })
+    
+    version, trigger_words = await run_coalesced("trigger-words", trigger_word_store.snapshot)
+    return versioned_response(request, make_etag("trigger-words", version), lambda: {
+        "version": version,
+        "trigger_words": trigger_words
+    })
+
+
+# 注意：以下兩個固定路徑必須在 /trigger-words/{lora_name} 通配路由之前註冊
+@server.PromptServer.instance.routes.get("/little-utility/trigger-words/export")
+async def export_trigger_words(request):
+    """
+    API 端點：以 NDJSON 流式導出所有觸發詞，用於備份
+    
+    返回:
+        NDJSON: 每行一個 {"lora_name": 名稱, "trigger_word": 觸發詞}
+    """
+    version, trigger_words = await run_coalesced("trigger-words", trigger_word_store.snapshot)
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/x-ndjson; charset=utf-8",
+        "Content-Disposition": 'attachment; filename="lora_trigger_words.ndjson"',
+        "ETag": make_etag("trigger-words", version),
+    })
+    await response.prepare(request)
+    
+    lines = []
+    for lora_name, trigger_word in trigger_words.items():
+        lines.append(json.dumps({"lora_name": lora_name, "trigger_word": trigger_word}, ensure_ascii=False))
+        if len(lines) >= EXPORT_CHUNK_LINES:
+            await response.write(("\n".join(lines) + "\n").encode("utf-8"))
+            lines = []
+    if lines:
+        await response.write(("\n".join(lines) + "\n").encode("utf-8"))
+    
+    await response.write_eof()
+    return response
+
+
+@server.PromptServer.instance.routes.post("/little-utility/trigger-words/batch")
+async def batch_trigger_words(request):
+    """
+    API 端點：在一個事務中批量更新或刪除觸發詞，只持久化一次
+    
+    請求體（任選其一）:
+        JSON 對象: {"upserts": [{"lora_name", "trigger_word"}, ...], "deletes": [名稱, ...]}
+        JSON 數組: [{"lora_name", "trigger_word"}, ...]
+        NDJSON（Content-Type: application/x-ndjson）: 每行一個 {"lora_name", "trigger_word"}
+        觸發詞為空或帶 "delete": true 的項目表示刪除
+        
+    返回:
+        JSON: 處理結果及項目數量
+    """
+    updates = []
+    try:
+        if request.content_type in ("application/x-ndjson", "application/jsonl"):
+            # 逐行讀取請求流，無需先緩存整個請求體
+            line_no = 0
+            async for line in request.content:
+                line_no += 1
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    updates.append(parse_trigger_word_item(json.loads(line)))
+                except ValueError as e:
+                    return web.json_response({"success": False, "error": f"第 {line_no} 行: {e}"}, status=400)
+        else:
+            data = await request.json()
+            if isinstance(data, list):
+                items = data
+                deletes = []
+            elif isinstance(data, dict):
+                items = data.get("upserts", [])
+                deletes = data.get("deletes", [])
+                if not isinstance(items, list):
+                    raise ValueError("upserts 必須是數組")
+                if not isinstance(deletes, list):
+                    raise ValueError("deletes 必須是數組")
+            else:
+                raise ValueError("請求體必須是 JSON 對象或數組")
+            for item in items:
+                updates.append(parse_trigger_word_item(item))
+            for lora_name in deletes:
+                updates.append(parse_trigger_word_item({"lora_name": lora_name, "delete": True}))
+    except ValueError as e:
+        return web.json_response({"success": False, "error": str(e)}, status=400)
+    
+    if not await run_blocking(trigger_word_store.apply, updates):
+        return web.json_response({"success": False, "error": "保存失敗"}, status=500)
+    
+    return web.json_response({
+        "success": True,
+        "count": len(updates),
+        "version": trigger_word_store.version
+    })
 
 
 @server.PromptServer.instance.routes.get("/little-utility/trigger-words/{lora_name:.*}")
@@ -134,8 +332,7 @@ async def get_trigger_word(request):
         JSON: 觸發詞
     """
     lora_name = request.match_info.get("lora_name", "")
-    trigger_words = load_trigger_words()
-    trigger_word = trigger_words.get(lora_name, "")
+    trigger_word = await run_coalesced(("trigger-word", lora_name), trigger_word_store.get, lora_name)
     return web.json_response({
         "lora_name": lora_name,
         "trigger_word": trigger_word
@@ -162,17 +359,8 @@ async def save_trigger_word(request):
         if not lora_name:
             return web.json_response({"success": False, "error": "Lora 名稱不能為空"}, status=400)
         
-        # 載入現有配置
-        trigger_words = load_trigger_words()
-        
-        # 更新或刪除
-        if trigger_word:
-            trigger_words[lora_name] = trigger_word
-        elif lora_name in trigger_words:
-            del trigger_words[lora_name]
-        
-        # 保存
-        if save_trigger_words(trigger_words):
+        # 在後台線程中更新或刪除並保存
+        if await run_blocking(trigger_word_store.set, lora_name, trigger_word):
             return web.json_response({
                 "success": True,
                 "lora_name": lora_name,
@@ -198,15 +386,8 @@ async def delete_trigger_word(request):
     if not lora_name:
         return web.json_response({"success": False, "error": "Lora 名稱不能為空"}, status=400)
     
-    # 載入現有配置
-    trigger_words = load_trigger_words()
-    
-    # 刪除
-    if lora_name in trigger_words:
-        del trigger_words[lora_name]
-        if save_trigger_words(trigger_words):
-            return web.json_response({"success": True, "lora_name": lora_name})
-        else:
-            return web.json_response({"success": False, "error": "保存失敗"}, status=500)
+    # 在後台線程中刪除並保存
+    if await run_blocking(trigger_word_store.set, lora_name, ""):
+        return web.json_response({"success": True, "lora_name": lora_name})
     
-    return web.json_response({"success": True, "lora_name": lora_name})
+    return web.json_response({"success": False, "error": "保存失敗"}, status=500)
@@ -0,0 +1,73 @@
+"""
+預取 API 路由 - 提前下載並解碼 ImageDownloadNode 的圖片
+同時註冊 on_prompt 鉤子，工作流一進入隊列就開始預取
+"""
+
+from aiohttp import web
+import server
+
+from ..image_download_node import parse_urls
+from ..image_prefetch import image_prefetcher
+
+
+def prefetch_on_prompt(json_data):
+    """
+    on_prompt 鉤子：掃描提交的工作流並加入預取隊列
+    只排隊不等待，任何錯誤都不影響工作流提交
+    """
+    try:
+        image_prefetcher.submit_prompt(json_data.get("prompt"))
+    except Exception as e:
+        print(f"[LittleUtility] 預取工作流圖片失敗: {e}")
+    return json_data
+
+
+if hasattr(server.PromptServer.instance, "add_on_prompt_handler"):
+    server.PromptServer.instance.add_on_prompt_handler(prefetch_on_prompt)
+
+
+@server.PromptServer.instance.routes.post("/little-utility/prefetch")
+async def prefetch_images(request):
+    """
+    API 端點：預取圖片
+
+    請求體（任選其一）:
+        {"url": URL 或換行分隔的多個 URL, "urls": [URL, ...], 以及可選的 proxy / max_side / output_dtype / pin_memory / cache_mode}
+        {"prompt": API 格式的工作流}
+
+    返回:
+        JSON: 新加入隊列的數量及隊列狀態
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.json_response({"success": False, "error": "請求體必須是 JSON 對象"}, status=400)
+    if not isinstance(data, dict):
+        return web.json_response({"success": False, "error": "請求體必須是 JSON 對象"}, status=400)
+
+    if "prompt" in data:
+        queued = image_prefetcher.submit_prompt(data["prompt"])
+    else:
+        urls = data.get("urls") or []
+        if not isinstance(urls, list):
+            return web.json_response({"success": False, "error": "urls 必須是數組"}, status=400)
+        if isinstance(data.get("url"), str):
+            urls = urls + parse_urls(data["url"])
+        options = {k: v for k, v in data.items() if k not in ("url", "urls")}
+        try:
+            queued = image_prefetcher.submit([u for u in urls if isinstance(u, str)], **options)
+        except ValueError as e:
+            return web.json_response({"success": False, "error": str(e)}, status=400)
+
+    return web.json_response({"success": True, "queued": queued, **image_prefetcher.status()})
+
+
+@server.PromptServer.instance.routes.get("/little-utility/prefetch")
+async def prefetch_status(request):
+    """
+    API 端點：獲取預取隊列狀態
+
+    返回:
+        JSON: 排隊中、已完成與失敗的任務數
+    """
+    return web.json_response(image_prefetcher.status())
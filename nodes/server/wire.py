@@ -0,0 +1,128 @@
+"""
+傳輸格式 - 大型列表的緊湊列式編碼、壓縮及預序列化緩存
+"""
+
+import gzip
+import json
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# 壓縮等級：列表只在版本變動時序列化一次，可以選擇較高的等級
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def encode_compact(entries):
+    """
+    將 Lora 文件信息列表編碼為列式結構
+
+    共享的文件夾表與擴展名表以序號引用，客戶端可還原：
+        name = folders[folder_idx[i]] + "/" + names[i]（文件夾為空時不加斜線）
+        filename = name + exts[ext_idx[i]]
+        root = root_idx[i]（所屬 lora 根目錄的序號）
+
+    參數:
+        entries: Lora 文件信息列表
+
+    返回:
+        dict: 列式結構
+    """
+    folders = []
+    folder_ids = {}
+    exts = []
+    ext_ids = {}
+    names = []
+    folder_idx = []
+    ext_idx = []
+    root_idx = []
+
+    for entry in entries:
+        folder = entry["folder"]
+        name = entry["name"]
+        ext = entry["filename"][len(name):]
+        base = name[len(folder) + 1:] if folder else name
+
+        if folder not in folder_ids:
+            folder_ids[folder] = len(folders)
+            folders.append(folder)
+        if ext not in ext_ids:
+            ext_ids[ext] = len(exts)
+            exts.append(ext)
+
+        names.append(base)
+        folder_idx.append(folder_ids[folder])
+        ext_idx.append(ext_ids[ext])
+        root_idx.append(entry.get("root", 0))
+
+    return {
+        "folders": folders,
+        "exts": exts,
+        "names": names,
+        "folder_idx": folder_idx,
+        "ext_idx": ext_idx,
+        "root_idx": root_idx,
+    }
+
+
+def negotiate_encoding(request):
+    """根據 Accept-Encoding 選擇壓縮方式：br > gzip > 不壓縮"""
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("Accept-Encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def serialize(payload, encoding):
+    """序列化為 JSON 並按指定方式壓縮"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+class SerializedCache:
+    """
+    預序列化響應緩存
+    只保留當前版本的結果，同一版本的重複請求直接返回已壓縮的字節
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._bodies = {}
+
+    def get(self, version, key, build):
+        """
+        獲取預序列化的響應體
+
+        參數:
+            version: 數據版本標記，變動時丟棄舊緩存
+            key: 格式與壓縮方式等區分鍵
+            build: 生成響應體字節的無參函數
+
+        返回:
+            bytes: 響應體
+        """
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._bodies = {}
+            body = self._bodies.get(key)
+        if body is None:
+            body = build()
+            with self._lock:
+                if version == self._version:
+                    self._bodies[key] = body
+        return body
@@ -0,0 +1,446 @@
+"""
+文字清理引擎 - TextCleanupNode 使用的清理實現
+以一次按逗號切分加拼接完成原本多次 re.sub 的逗號與空格處理，輸出與原規則逐字節一致
+
+原規則依次為：
+    1. ,(\\s*,)+  -> ,     合併連續逗號
+    2. \\s+,      -> ,     移除逗號前的空白
+    3. ,\\s*      -> ", "  逗號後保留一個空格
+    4. ' +'       -> ' '   （可選）合併連續空格
+    5. 移除開頭與結尾的 [\\s,]（可選），最後 strip()
+1~3 的總效果等同於：按逗號切分後去掉每段兩側的空白、丟棄中間的空段，再以 ", " 拼接
+（第一段只去掉右側空白，最後一段只去掉左側空白）。
+切分、strip 與 join 都在 C 層完成，不需要正則引擎逐字符回溯；
+re 的 \\s 與 str.isspace 判定的空白字符完全相同
+
+與原實現的差異測試見 tests/test_text_cleanup_engine.py，基準測試見 benchmarks/bench_text_cleanup.py
+"""
+
+import io
+import os
+import re
+import tempfile
+
+
+def _is_edge_char(ch):
+    return ch == ',' or ch.isspace()
+
+
+def trim_edges(text):
+    """移除開頭與結尾的逗號及空白"""
+    start = 0
+    end = len(text)
+    while start < end and _is_edge_char(text[start]):
+        start += 1
+    while end > start and _is_edge_char(text[end - 1]):
+        end -= 1
+    return text[start:end]
+
+
+def normalize_commas(text):
+    """合併連續逗號並把逗號兩側的空白統一為 ", "（規則 1~3）"""
+    if ',' not in text:
+        return text
+    segments = text.split(',')
+    parts = [segments[0].rstrip()]
+    parts.extend([segment for segment in map(str.strip, segments[1:-1]) if segment])
+    parts.append(segments[-1].lstrip())
+    return ', '.join(parts)
+
+
+def collapse_spaces(text):
+    """把連續的半角空格合併為一個（規則 4），每輪替換使空格段長度減半"""
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    return text
+
+
+def cleanup(text, remove_start_end_commas=True, normalize_spaces=True):
+    """
+    清理文字中的錯誤逗號和多餘空格
+
+    參數:
+        text: 需要清理的原始文字
+        remove_start_end_commas: 是否移除開頭和結尾的逗號
+        normalize_spaces: 是否標準化空格（多個空格轉為一個）
+
+    返回:
+        str: 清理後的文字
+    """
+    if not text:
+        return ""
+    cleaned = normalize_commas(text)
+    if normalize_spaces:
+        cleaned = collapse_spaces(cleaned)
+    if remove_start_end_commas:
+        return trim_edges(cleaned)
+    return cleaned.strip()
+
+
+# 批量處理時用於連接多段文字的分隔符：既不是空白也不是逗號，切分與 strip 都不會跨過它
+SENTINEL = '\x00'
+
+# 批量處理時每塊的最大字符數，限制拼接字符串的峰值內存
+CHUNK_CHARS = 4 * 1024 * 1024
+
+
+def _chunks(texts, chunk_chars):
+    chunk = []
+    size = 0
+    for text in texts:
+        chunk.append(text)
+        size += len(text) + 1
+        if size >= chunk_chars:
+            yield chunk
+            chunk = []
+            size = 0
+    if chunk:
+        yield chunk
+
+
+def cleanup_many(texts, remove_start_end_commas=True, normalize_spaces=True, chunk_chars=CHUNK_CHARS):
+    """
+    批量清理多段文字，結果與逐段調用 cleanup 一致
+
+    以分隔符把一塊文字拼接後一次完成逗號與空格處理，只有首尾修剪需要逐段進行
+
+    參數:
+        texts: 文字列表
+        remove_start_end_commas: 是否移除每段開頭和結尾的逗號
+        normalize_spaces: 是否標準化空格
+        chunk_chars: 每塊的最大字符數
+
+    返回:
+        list: 清理後的文字列表
+    """
+    trim = trim_edges if remove_start_end_commas else str.strip
+    results = []
+    for chunk in _chunks(texts, chunk_chars):
+        if any(SENTINEL in text for text in chunk):
+            # 文字本身含有分隔符時逐段處理
+            results.extend(cleanup(text, remove_start_end_commas, normalize_spaces) for text in chunk)
+            continue
+        joined = normalize_commas(SENTINEL.join(chunk))
+        if normalize_spaces:
+            joined = collapse_spaces(joined)
+        results.extend(map(trim, joined.split(SENTINEL)))
+    return results
+
+
+# 逐行清理時每塊的字符數：按塊讀取與處理，大文件只需常駐一塊的內存
+LINE_BLOCK_CHARS = 1024 * 1024
+
+
+def iter_text_blocks(text, block_chars=LINE_BLOCK_CHARS):
+    """
+    把文字按換行切成若干塊，每塊包含完整的行（塊之間相隔一個換行符）
+
+    返回:
+        generator: 每次產生一塊文字（不含塊之間的換行符）
+    """
+    start = 0
+    length = len(text)
+    while start + block_chars < length:
+        cut = text.find('\n', start + block_chars)
+        if cut < 0:
+            break
+        yield text[start:cut]
+        start = cut + 1
+    yield text[start:]
+
+
+def iter_file_blocks(f, block_chars=LINE_BLOCK_CHARS):
+    """
+    從文件對象按塊讀取完整的行，語義與 iter_text_blocks(f.read()) 相同
+
+    返回:
+        generator: 每次產生一塊文字（不含塊之間的換行符）
+    """
+    carry = ""
+    while True:
+        data = f.read(block_chars)
+        if not data:
+            yield carry
+            return
+        data = carry + data
+        cut = data.rfind('\n')
+        if cut < 0:
+            carry = data
+            continue
+        yield data[:cut]
+        carry = data[cut + 1:]
+
+
+def iter_cleaned_blocks(blocks, clean_commas=True, clean_spaces=True, remove_empty_lines=False, trim_lines=True):
+    """
+    逐塊清理文字（TextCleanupAdvancedNode 的規則）
+
+    每塊的所有行以分隔符代替換行後一次完成逗號與空格處理，只有行首行尾修剪需要逐行進行
+
+    參數:
+        blocks: 由 iter_text_blocks 或 iter_file_blocks 產生的文字塊
+        clean_commas: 是否清理錯誤的逗號（含行首行尾的逗號）
+        clean_spaces: 是否清理多餘空格
+        remove_empty_lines: 是否移除空行
+        trim_lines: 是否修剪每行的首尾空格
+
+    返回:
+        generator: 每次產生一塊清理後的行列表（移除空行時可能為空列表）
+    """
+    for block in blocks:
+        if SENTINEL in block:
+            lines = [_cleanup_line(line, clean_commas, clean_spaces, trim_lines) for line in block.split('\n')]
+        else:
+            joined = block.replace('\n', SENTINEL)
+            if clean_commas:
+                joined = normalize_commas(joined)
+            if clean_spaces:
+                joined = collapse_spaces(joined)
+            lines = joined.split(SENTINEL)
+            del joined
+            if clean_commas:
+                lines = list(map(trim_edges, lines))
+            if trim_lines:
+                lines = list(map(str.strip, lines))
+        if remove_empty_lines:
+            lines = [line for line in lines if line]
+        yield lines
+
+
+def write_blocks(out, cleaned_blocks):
+    """
+    把清理後的行逐塊寫入文字流，行之間以換行分隔
+
+    返回:
+        int: 寫入的行數
+    """
+    count = 0
+    for lines in cleaned_blocks:
+        if not lines:
+            continue
+        if count:
+            out.write('\n')
+        out.write('\n'.join(lines))
+        count += len(lines)
+    return count
+
+
+def cleanup_lines(text, clean_commas=True, clean_spaces=True, remove_empty_lines=False, trim_lines=True,
+                  block_chars=LINE_BLOCK_CHARS):
+    """
+    逐行清理多行文字，按塊處理並寫入 StringIO，不同時保留完整的行列表
+
+    返回:
+        str: 清理後的文字
+    """
+    if not text:
+        return ""
+    out = io.StringIO()
+    write_blocks(out, iter_cleaned_blocks(iter_text_blocks(text, block_chars), clean_commas, clean_spaces,
+                                          remove_empty_lines, trim_lines))
+    return out.getvalue()
+
+
+def cleanup_lines_file(input_path, output_path, clean_commas=True, clean_spaces=True, remove_empty_lines=False,
+                       trim_lines=True, encoding="utf-8", block_chars=LINE_BLOCK_CHARS):
+    """
+    逐塊讀取文件清理後寫入另一個文件，內存佔用只與塊大小有關
+    先寫入同目錄的臨時文件再原子替換，輸入與輸出可以是同一個文件
+
+    參數:
+        input_path: 輸入文件路徑
+        output_path: 輸出文件路徑
+        encoding: 文件編碼
+
+    返回:
+        int: 寫入的行數
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".txt", dir=directory)
+    try:
+        # newline='\n'：只按 \n 分行且不轉換 \r\n，與處理字符串時的 split('\n') 一致
+        with open(input_path, "r", encoding=encoding, newline="\n") as src, \
+                os.fdopen(fd, "w", encoding=encoding, newline="\n") as dst:
+            count = write_blocks(dst, iter_cleaned_blocks(iter_file_blocks(src, block_chars), clean_commas,
+                                                          clean_spaces, remove_empty_lines, trim_lines))
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def _cleanup_line(line, clean_commas, clean_spaces, trim_lines):
+    if clean_commas:
+        line = trim_edges(normalize_commas(line))
+    if clean_spaces:
+        line = collapse_spaces(line)
+    if trim_lines:
+        line = line.strip()
+    return line
+
+
+# ---------- 標籤級處理 ----------
+
+# 標籤模式：off 不處理；dedup 去除重複標籤；merge 去重並合併權重
+TAG_MODES = ("off", "dedup", "merge")
+
+# 提示詞語法關鍵字，不參與去重
+TAG_KEYWORDS = frozenset(("BREAK", "AND"))
+
+# 括號強調的默認倍率：(tag) 為 1.1 倍，[tag] 為 1/1.1 倍
+EMPHASIS = 1.1
+
+_BRACKETS = {'(': ')', '[': ']', '{': '}', '<': '>'}
+_BRACKET_TOKEN = re.compile(r'\\.|[()\[\]{}<>]', re.DOTALL)
+_HAS_BRACKET = re.compile(r'[()\[\]{}<>\\]')
+_EXPLICIT_WEIGHT = re.compile(r'(.*):\s*([+-]?(?:\d+(?:\.\d*)?|\.\d+))\s*$', re.DOTALL)
+
+
+def _bracket_regions(text):
+    """找出所有頂層括號區間 [起點, 終點)，未閉合的括號延伸到文字末尾"""
+    regions = []
+    depth = 0
+    start = 0
+    for match in _BRACKET_TOKEN.finditer(text):
+        ch = match.group()
+        if len(ch) == 2:
+            continue
+        if ch in _BRACKETS:
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                regions.append((start, match.end()))
+    if depth:
+        regions.append((start, len(text)))
+    return regions
+
+
+def split_tags(text):
+    """
+    按頂層逗號把提示詞切分為標籤，括號（()、[]、{}、<lora:...>）內的逗號不作為分隔，轉義的括號如 \\( 不計入
+    只逐個掃描括號字符，括號以外的部分直接以 str.split 切分
+
+    返回:
+        list: 去除首尾空白後的非空標籤
+    """
+    regions = _bracket_regions(text) if _HAS_BRACKET.search(text) else ()
+    if not regions:
+        tags = text.split(',')
+    else:
+        tags = []
+        carry = ""
+        pos = 0
+        for start, end in regions:
+            pieces = text[pos:start].split(',')
+            pieces[0] = carry + pieces[0]
+            tags.extend(pieces[:-1])
+            carry = pieces[-1] + text[start:end]
+            pos = end
+        pieces = text[pos:].split(',')
+        pieces[0] = carry + pieces[0]
+        tags.extend(pieces)
+    return [tag for tag in map(str.strip, tags) if tag]
+
+
+def _encloses(tag, opening):
+    """標籤是否整個被同一對括號包住，例如 (a, b) 是而 (a) (b) 不是"""
+    if len(tag) < 2 or tag[0] != opening or tag[-1] != _BRACKETS[opening]:
+        return False
+    depth = 0
+    for match in _BRACKET_TOKEN.finditer(tag):
+        ch = match.group()
+        if ch in _BRACKETS:
+            depth += 1
+        elif len(ch) == 1 and depth:
+            depth -= 1
+            if depth == 0:
+                return match.end() == len(tag)
+    return False
+
+
+def parse_tag(tag):
+    """
+    解析標籤的權重
+
+    支持 (tag:1.2) 明確權重、(tag) 與 [tag] 括號強調及其嵌套；<lora:...> 等其他語法按原文處理
+
+    返回:
+        tuple: (去除權重語法並標準化空白後的標籤鍵, 權重)
+    """
+    weight = 1.0
+    while True:
+        if tag[:1] not in ('(', '['):
+            return " ".join(tag.split()), weight
+        if _encloses(tag, '('):
+            inner = tag[1:-1]
+            match = _EXPLICIT_WEIGHT.match(inner)
+            if match:
+                weight *= float(match.group(2))
+                tag = match.group(1).strip()
+            else:
+                weight *= EMPHASIS
+                tag = inner.strip()
+        elif _encloses(tag, '['):
+            weight /= EMPHASIS
+            tag = tag[1:-1].strip()
+        else:
+            return " ".join(tag.split()), weight
+
+
+def format_tag(key, weight):
+    """以明確權重語法輸出標籤，權重為 1 時不加括號"""
+    weight = round(weight, 2)
+    if weight == 1:
+        return key
+    return f"({key}:{weight:g})"
+
+
+def normalize_tags(text, mode="dedup"):
+    """
+    標籤級標準化：去除重複標籤並保留首次出現的順序，可選合併權重
+
+    同一標籤的不同寫法（如 masterpiece 與 (masterpiece:1.2)）視為重複；
+    合併權重時取最大權重，寫在首次出現的位置；BREAK、AND 等語法關鍵字保持原樣
+
+    參數:
+        text: 已清理逗號與空格的提示詞
+        mode: off / dedup / merge，見 TAG_MODES
+
+    返回:
+        str: 以 ", " 連接的標籤
+    """
+    if mode == "off" or not text:
+        return text
+    merge = mode == "merge"
+    # 每項為 [原文, 首次權重, 合併後權重]，關鍵字的權重為 None
+    entries = []
+    seen = {}
+    # 同一寫法的標籤只解析一次
+    parsed = {}
+    for tag in split_tags(text):
+        if tag in TAG_KEYWORDS:
+            entries.append([tag, None, None])
+            continue
+        result = parsed.get(tag)
+        if result is None:
+            result = parsed[tag] = parse_tag(tag)
+        key, weight = result
+        index = seen.get(key)
+        if index is None:
+            seen[key] = len(entries)
+            entries.append([tag, weight, weight])
+        elif merge and weight > entries[index][2]:
+            entries[index][2] = weight
+    keys = {index: key for key, index in seen.items()}
+    return ", ".join(
+        tag if merged == first else format_tag(keys[index], merged)
+        for index, (tag, first, merged) in enumerate(entries)
+    )
@@ -3,7 +3,46 @@
 處理常見的格式問題，如連續逗號、多餘空格等
 """
 
-import re
+import os
+
+from .text_cleanup_engine import TAG_MODES, cleanup, cleanup_lines, cleanup_lines_file, cleanup_many, normalize_tags
+
+
+def get_comfyui_directory(kind):
+    """獲取 ComfyUI 的 input 或 output 目錄"""
+    try:
+        import folder_paths
+        if kind == "input":
+            return folder_paths.get_input_directory()
+        return folder_paths.get_output_directory()
+    except ImportError:
+        pass
+    # 回退：假設節點在 ComfyUI/custom_nodes/xxx/nodes/ 下
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    comfyui_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
+    return os.path.join(comfyui_root, kind)
+
+
+def resolve_data_path(path, base):
+    """
+    把相對路徑解析到 base 目錄下，拒絕超出 base 的路徑
+    工作流可能來自他人分享，不允許借此讀寫服務器上的任意文件
+
+    參數:
+        path: 相對於 base 的路徑（位於 base 內的絕對路徑也可接受）
+        base: 允許讀寫的目錄
+
+    返回:
+        str: 解析後的絕對路徑
+
+    異常:
+        ValueError: 路徑指向 base 目錄以外
+    """
+    base = os.path.realpath(base)
+    resolved = os.path.realpath(os.path.join(base, path))
+    if resolved == base or os.path.commonpath([resolved, base]) != base:
+        raise ValueError(f"路徑必須位於 {base} 目錄內: {path}")
+    return resolved
 
 
 class TextCleanupNode:
@@ -33,6 +72,10 @@ class TextCleanupNode:
                     "label_on": "標準化",
                     "label_off": "保留"
                 }),
+                "tag_mode": (list(TAG_MODES), {
+                    "default": "off",
+                    "tooltip": "dedup 去除重複標籤（保留首次出現的位置）；merge 同時把重複標籤的權重合併為最大值"
+                }),
             },
         }
     
@@ -41,7 +84,7 @@ class TextCleanupNode:
     FUNCTION = "cleanup_text"
     CATEGORY = "utils"
     
-    def cleanup_text(self, text, remove_start_end_commas=True, normalize_spaces=True):
+    def cleanup_text(self, text, remove_start_end_commas=True, normalize_spaces=True, tag_mode="off"):
         """
         清理文字中的錯誤逗號和格式問題
         
@@ -49,37 +92,15 @@ class TextCleanupNode:
             text: 需要清理的原始文字
             remove_start_end_commas: 是否移除開頭和結尾的逗號
             normalize_spaces: 是否標準化空格（多個空格轉為一個）
+            tag_mode: 標籤級處理方式，off / dedup / merge
             
         返回:
             tuple: (清理後的文字,)
         """
-        if not text:
-            return ("",)
-        
-        cleaned = text
-        
-        # 1. 處理連續的逗號（包括中間有空格的情況）
-        cleaned = re.sub(r',(\s*,)+', ',', cleaned)
-        
-        # 2. 處理逗號前的多餘空格
-        cleaned = re.sub(r'\s+,', ',', cleaned)
-        
-        # 3. 標準化逗號後的空格（確保逗號後只有一個空格）
-        cleaned = re.sub(r',\s*', ', ', cleaned)
-        
-        # 4. 如果啟用，標準化所有多餘的空格
-        if normalize_spaces:
-            cleaned = re.sub(r' +', ' ', cleaned)
-        
-        # 5. 如果啟用，移除開頭和結尾的逗號及空格
-        if remove_start_end_commas:
-            cleaned = re.sub(r'^[\s,]+', '', cleaned)
-            cleaned = re.sub(r'[\s,]+$', '', cleaned)
-        
-        # 6. 清理行首行尾的空格
-        cleaned = cleaned.strip()
-        
-        return (cleaned,)
+        # 逗號與空格規則由清理引擎一次完成，輸出與原本逐條 re.sub 的結果一致
+        cleaned = cleanup(text, remove_start_end_commas, normalize_spaces)
+        # 在清理結果上按標籤去重（及合併權重）
+        return (normalize_tags(cleaned, tag_mode),)
 
 
 class TextCleanupAdvancedNode:
@@ -94,10 +115,9 @@ class TextCleanupAdvancedNode:
         定義節點的輸入類型
         """
         return {
-            "required": {
-                "text": ("STRING", {"forceInput": True}),
-            },
+            "required": {},
             "optional": {
+                "text": ("STRING", {"forceInput": True}),
                 "clean_commas": ("BOOLEAN", {
                     "default": True,
                     "label_on": "清理",
@@ -118,6 +138,14 @@ class TextCleanupAdvancedNode:
                     "label_on": "修剪",
                     "label_off": "保留"
                 }),
+                "input_path": ("STRING", {
+                    "default": "",
+                    "tooltip": "從 ComfyUI input 目錄下的文件逐塊讀取並清理（忽略 text 輸入），適合數百萬行的標註數據集"
+                }),
+                "output_path": ("STRING", {
+                    "default": "",
+                    "tooltip": "把結果寫入 ComfyUI output 目錄下的文件，此時輸出為文件路徑而不是文字內容"
+                }),
             },
         }
     
@@ -126,8 +154,8 @@ class TextCleanupAdvancedNode:
     FUNCTION = "cleanup_text_advanced"
     CATEGORY = "utils"
     
-    def cleanup_text_advanced(self, text, clean_commas=True, clean_spaces=True, 
-                            remove_empty_lines=False, trim_lines=True):
+    def cleanup_text_advanced(self, text="", clean_commas=True, clean_spaces=True, 
+                            remove_empty_lines=False, trim_lines=True, input_path="", output_path=""):
         """
         進階文字清理，提供更多自定義選項
         
@@ -137,56 +165,142 @@ class TextCleanupAdvancedNode:
             clean_spaces: 是否清理多餘空格
             remove_empty_lines: 是否移除空行
             trim_lines: 是否修剪每行的首尾空格
+            input_path: 相對於 ComfyUI input 目錄的輸入文件路徑（可選），提供時代替 text 輸入
+            output_path: 相對於 ComfyUI output 目錄的輸出文件路徑（可選），提供時把結果寫入文件
             
         返回:
-            tuple: (清理後的文字,)
+            tuple: (清理後的文字,)，寫入文件時為 (輸出文件路徑,)
         """
-        if not text:
-            return ("",)
+        options = (clean_commas, clean_spaces, remove_empty_lines, trim_lines)
+        # 只允許讀取 input 目錄、寫入 output 目錄內的文件
+        if input_path and input_path.strip():
+            input_path = resolve_data_path(input_path.strip(), get_comfyui_directory("input"))
+        else:
+            input_path = ""
+        if output_path and output_path.strip():
+            output_path = resolve_data_path(output_path.strip(), get_comfyui_directory("output"))
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        else:
+            output_path = ""
         
-        lines = text.split('\n')
-        cleaned_lines = []
+        if input_path:
+            # 文件模式：逐塊讀取、清理並寫出，內存佔用與文件大小無關
+            if output_path:
+                count = cleanup_lines_file(input_path, output_path, *options)
+                print(f"[TextCleanup] 已清理 {count} 行並寫入 {output_path}")
+                return (output_path,)
+            with open(input_path, "r", encoding="utf-8", newline="\n") as f:
+                text = f.read()
         
-        for line in lines:
-            cleaned_line = line
-            
-            # 清理逗號
-            if clean_commas:
-                # 移除連續逗號
-                cleaned_line = re.sub(r',(\s*,)+', ',', cleaned_line)
-                # 移除逗號前的空格
-                cleaned_line = re.sub(r'\s+,', ',', cleaned_line)
-                # 標準化逗號後的空格
-                cleaned_line = re.sub(r',\s*', ', ', cleaned_line)
-                # 移除行首行尾的逗號
-                cleaned_line = re.sub(r'^[\s,]+', '', cleaned_line)
-                cleaned_line = re.sub(r'[\s,]+$', '', cleaned_line)
-            
-            # 清理空格
-            if clean_spaces:
-                # 將多個空格轉為一個
-                cleaned_line = re.sub(r' +', ' ', cleaned_line)
-            
-            # 修剪每行
-            if trim_lines:
-                cleaned_line = cleaned_line.strip()
-            
-            # 如果不移除空行，或者該行非空，則加入結果
-            if not remove_empty_lines or cleaned_line:
-                cleaned_lines.append(cleaned_line)
-        
-        cleaned = '\n'.join(cleaned_lines)
+        # 按塊逐行清理，所有行一次完成逗號與空格處理，只有行首行尾修剪逐行進行
+        cleaned = cleanup_lines(text, *options)
+        if output_path:
+            with open(output_path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(cleaned)
+            return (output_path,)
+        return (cleaned,)
+
+
+def _first(values, default):
+    """列表模式下非列表參數也以列表傳入，取第一個值"""
+    if isinstance(values, list):
+        return values[0] if values else default
+    return values
+
+
+class TextCleanupBatchNode:
+    """
+    批量文字清理節點
+    輸入：文字列表（例如通配符展開的大量提示詞），整個列表在一次執行中處理
+    輸出：清理後的文字列表
+    """
+    
+    INPUT_IS_LIST = True
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        """
+        定義節點的輸入類型
+        """
+        return TextCleanupNode.INPUT_TYPES()
+    
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("清理後文字",)
+    OUTPUT_IS_LIST = (True,)
+    FUNCTION = "cleanup_text_batch"
+    CATEGORY = "utils"
+    
+    def cleanup_text_batch(self, text, remove_start_end_commas=True, normalize_spaces=True, tag_mode="off"):
+        """
+        批量清理文字，規則與 TextCleanupNode 相同
         
+        參數:
+            text: 文字列表
+            remove_start_end_commas: 是否移除開頭和結尾的逗號
+            normalize_spaces: 是否標準化空格
+            tag_mode: 標籤級處理方式，off / dedup / merge
+            
+        返回:
+            tuple: (清理後的文字列表,)
+        """
+        cleaned = cleanup_many(text, _first(remove_start_end_commas, True), _first(normalize_spaces, True))
+        tag_mode = _first(tag_mode, "off")
+        if tag_mode != "off":
+            cleaned = [normalize_tags(item, tag_mode) for item in cleaned]
         return (cleaned,)
 
 
+class TextCleanupAdvancedBatchNode:
+    """
+    批量進階文字清理節點
+    輸入：文字列表，整個列表在一次執行中處理
+    輸出：清理後的文字列表
+    """
+    
+    INPUT_IS_LIST = True
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        """
+        定義節點的輸入類型
+        """
+        # 文件路徑輸入只適用於單個文字，批量節點不提供
+        optional = dict(TextCleanupAdvancedNode.INPUT_TYPES()["optional"])
+        text = optional.pop("text")
+        optional.pop("input_path")
+        optional.pop("output_path")
+        return {"required": {"text": text}, "optional": optional}
+    
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("清理後文字",)
+    OUTPUT_IS_LIST = (True,)
+    FUNCTION = "cleanup_text_advanced_batch"
+    CATEGORY = "utils"
+    
+    def cleanup_text_advanced_batch(self, text, clean_commas=True, clean_spaces=True,
+                                    remove_empty_lines=False, trim_lines=True):
+        """
+        批量進階文字清理，規則與 TextCleanupAdvancedNode 相同
+        
+        返回:
+            tuple: (清理後的文字列表,)
+        """
+        options = (_first(clean_commas, True), _first(clean_spaces, True),
+                   _first(remove_empty_lines, False), _first(trim_lines, True))
+        return ([cleanup_lines(item, *options) for item in text],)
+
+
 # ComfyUI節點註冊
 NODE_CLASS_MAPPINGS = {
     "TextCleanupNode": TextCleanupNode,
     "TextCleanupAdvancedNode": TextCleanupAdvancedNode,
+    "TextCleanupBatchNode": TextCleanupBatchNode,
+    "TextCleanupAdvancedBatchNode": TextCleanupAdvancedBatchNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "TextCleanupNode": "Text Cleanup",
     "TextCleanupAdvancedNode": "Text Cleanup Adv",
+    "TextCleanupBatchNode": "Text Cleanup (Batch)",
+    "TextCleanupAdvancedBatchNode": "Text Cleanup Adv (Batch)",
 }
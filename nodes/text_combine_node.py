@@ -1,8 +1,66 @@
 """
 文字結合節點 - 允許多個文字輸入並合併
 支持動態添加輸入（最多10個），並可自定義分隔符
+可選按 CLIP token 預算截斷或捨棄輸入，並輸出合併後的 token 數（預算關閉時為快速近似值）
+批量節點把每個輸入的文字列表按笛卡爾積或逐項配對組合，在一次執行中輸出所有組合
 """
 
+import itertools
+import math
+
+from .text_cleanup_node import _first
+from .token_budget import chunk_count, count_joined, fit_to_budget
+
+
+# token 預算模式：off 不限制；truncate 截斷放不下的輸入；drop 捨棄放不下的輸入
+BUDGET_MODES = ("off", "truncate", "drop")
+
+
+def parse_priority(priority, count):
+    """
+    解析優先級字符串，例如 "3,1" 表示 text_3 最優先、其次 text_1
+
+    返回:
+        list: 0 起始的輸入序號列表（忽略無效或重複的項目）
+    """
+    order = []
+    for part in (priority or "").replace("，", ",").split(","):
+        part = part.strip()
+        if part.isdigit() and 1 <= int(part) <= count and int(part) - 1 not in order:
+            order.append(int(part) - 1)
+    return order
+
+
+# 批量組合模式：product 所有輸入的笛卡爾積；zip 按位置逐項配對，只有一項的輸入會重複使用
+COMBINE_MODES = ("product", "zip")
+
+
+def iter_combinations(pools, mode="product"):
+    """
+    惰性生成各輸入文字的組合，不會預先構建全部組合
+
+    參數:
+        pools: 每個輸入的文字列表
+        mode: product / zip
+
+    返回:
+        tuple: (組合的迭代器, 組合總數)
+    """
+    if mode == "zip":
+        # 只有一項的輸入廣播到每個組合，其餘按最短的列表截斷；有空輸入時沒有任何組合
+        if not pools or not all(pools):
+            return iter(()), 0
+        lengths = [len(pool) for pool in pools if len(pool) > 1]
+        if not lengths:
+            return iter([tuple(pool[0] for pool in pools)]), 1
+        total = min(lengths)
+        if len(set(lengths)) > 1:
+            print(f"[TextCombine] 警告: zip 模式下輸入長度不一致 {lengths}，按最短的 {total} 項配對")
+        columns = [pool if len(pool) > 1 else itertools.repeat(pool[0]) for pool in pools]
+        return itertools.islice(zip(*columns), total), total
+    return itertools.product(*pools), math.prod(len(pool) for pool in pools)
+
+
 class TextCombineNode:
     """
     文字結合節點
@@ -25,24 +83,42 @@ class TextCombineNode:
                     "multiline": False,
                     "default": "\n",
                 }),
+                "budget_mode": (list(BUDGET_MODES), {
+                    "default": "off",
+                    "tooltip": "超出 token 預算時：truncate 按標籤截斷放不下的輸入，drop 捨棄放不下的輸入"
+                }),
+                "max_chunks": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 32,
+                    "tooltip": "最多使用的 77-token 塊數，每多一塊 CLIP 需要多一次編碼"
+                }),
+                "priority": ("STRING", {
+                    "multiline": False,
+                    "default": "",
+                    "tooltip": "預算不足時的優先級，例如 3,1 表示 text_3 最優先；設置後按優先級順序輸出"
+                }),
             },
         }
     
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("合併文字",)
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("合併文字", "token_count")
     FUNCTION = "combine_texts"
     CATEGORY = "utils"
     
-    def combine_texts(self, separator="\n", **kwargs):
+    def combine_texts(self, separator="\n", budget_mode="off", max_chunks=1, priority="", **kwargs):
         """
         合併所有輸入的文字，使用指定的分隔符
         
         參數:
             separator: 分隔符字符串
+            budget_mode: token 預算模式，off / truncate / drop
+            max_chunks: 最多使用的 77-token 塊數
+            priority: 預算不足時的優先級（以逗號分隔的輸入序號）
             **kwargs: 所有動態輸入的文字 (text_1, text_2, ...)
             
         返回:
-            tuple: (合併後的文字,)
+            tuple: (合併後的文字, token 數)
         """
         # 收集所有輸入（從 text_1, text_2, ...）
         texts = []
@@ -51,21 +127,114 @@ class TextCombineNode:
         text_keys = sorted([k for k in kwargs.keys() if k.startswith("text_")], 
                           key=lambda x: int(x.split("_")[1]) if "_" in x else 0)
         
+        # 優先級按輸入序號指定，空輸入在篩選後仍保留原序號
+        numbers = []
         for key in text_keys:
             val = kwargs[key]
             if val and isinstance(val, str) and val.strip():
                 texts.append(val)
+                numbers.append(int(key.split("_")[1]))
+        
+        if budget_mode != "off":
+            order = [numbers.index(n + 1) for n in parse_priority(priority, max(numbers, default=0))
+                     if n + 1 in numbers]
+            texts = fit_to_budget(texts, separator, max_chunks, order, budget_mode)
         
         # 使用分隔符合併文字
         combined = separator.join(texts)
-        return (combined,)
+        # 按輸入片段計數；預算關閉時只用近似計數，不調用較慢的真實分詞器
+        tokens = count_joined(texts, separator, exact=budget_mode != "off")
+        if budget_mode != "off" and chunk_count(tokens) > max_chunks:
+            print(f"[TextCombine] 警告: 合併後約 {tokens} 個 token，超出 {max_chunks} 塊的預算")
+        return (combined, tokens)
+
+
+class TextCombineBatchNode:
+    """
+    批量文字結合節點
+    輸入：多個文字列表連接輸入（最多10個），例如各種提示詞變體
+    輸出：所有組合合併後的文字列表，一次執行生成整個提示詞網格
+    """
+    
+    INPUT_IS_LIST = True
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        """
+        定義節點的輸入類型
+        """
+        types = TextCombineNode.INPUT_TYPES()
+        types["optional"] = {
+            "combine_mode": (list(COMBINE_MODES), {
+                "default": "product",
+                "tooltip": "product 生成所有輸入的笛卡爾積；zip 按位置逐項配對"
+            }),
+            "max_outputs": ("INT", {
+                "default": 256,
+                "min": 1,
+                "max": 10000,
+                "tooltip": "最多輸出的組合數，超出的組合不會生成"
+            }),
+            **types["optional"],
+        }
+        return types
+    
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("合併文字", "token_count")
+    OUTPUT_IS_LIST = (True, True)
+    FUNCTION = "combine_texts_batch"
+    CATEGORY = "utils"
+    
+    def combine_texts_batch(self, combine_mode="product", max_outputs=256, separator="\n", budget_mode="off",
+                            max_chunks=1, priority="", **kwargs):
+        """
+        組合所有輸入的文字列表，每個組合按 TextCombineNode 的規則合併
+        
+        參數:
+            combine_mode: 組合模式，product / zip
+            max_outputs: 最多輸出的組合數
+            separator: 分隔符字符串
+            budget_mode: token 預算模式，off / truncate / drop
+            max_chunks: 最多使用的 77-token 塊數
+            priority: 預算不足時的優先級（以逗號分隔的輸入序號）
+            **kwargs: 所有動態輸入的文字列表 (text_1, text_2, ...)
+            
+        返回:
+            tuple: (合併後的文字列表, token 數列表)
+        """
+        text_keys = sorted([k for k in kwargs.keys() if k.startswith("text_")],
+                          key=lambda x: int(x.split("_")[1]) if "_" in x else 0)
+        pools = [[val for val in kwargs[key] if isinstance(val, str)] for key in text_keys]
+        max_outputs = _first(max_outputs, 256)
+        
+        combinations, total = iter_combinations(pools, _first(combine_mode, "product"))
+        if total > max_outputs:
+            print(f"[TextCombine] 警告: 共 {total} 個組合，只輸出前 {max_outputs} 個")
+        
+        combiner = TextCombineNode()
+        options = {
+            "separator": _first(separator, "\n"),
+            "budget_mode": _first(budget_mode, "off"),
+            "max_chunks": _first(max_chunks, 1),
+            "priority": _first(priority, ""),
+        }
+        texts = []
+        tokens = []
+        # 只生成上限以內的組合
+        for combination in itertools.islice(combinations, max_outputs):
+            combined, count = combiner.combine_texts(**options, **dict(zip(text_keys, combination)))
+            texts.append(combined)
+            tokens.append(count)
+        return (texts, tokens)
 
 
 # ComfyUI節點註冊
 NODE_CLASS_MAPPINGS = {
-    "TextCombineNode": TextCombineNode
+    "TextCombineNode": TextCombineNode,
+    "TextCombineBatchNode": TextCombineBatchNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "TextCombineNode": "Text Combine"
+    "TextCombineNode": "Text Combine",
+    "TextCombineBatchNode": "Text Combine (Batch)",
 }
@@ -0,0 +1,184 @@
+"""
+Token 預算 - 估算 CLIP token 數並把多段文字裁剪到指定的 77-token 塊數以內
+
+CLIP 每塊可容納 75 個內容 token（加上起止 token 共 77），超出時需要額外的編碼器前向計算。
+計數方式：
+    能導入 transformers 且找到 ComfyUI 自帶的 sd1_tokenizer 時使用真實的 CLIP 分詞器
+    否則使用快速近似：按 CLIP 的預分詞規則切詞，再按詞長估算 BPE 片段數
+兩種方式都會先去掉 ComfyUI 的權重語法 (tag:1.2)，並按片段緩存計數結果。
+合併後的文字不整段計數，而是逐片段計數再加上分隔符的 token 數，只有片段會進入緩存
+"""
+
+import functools
+import math
+import os
+import re
+
+from .text_cleanup_engine import split_tags
+
+try:
+    from transformers import CLIPTokenizer
+except ImportError:
+    CLIPTokenizer = None
+
+
+# 每塊可容納的內容 token 數
+TOKENS_PER_CHUNK = 75
+
+# 近似計數：不超過此長度的詞視為單個 token，更長的詞按每 token 約 4 個字符估算
+SINGLE_TOKEN_WORD = 6
+CHARS_PER_TOKEN = 4
+
+# 片段計數緩存的大小
+FRAGMENT_CACHE_SIZE = 65536
+
+# 權重語法：(tag:1.2) 中的 ":1.2"，以及未轉義的括號
+_WEIGHT_SUFFIX = re.compile(r':\s*[+-]?(?:\d+(?:\.\d*)?|\.\d+)\s*(?=\))')
+_UNESCAPED_PAREN = re.compile(r'(?<!\\)[()]')
+# CLIP 的預分詞規則（以 Python re 近似 \p{L} 與 \p{N}）
+_CLIP_WORDS = re.compile(r"'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|[^\s\w]+|_", re.IGNORECASE)
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def _load_tokenizer():
+    """載入 ComfyUI 自帶的 CLIP 分詞器，不可用時返回 None"""
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+    _tokenizer_loaded = True
+    if CLIPTokenizer is None:
+        return None
+    try:
+        import comfy.sd1_clip
+        path = os.path.join(os.path.dirname(os.path.realpath(comfy.sd1_clip.__file__)), "sd1_tokenizer")
+        _tokenizer = CLIPTokenizer.from_pretrained(path)
+    except Exception as e:
+        print(f"[TokenBudget] 無法載入 CLIP 分詞器，改用近似計數: {e}")
+        _tokenizer = None
+    return _tokenizer
+
+
+def strip_weights(text):
+    """去掉 ComfyUI 在分詞前就會解析掉的權重語法"""
+    if '(' not in text and ')' not in text:
+        return text
+    return _UNESCAPED_PAREN.sub(' ', _WEIGHT_SUFFIX.sub('', text)).replace('\\(', '(').replace('\\)', ')')
+
+
+def approximate_tokens(text):
+    """按 CLIP 預分詞規則切詞並估算 BPE 片段數"""
+    count = 0
+    for word in _CLIP_WORDS.findall(text.lower()):
+        if len(word) <= SINGLE_TOKEN_WORD:
+            count += 1
+        else:
+            count += math.ceil(len(word) / CHARS_PER_TOKEN)
+    return count
+
+
+@functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def count_tokens(text):
+    """
+    計算一段文字的內容 token 數（不含起止 token），結果按文字緩存
+
+    返回:
+        int: token 數
+    """
+    text = strip_weights(text)
+    tokenizer = _load_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+    return approximate_tokens(text)
+
+
+@functools.lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def estimate_tokens(text):
+    """與 count_tokens 相同，但總是使用快速近似，不載入真實分詞器"""
+    return approximate_tokens(strip_weights(text))
+
+
+def separator_tokens(separator, counter=count_tokens):
+    """分隔符的 token 數，純空白的分隔符不產生 token"""
+    return counter(separator) if separator.strip() else 0
+
+
+def count_joined(texts, separator, exact=True):
+    """
+    計算以分隔符合併後的 token 數：逐片段計數再加上分隔符
+
+    參數:
+        texts: 文字片段列表
+        separator: 合併用的分隔符
+        exact: 是否使用真實分詞器（可用時）；False 時總是使用快速近似
+
+    返回:
+        int: token 數
+    """
+    if not texts:
+        return 0
+    counter = count_tokens if exact else estimate_tokens
+    return sum(counter(text) for text in texts) + separator_tokens(separator, counter) * (len(texts) - 1)
+
+
+def chunk_count(tokens):
+    """token 數對應的 77-token 塊數（至少一塊）"""
+    return max(1, math.ceil(tokens / TOKENS_PER_CHUNK))
+
+
+def truncate_to_tokens(text, budget):
+    """
+    按標籤（頂層逗號）截斷文字，使 token 數不超過預算
+
+    返回:
+        tuple: (截斷後的文字, token 數)；一個標籤都放不下時返回 ("", 0)
+    """
+    kept = []
+    used = 0
+    for tag in split_tags(text):
+        # 標籤之間的逗號也佔一個 token
+        cost = count_tokens(tag) + (1 if kept else 0)
+        if used + cost > budget:
+            break
+        kept.append(tag)
+        used += cost
+    return ", ".join(kept), used
+
+
+def fit_to_budget(texts, separator, max_chunks, priority=None, mode="truncate"):
+    """
+    按優先級選取文字，使合併後的 token 數不超過 max_chunks 個塊
+
+    參數:
+        texts: 文字列表（按輸入順序）
+        separator: 合併用的分隔符
+        max_chunks: 最大塊數
+        priority: 優先級順序（texts 的索引列表），未列出的按原順序排在後面
+        mode: truncate 截斷放不下的文字；drop 捨棄放不下的文字並嘗試後面較短的文字
+
+    返回:
+        list: 按優先級排列的入選文字
+    """
+    budget = max_chunks * TOKENS_PER_CHUNK
+    order = list(priority or [])
+    order += [i for i in range(len(texts)) if i not in order]
+    separator_cost = separator_tokens(separator)
+
+    selected = []
+    used = 0
+    for index in order:
+        text = texts[index]
+        cost = count_tokens(text) + (separator_cost if selected else 0)
+        if used + cost <= budget:
+            selected.append(text)
+            used += cost
+            continue
+        if mode == "truncate":
+            remaining = budget - used - (separator_cost if selected else 0)
+            truncated, tokens = truncate_to_tokens(text, remaining)
+            if truncated:
+                selected.append(truncated)
+                used += tokens + (separator_cost if len(selected) > 1 else 0)
+            break
+    return selected
@@ -0,0 +1,320 @@
+"""
+觸發詞存儲 - Lora 選擇器節點與 API 共享的觸發詞存儲
+配置常駐內存，每次修改只向日誌文件追加一行，累積到一定數量後壓縮回 JSON 主文件
+主文件以臨時文件加原子重命名的方式寫入，所有讀寫都在同一把鎖下進行
+啟動時重放日誌以恢復未壓縮的修改；運行中主文件被外部修改時以主文件為準並清空日誌，
+因此外部編輯前尚未壓縮的修改會被捨棄
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+
+from .changelog import Changelog
+
+
+# 觸發詞配置文件路徑
+TRIGGER_WORDS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "lora_trigger_words.json")
+
+# 日誌累積到此條數時壓縮回主文件
+COMPACT_THRESHOLD = 500
+
+
+def atomic_write_json(path, data):
+    """先寫入同目錄的臨時文件並同步到磁盤，再原子替換目標文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class TriggerWordStore:
+    """
+    觸發詞存儲
+    主文件保存壓縮後的完整配置，日誌文件（每行一個 {"k": 名稱, "v": 觸發詞或 null}）保存之後的修改
+    """
+
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._data = {}
+        self._snapshot = None
+        self._stat = None
+        self._loaded = False
+        self._journal_lines = 0
+        self._journal_torn = False
+        self._changelog = Changelog()
+
+    # ---------- 文件讀寫 ----------
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _read_file(self, replay=True):
+        """
+        讀取主文件並重放日誌
+
+        參數:
+            replay: 是否重放日誌；False 時只讀取主文件
+
+        返回:
+            dict 或 None: 觸發詞配置，主文件無法解析時返回 None
+        """
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"[TriggerWordStore] 載入觸發詞配置失敗: {e}")
+                return None
+
+        lines = 0
+        torn = False
+        if replay and os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # 寫入中斷留下的不完整行，下次追加前先換行
+                            torn = True
+                            continue
+                        if record.get("v"):
+                            data[record["k"]] = record["v"]
+                        else:
+                            data.pop(record["k"], None)
+                        lines += 1
+            except Exception as e:
+                print(f"[TriggerWordStore] 重放觸發詞日誌失敗: {e}")
+        self._journal_lines = lines
+        self._journal_torn = torn
+        return data
+
+    def _append_journal(self, changes):
+        """把一批修改一次性追加到日誌"""
+        payload = "".join(
+            json.dumps({"k": name, "v": word}, ensure_ascii=False) + "\n"
+            for name, word in changes
+        )
+        if self._journal_torn:
+            payload = "\n" + payload
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_torn = False
+        self._journal_lines += len(changes)
+
+    def _truncate_journal(self):
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+        self._journal_lines = 0
+        self._journal_torn = False
+
+    def _reload_if_changed(self):
+        """
+        主文件被外部修改（或首次訪問）時重新載入，並把差異記入變動日誌
+        首次載入時重放日誌；之後主文件被外部修改時以主文件為準並清空日誌，避免舊日誌覆蓋外部編輯
+        """
+        st = self._file_stat()
+        if self._loaded and st == self._stat:
+            return
+        external = self._loaded
+        discarded = self._journal_lines
+        data = self._read_file(replay=not external)
+        if data is None:
+            return
+        if external:
+            if discarded:
+                print(f"[TriggerWordStore] 觸發詞配置已被外部修改，捨棄 {discarded} 條未壓縮的修改")
+            try:
+                self._truncate_journal()
+            except OSError as e:
+                print(f"[TriggerWordStore] 清空觸發詞日誌失敗: {e}")
+        old = self._data
+        changes = [(name, word) for name, word in data.items() if old.get(name) != word]
+        changes.extend((name, None) for name in old if name not in data)
+        self._data = data
+        self._stat = st
+        self._loaded = True
+        self._record(changes)
+
+    def _record(self, changes):
+        if changes:
+            self._snapshot = None
+            self._changelog.record(changes)
+
+    @staticmethod
+    def _apply_pending(data, pending):
+        for lora_name, word in pending.items():
+            if word is None:
+                data.pop(lora_name, None)
+            else:
+                data[lora_name] = word
+
+    def _write_base(self, data):
+        """原子寫入主文件，成功後清空日誌"""
+        atomic_write_json(self.path, data)
+        # 主文件已包含全部修改，之後才清空日誌；中途中斷時重放日誌結果相同
+        self._truncate_journal()
+        self._stat = self._file_stat()
+
+    def compact(self):
+        """
+        把內存中的完整配置原子寫回主文件並清空日誌
+
+        返回:
+            bool: 是否成功
+        """
+        with self._lock:
+            if not self._loaded or self._journal_lines == 0:
+                return True
+            try:
+                self._write_base(self._data)
+                return True
+            except Exception as e:
+                print(f"[TriggerWordStore] 壓縮觸發詞配置失敗: {e}")
+                return False
+
+    # ---------- 對外接口 ----------
+
+    def snapshot(self):
+        """
+        原子地獲取版本標記與觸發詞配置
+
+        返回:
+            tuple: (版本標記, 觸發詞字典)，字典為只讀快照，每個版本只複製一次
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if self._snapshot is None:
+                self._snapshot = dict(self._data)
+            return self._changelog.token, self._snapshot
+
+    @property
+    def version(self):
+        """當前版本標記"""
+        with self._lock:
+            return self._changelog.token
+
+    def get_all(self):
+        """獲取所有觸發詞配置（只讀快照）"""
+        return self.snapshot()[1]
+
+    def get(self, lora_name):
+        """獲取指定 Lora 的觸發詞，不存在時返回空字符串"""
+        with self._lock:
+            self._reload_if_changed()
+            return self._data.get(lora_name, "")
+
+    def get_many(self, lora_names):
+        """獲取多個 Lora 的觸發詞，返回與輸入順序對應的列表"""
+        with self._lock:
+            self._reload_if_changed()
+            return [self._data.get(name, "") for name in lora_names]
+
+    def apply(self, updates):
+        """
+        在一個事務中套用多個修改，只追加一次日誌
+
+        參數:
+            updates: [(Lora 名稱, 觸發詞)]，觸發詞為空表示刪除
+
+        返回:
+            bool: 是否保存成功；失敗時內存中的配置保持不變
+        """
+        with self._lock:
+            self._reload_if_changed()
+            changes = []
+            pending = {}
+            for lora_name, trigger_word in updates:
+                word = trigger_word or None
+                current = pending[lora_name] if lora_name in pending else self._data.get(lora_name)
+                if current != word:
+                    pending[lora_name] = word
+                    changes.append((lora_name, word))
+            if not changes:
+                return True
+
+            data = self._data
+            # 日誌將達到壓縮閾值時（例如批量導入）直接寫出新的主文件，不再逐行寫日誌
+            if self._journal_lines + len(changes) >= self.compact_threshold:
+                data = dict(self._data)
+            try:
+                if data is self._data:
+                    self._append_journal(changes)
+                else:
+                    self._apply_pending(data, pending)
+                    self._write_base(data)
+            except Exception as e:
+                print(f"[TriggerWordStore] 保存觸發詞配置失敗: {e}")
+                return False
+            if data is self._data:
+                self._apply_pending(data, pending)
+            else:
+                self._data = data
+            self._record(changes)
+            return True
+
+    def set(self, lora_name, trigger_word):
+        """
+        更新單個 Lora 的觸發詞，觸發詞為空時刪除
+
+        返回:
+            bool: 是否保存成功
+        """
+        return self.apply([(lora_name, trigger_word)])
+
+    def changes_since(self, since):
+        """
+        計算自指定版本以來的淨變動
+
+        參數:
+            since: 客戶端持有的版本標記
+
+        返回:
+            tuple 或 None: (當前版本標記, 更新的 {名稱: 觸發詞}, 刪除的名稱列表)，
+            版本無效或變動記錄已被淘汰時返回 None
+        """
+        with self._lock:
+            self._reload_if_changed()
+            changes = self._changelog.since(since)
+            if changes is None:
+                return None
+            updated = {}
+            removed = set()
+            for name, word in changes:
+                if word is None:
+                    updated.pop(name, None)
+                    removed.add(name)
+                else:
+                    updated[name] = word
+                    removed.discard(name)
+            return self._changelog.token, updated, sorted(removed)
+
+
+# 進程內共享的觸發詞存儲
+trigger_word_store = TriggerWordStore(TRIGGER_WORDS_FILE)
+
+# 正常退出時把日誌壓縮回主文件，保持 JSON 文件可直接閱讀與編輯
+atexit.register(trigger_word_store.compact)
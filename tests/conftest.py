@@ -0,0 +1,9 @@
+"""
+測試共用設置：把倉庫根目錄加入 sys.path，以 nodes 包的形式導入各模組
+（倉庫根目錄本身是 ComfyUI 的插件包，導入它需要 ComfyUI 的 server 模組）
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
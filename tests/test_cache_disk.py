@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from nodes import cache_disk
+from nodes.cache_disk import DiskTier
+from nodes.cache_node import CacheNode
+from nodes.cache_store import CacheStore
+
+
+VALUE = {"image": torch.arange(12, dtype=torch.float32).reshape(3, 4), "empty": torch.zeros(0), "label": "x"}
+
+
+@pytest.fixture(params=[True, False], ids=["mmap", "read"])
+def disk(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_disk, "MEMORY_MAP", request.param)
+    return DiskTier(str(tmp_path), max_bytes=0)
+
+
+def test_round_trip(disk):
+    assert disk.save("a", VALUE)
+    value, header = disk.load("a")
+    assert header["name"] == "a"
+    assert torch.equal(value["image"], VALUE["image"])
+    assert value["empty"].shape == (0,)
+    assert value["label"] == "x"
+
+
+def test_loaded_value_does_not_hold_file(disk):
+    """不映射時載入的值與文件無關，文件可直接替換或刪除"""
+    disk.save("a", VALUE)
+    value, _ = disk.load("a")
+    value["image"] += 1
+    assert torch.equal(disk.load("a")[0]["image"], VALUE["image"])
+    assert disk.save("a", {"image": torch.ones(2)})
+    assert disk.remove("a")
+    assert disk.load("a") is None
+
+
+def _locked(path):
+    raise PermissionError(path)
+
+
+def test_remove_reports_failure(disk, monkeypatch):
+    assert disk.remove("missing")
+    disk.save("a", VALUE)
+    monkeypatch.setattr(cache_disk.os, "remove", _locked)
+    assert not disk.remove("a")
+    assert os.path.exists(disk.path_for("a"))
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch):
+    monkeypatch.setattr(CacheNode, "_cache", CacheStore())
+    monkeypatch.setattr(CacheNode, "_disk", DiskTier(str(tmp_path), max_bytes=0))
+    return CacheNode()
+
+
+def test_failed_persist_drops_stale_copy(node):
+    node.execute("n", VALUE, persist=True)
+    assert CacheNode._disk.peek("n") is not None
+    # 不支持寫盤的值：舊的磁盤副本必須刪除
+    node.execute("n", {"model": object()}, persist=True)
+    assert CacheNode._disk.peek("n") is None
+
+
+def test_stale_copy_that_cannot_be_removed_warns(node, monkeypatch, capsys):
+    node.execute("n", VALUE, persist=True)
+    monkeypatch.setattr(cache_disk.os, "remove", _locked)
+    node.execute("n", VALUE)
+    assert "無法刪除" in capsys.readouterr().out
@@ -0,0 +1,31 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from nodes.cache_fingerprint import fingerprint
+
+
+def test_identity_is_stable_for_same_tensor():
+    x = torch.arange(16.0).reshape(4, 4)
+    assert fingerprint(x) == fingerprint(x)
+    assert fingerprint(x) == fingerprint(x.view(4, 4))
+
+
+def test_identity_distinguishes_strided_views():
+    x = torch.arange(16.0).reshape(4, 4)
+    assert x.t().shape == x.shape
+    assert fingerprint(x) != fingerprint(x.t())
+
+
+def test_identity_distinguishes_offset_views():
+    x = torch.arange(16.0)
+    a, b = x[:8], x[8:]
+    assert fingerprint(a) != fingerprint(b)
+    assert fingerprint(x.as_strided((4,), (1,), 0)) != fingerprint(x.as_strided((4,), (2,), 0))
+
+
+def test_identity_changes_after_in_place_update():
+    x = torch.zeros(4)
+    before = fingerprint(x)
+    x.add_(1)
+    assert fingerprint(x) != before
@@ -0,0 +1,155 @@
+"""以本地 http.server 作为远端服务器测试响应缓存"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from nodes.http_cache import CacheMiss, HttpCache, ResponseTooLarge
+
+
+class Origin:
+    """记录请求并可修改内容的远端服务器状态"""
+
+    def __init__(self):
+        self.body = b"image v1"
+        self.etag = '"v1"'
+        self.requests = []
+        self.status = 200
+
+
+def _handler(origin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            origin.requests.append((self.path, dict(self.headers)))
+            if self.path == "/stream":
+                # 不声明 Content-Length 的分块响应
+                self.send_response(200)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for _ in range(8):
+                    self.wfile.write(b"400\r\n" + b"x" * 1024 + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            if origin.status != 200:
+                self._reply(origin.status, b"")
+            elif self.headers.get("If-None-Match") == origin.etag:
+                self._reply(304, None)
+            else:
+                self._reply(200, origin.body)
+
+        def _reply(self, status, body):
+            self.send_response(status)
+            self.send_header("ETag", origin.etag)
+            self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def origin():
+    state = Origin()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def _cache(tmp_path, **options):
+    return HttpCache(str(tmp_path / "http"), max_bytes=0, **options)
+
+
+def test_fresh_entry_skips_network(origin, session, tmp_path):
+    cache = _cache(tmp_path, ttl=3600)
+    assert cache.fetch(session, origin.url + "/a") == b"image v1"
+    assert cache.fetch(session, origin.url + "/a") == b"image v1"
+    assert len(origin.requests) == 1
+
+
+def test_stale_entry_revalidates_with_etag(origin, session, tmp_path):
+    cache = _cache(tmp_path, ttl=0)
+    cache.fetch(session, origin.url + "/a")
+    assert cache.fetch(session, origin.url + "/a") == b"image v1"
+    headers = origin.requests[-1][1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    origin.body, origin.etag = b"image v2", '"v2"'
+    assert cache.fetch(session, origin.url + "/a") == b"image v2"
+    assert cache.lookup(origin.url + "/a")[1]["etag"] == '"v2"'
+
+
+def test_not_modified_refreshes_ttl(origin, session, tmp_path):
+    cache = _cache(tmp_path, ttl=3600)
+    url = origin.url + "/a"
+    cache.fetch(session, url)
+    # 把获取时间改到 TTL 之前
+    meta_path = cache._paths(url)[1]
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(dict(meta, fetched=0), f)
+    assert cache.fetch(session, url) == b"image v1"
+    assert len(origin.requests) == 2
+    assert cache.is_fresh(cache.lookup(url)[1])
+
+
+def test_offline_mode(origin, session, tmp_path):
+    cache = _cache(tmp_path, ttl=0)
+    cache.fetch(session, origin.url + "/a")
+    assert cache.fetch(session, origin.url + "/a", mode="offline") == b"image v1"
+    with pytest.raises(CacheMiss):
+        cache.fetch(session, origin.url + "/missing", mode="offline")
+    assert len(origin.requests) == 1
+
+
+def test_server_error_falls_back_to_cache(origin, session, tmp_path):
+    cache = _cache(tmp_path, ttl=0)
+    cache.fetch(session, origin.url + "/a")
+    origin.status = 500
+    assert cache.fetch(session, origin.url + "/a") == b"image v1"
+    with pytest.raises(requests.HTTPError):
+        cache.fetch(session, origin.url + "/b")
+
+
+def test_bypass_neither_reads_nor_writes(origin, session, tmp_path):
+    cache = _cache(tmp_path, ttl=3600)
+    cache.fetch(session, origin.url + "/a")
+    origin.body = b"image v2"
+    assert cache.fetch(session, origin.url + "/a", mode="bypass") == b"image v2"
+    assert cache.lookup(origin.url + "/a")[0] == b"image v1"
+
+
+def test_declared_length_over_limit(origin, session, tmp_path):
+    cache = _cache(tmp_path, max_response_bytes=4)
+    with pytest.raises(ResponseTooLarge):
+        cache.fetch(session, origin.url + "/a")
+    assert cache.lookup(origin.url + "/a") is None
+
+
+def test_streamed_length_over_limit(origin, session, tmp_path):
+    cache = _cache(tmp_path, max_response_bytes=4096)
+    with pytest.raises(ResponseTooLarge):
+        cache.fetch(session, origin.url + "/stream")
+    assert _cache(tmp_path, max_response_bytes=0).fetch(session, origin.url + "/stream") == b"x" * 8192
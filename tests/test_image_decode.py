@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+from PIL import Image
+
+from nodes import image_decode
+from nodes.image_decode import pil_to_tensor
+
+
+def legacy_to_tensor(img):
+    """原来的转换写法"""
+    return torch.from_numpy(np.array(img).astype(np.float32) / 255.0)
+
+
+@pytest.fixture(params=[(1, 1), (64, 48), (513, 257)], ids=lambda size: f"{size[0]}x{size[1]}")
+def image(request):
+    width, height = request.param
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), "RGB")
+
+
+def test_float32_matches_legacy_bit_for_bit(image):
+    tensor = pil_to_tensor(image)
+    assert tensor.dtype == torch.float32
+    assert tensor.shape == (image.height, image.width, 3)
+    assert torch.equal(tensor, legacy_to_tensor(image))
+
+
+def test_uint8_keeps_raw_pixels(image):
+    tensor = pil_to_tensor(image, "uint8")
+    assert tensor.dtype == torch.uint8
+    assert np.array_equal(tensor.numpy(), np.asarray(image))
+
+
+def test_result_is_writable_copy(image):
+    tensor = pil_to_tensor(image, "uint8")
+    tensor.zero_()
+    assert np.asarray(image).any()
+
+
+def test_pin_memory_ignored_without_cuda(image, monkeypatch):
+    monkeypatch.setattr(image_decode, "_pin_available", lambda: False)
+    assert torch.equal(pil_to_tensor(image, pin_memory=True), legacy_to_tensor(image))
@@ -0,0 +1,93 @@
+import threading
+import time
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("requests")
+from PIL import Image
+
+from nodes.image_download_node import ImageDownloadNode, open_image
+
+
+def _encode(img, fmt, **params):
+    buf = BytesIO()
+    img.save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+def _gradient(width=200, height=100):
+    img = Image.new("RGB", (width, height))
+    img.putdata([(x % 256, y % 256, (x + y) % 256) for y in range(height) for x in range(width)])
+    return img
+
+
+@pytest.mark.parametrize("mode, fmt, params", [
+    ("P", "PNG", {}),
+    ("P", "PNG", {"transparency": 0}),
+    ("P", "GIF", {}),
+    ("1", "PNG", {}),
+    ("1", "TIFF", {}),
+    ("I;16", "PNG", {}),
+    ("L", "PNG", {}),
+    ("RGBA", "PNG", {}),
+])
+@pytest.mark.parametrize("max_side, max_pixels, expected", [
+    (40, 0, (40, 20)),
+    (0, 50 * 25, (50, 25)),
+])
+def test_open_image_downscales_every_mode(mode, fmt, params, max_side, max_pixels, expected):
+    source = _gradient()
+    img = source.convert(mode) if mode != "I;16" else source.convert("L").convert("I;16")
+    result = open_image(_encode(img, fmt, **params), max_side=max_side, max_pixels=max_pixels)
+    assert result.mode == "RGB"
+    assert result.size == expected
+
+
+def test_open_image_keeps_small_palette_image():
+    img = _gradient(32, 16).convert("P")
+    result = open_image(_encode(img, "PNG"), max_side=64)
+    assert result.size == (32, 16)
+    assert result.tobytes() == img.convert("RGB").tobytes()
+
+
+def test_is_changed_bypass_does_not_download(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("bypass 模式不应在 IS_CHANGED 中下载")
+
+    monkeypatch.setattr(ImageDownloadNode, "fetch_bytes", staticmethod(fail))
+    result = ImageDownloadNode.IS_CHANGED("http://example.invalid/a.png", cache_mode="bypass")
+    assert result != result
+
+
+def test_is_changed_fetches_concurrently(monkeypatch):
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def fetch_bytes(url, proxy="", cache_mode="enabled"):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+        return url.encode()
+
+    monkeypatch.setattr(ImageDownloadNode, "fetch_bytes", staticmethod(fetch_bytes))
+    urls = "\n".join(f"http://example.invalid/{i}.png" for i in range(16))
+    first = ImageDownloadNode.IS_CHANGED(urls)
+    assert state["peak"] > 1
+    assert first == ImageDownloadNode.IS_CHANGED(urls)
+    assert first != ImageDownloadNode.IS_CHANGED(urls + "\nhttp://example.invalid/extra.png")
+
+
+def test_is_changed_failure_forces_rerun(monkeypatch):
+    def fetch_bytes(url, proxy="", cache_mode="enabled"):
+        if "bad" in url:
+            raise ConnectionError(url)
+        return url.encode()
+
+    monkeypatch.setattr(ImageDownloadNode, "fetch_bytes", staticmethod(fetch_bytes))
+    result = ImageDownloadNode.IS_CHANGED("http://example.invalid/ok.png\nhttp://example.invalid/bad.png")
+    assert result != result
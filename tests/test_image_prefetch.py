@@ -0,0 +1,107 @@
+import time
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("requests")
+from PIL import Image
+
+from nodes import image_download_node, image_prefetch
+from nodes.cache_store import CacheStore
+from nodes.image_download_node import ImageDownloadNode
+from nodes.image_prefetch import ImagePrefetcher
+
+
+def _png(value):
+    buf = BytesIO()
+    Image.new("RGB", (8, 8), (value, 0, 0)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+IMAGES = {f"http://example.test/{i}.png": _png(i) for i in range(10)}
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    cache = CacheStore(max_entries=8, max_cpu_bytes=0, max_device_bytes=0)
+    monkeypatch.setattr(image_download_node, "_decoded", cache)
+    monkeypatch.setattr(ImageDownloadNode, "fetch_bytes", staticmethod(lambda url, proxy="", cache_mode="": IMAGES[url]))
+    return cache
+
+
+def _drain(prefetcher):
+    deadline = time.monotonic() + 10
+    while prefetcher.status()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not prefetcher.status()["pending"]
+
+
+def test_decodes_only_within_budget(decoded):
+    prefetcher = ImagePrefetcher(max_workers=1)
+    assert prefetcher.submit(list(IMAGES)) == 10
+    _drain(prefetcher)
+    status = prefetcher.status()
+    assert status["completed"] == 10 and status["failed"] == 0
+    # 解码缓存 8 条的一半
+    assert len(decoded) == 4
+    assert status["bytes_only"] == 6
+
+
+def test_consumed_results_free_the_budget(decoded):
+    prefetcher = ImagePrefetcher(max_workers=1)
+    urls = list(IMAGES)
+    prefetcher.submit(urls[:4])
+    _drain(prefetcher)
+    for url in urls[:4]:
+        ImageDownloadNode().fetch_image(url)
+
+    prefetcher.submit(urls[4:8])
+    _drain(prefetcher)
+    assert prefetcher.status()["bytes_only"] == 0
+    assert len(decoded) == 8
+
+
+def test_byte_budget(decoded):
+    # 每张 8x8x3 float32 图片 768 字节，预算一半即 1536 字节，可容纳两张
+    decoded.max_cpu_bytes = 3072
+    prefetcher = ImagePrefetcher(max_workers=1)
+    prefetcher.submit(list(IMAGES)[:5])
+    _drain(prefetcher)
+    assert prefetcher.status()["bytes_only"] == 3
+
+
+def test_pending_queue_is_bounded(decoded, monkeypatch, capsys):
+    monkeypatch.setattr(image_prefetch, "MAX_PREFETCH_PENDING", 3)
+    prefetcher = ImagePrefetcher(max_workers=1)
+    prefetcher._pending.update({"a", "b"})
+    assert prefetcher.submit(list(IMAGES)) == 1
+    assert "跳过 9 个" in capsys.readouterr().out
+    with prefetcher._lock:
+        prefetcher._pending -= {"a", "b"}
+    _drain(prefetcher)
+
+
+def test_options_are_validated(decoded):
+    prefetcher = ImagePrefetcher(max_workers=1)
+    for options in ({"proxy": []}, {"max_side": "big"}, {"max_side": -1}, {"max_side": True},
+                    {"pin_memory": "yes"}, {"output_dtype": "float16"}, {"cache_mode": "sometimes"}):
+        with pytest.raises(ValueError):
+            prefetcher.submit(list(IMAGES)[:1], **options)
+    assert prefetcher.status()["pending"] == 0
+
+
+def test_numeric_string_max_side_matches_node_key(decoded):
+    opts = image_prefetch.validate_options({"max_side": "1024", "proxy": None})
+    assert opts["max_side"] == 1024 and opts["proxy"] == ""
+
+
+def test_prompt_with_invalid_options_is_skipped(decoded):
+    prefetcher = ImagePrefetcher(max_workers=1)
+    urls = list(IMAGES)
+    prompt = {
+        "1": {"class_type": "ImageDownloadNode", "inputs": {"url": urls[0], "cache_mode": "sometimes"}},
+        "2": {"class_type": "ImageDownloadNode", "inputs": {"url": urls[1] + "\n" + urls[2]}},
+    }
+    assert prefetcher.submit_prompt(prompt) == 2
+    _drain(prefetcher)
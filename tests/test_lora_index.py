@@ -0,0 +1,107 @@
+import os
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def lora_dir(tmp_path):
+    root = tmp_path / "loras"
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def make_index(monkeypatch):
+    def make(*roots):
+        # ComfyUI 的 folder_paths 只在服務器內可用，這裡以 lora 目錄指向臨時目錄的替身代替
+        folder_paths = types.SimpleNamespace(get_folder_paths=lambda kind: [str(root) for root in roots])
+        monkeypatch.setitem(sys.modules, "folder_paths", folder_paths)
+        from nodes import lora_index
+        monkeypatch.setattr(lora_index, "folder_paths", folder_paths)
+        monkeypatch.setattr(lora_index, "Observer", None)
+        monkeypatch.setattr(lora_index, "STALE_CHECK_INTERVAL", 0)
+        return lora_index.LoraIndex()
+    return make
+
+
+@pytest.fixture
+def index(lora_dir, make_index):
+    return make_index(lora_dir)
+
+
+def _names(index):
+    return [entry["name"] for entry in index.refresh()]
+
+
+def test_refresh_lists_nested_files(lora_dir, index):
+    (lora_dir / "style").mkdir()
+    (lora_dir / "a.safetensors").touch()
+    (lora_dir / "style" / "b.pt").touch()
+    (lora_dir / "notes.txt").touch()
+    assert _names(index) == ["a", "style/b"]
+
+
+def test_refresh_does_not_follow_symlinked_dirs(lora_dir, index):
+    (lora_dir / "sub").mkdir()
+    (lora_dir / "a.safetensors").touch()
+    (lora_dir / "sub" / "b.safetensors").touch()
+    (lora_dir / "sub" / "c.safetensors").touch()
+    (lora_dir / "sub" / "loop").symlink_to(lora_dir, target_is_directory=True)
+    (lora_dir / "alias").symlink_to(lora_dir / "sub", target_is_directory=True)
+    assert _names(index) == ["a", "sub/b", "sub/c"]
+
+
+def test_refresh_keeps_symlinked_files(lora_dir, tmp_path, index):
+    target = tmp_path / "elsewhere.safetensors"
+    target.touch()
+    (lora_dir / "linked.safetensors").symlink_to(target)
+    assert _names(index) == ["linked"]
+
+
+def test_search_index_updates_incrementally(lora_dir, index, monkeypatch):
+    from nodes import lora_index
+    monkeypatch.setattr(lora_index, "STALE_CHECK_INTERVAL", 0)
+    (lora_dir / "anime_style.safetensors").touch()
+    index.refresh()
+    assert [entry["name"] for entry in index.search("anime")[0]] == ["anime_style"]
+    search_index = index._search_index
+
+    (lora_dir / "anime_girl.safetensors").touch()
+    (lora_dir / "anime_style.safetensors").unlink()
+    # 目錄修改時間的精度可能不足以區分兩次寫入，直接標記目錄為已變動
+    index.mark_dirty(str(lora_dir))
+    index._dirs[str(lora_dir)].mtime = -1
+    assert [entry["name"] for entry in index.search("anime")[0]] == ["anime_girl"]
+    assert index._search_index is search_index
+
+
+def test_delta_keeps_same_name_from_other_root(tmp_path, make_index):
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+    (first / "same.safetensors").touch()
+    (second / "same.safetensors").touch()
+    index = make_index(first, second)
+    token, entries = index.snapshot()
+    assert sorted(entry["root"] for entry in entries) == [0, 1]
+
+    (first / "same.safetensors").unlink()
+    index._dirs[str(first)].mtime = -1
+    _, added, removed = index.changes_since(token)
+    assert added == []
+    assert removed == [{"root": 0, "filename": "same.safetensors"}]
+    assert [entry["root"] for entry in index.entries()] == [1]
+
+
+def test_roots_are_normalized(lora_dir, make_index):
+    from nodes.lora_index import _DirtyDirHandler
+    index = make_index(str(lora_dir) + os.sep + "." + os.sep)
+    index.refresh()
+    assert index._roots == (str(lora_dir),)
+    (lora_dir / "new.safetensors").touch()
+    _DirtyDirHandler(index)._mark(str(lora_dir / "new.safetensors"), False)
+    assert str(lora_dir) in index._dirty_dirs
+    index._dirs[str(lora_dir)].mtime = -1
+    assert [entry["name"] for entry in index.entries()] == ["new"]
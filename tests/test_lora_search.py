@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from nodes.lora_search import LoraSearchIndex, fuzzy_score
+
+
+def _entries(names):
+    return [{"name": name, "filename": name + ".safetensors", "folder": ""} for name in names]
+
+
+def _random_names(rng, count):
+    syllables = [c + v for c in "bdgkmnprstz" for v in "aeiou"]
+    folders = ["", "sdxl/", "pony/", "styles/"]
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(1, 3))]
+        names.add(rng.choice(folders) + "_".join(words) + rng.choice(["", "_v2", "-xl"]))
+    return sorted(names, key=str.lower)
+
+
+QUERIES = ["", "sd", "sdxl", "pony/", "ka", "v2", "kamo", "sdxlv2", "pnyv2", "zzz", "a"]
+
+
+def _results(index, query):
+    page, total = index.search(query, limit=20)
+    return [entry["name"] for entry in page], total
+
+
+def test_ranking_tiers():
+    index = LoraSearchIndex(_entries(["style_anime", "anime", "my_anime_v2", "xanimex", "a_n_i_m_e"]))
+    names, total = _results(index, "anime")
+    assert names == ["anime", "my_anime_v2", "style_anime", "xanimex", "a_n_i_m_e"]
+    assert total == 5
+
+
+def test_empty_query_lists_all_sorted():
+    index = LoraSearchIndex(_entries(["b", "A", "c"]))
+    assert _results(index, "") == (["A", "b", "c"], 3)
+
+
+def test_incremental_updates_match_rebuild():
+    rng = random.Random(0)
+    names = _random_names(rng, 400)
+    entries = _entries(names)
+    live = entries[:300]
+    index = LoraSearchIndex(live)
+    live = list(live)
+    for _ in range(5):
+        removed = rng.sample(live, 20)
+        added = [entry for entry in entries if entry not in live][:20]
+        index.apply([("remove", entry) for entry in removed] + [("add", entry) for entry in added])
+        live = [entry for entry in live if entry not in removed] + added
+        rebuilt = LoraSearchIndex(sorted(live, key=lambda entry: entry["name"].lower()))
+        for query in QUERIES:
+            assert _results(index, query) == _results(rebuilt, query), query
+
+
+def test_remove_then_add_same_entry():
+    entries = _entries(["alpha", "beta"])
+    index = LoraSearchIndex(entries)
+    index.apply([("remove", entries[0])])
+    assert _results(index, "alpha") == ([], 0)
+    index.apply([("add", entries[0])])
+    assert _results(index, "alpha") == (["alpha"], 1)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fuzzy_scores_match_reference(seed):
+    rng = random.Random(seed)
+    names = _random_names(rng, 200)
+    index = LoraSearchIndex(_entries(names))
+    for _ in range(30):
+        name = rng.choice(names).lower()
+        positions = sorted(rng.sample(range(len(name)), min(len(name), rng.randint(2, 6))))
+        query = "".join(name[p] for p in positions)
+        for i, score in index._fuzzy_ids(query, set()).items():
+            assert score == fuzzy_score(query, index.names[i])
+
+
+def test_fuzzy_candidates_are_bounded(monkeypatch):
+    from nodes import lora_search
+    monkeypatch.setattr(lora_search, "MAX_FUZZY_CANDIDATES", 10)
+    index = LoraSearchIndex(_entries(_random_names(random.Random(1), 300)))
+    assert len(index._fuzzy_candidates("ka", set())) <= 10
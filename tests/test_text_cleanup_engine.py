@@ -0,0 +1,126 @@
+"""與原來的多遍正則實現做差異測試，基準測試見 benchmarks/bench_text_cleanup.py"""
+
+import itertools
+import random
+import re
+
+import pytest
+
+from nodes.text_cleanup_engine import cleanup, cleanup_lines, cleanup_lines_file, cleanup_many, normalize_tags
+
+
+def legacy_cleanup(text, remove_start_end_commas=True, normalize_spaces=True):
+    """原來的多遍實現，作為差異測試的基準"""
+    if not text:
+        return ""
+    cleaned = text
+    cleaned = re.sub(r',(\s*,)+', ',', cleaned)
+    cleaned = re.sub(r'\s+,', ',', cleaned)
+    cleaned = re.sub(r',\s*', ', ', cleaned)
+    if normalize_spaces:
+        cleaned = re.sub(r' +', ' ', cleaned)
+    if remove_start_end_commas:
+        cleaned = re.sub(r'^[\s,]+', '', cleaned)
+        cleaned = re.sub(r'[\s,]+$', '', cleaned)
+    return cleaned.strip()
+
+
+def legacy_cleanup_lines(text, clean_commas=True, clean_spaces=True, remove_empty_lines=False, trim_lines=True):
+    """原來的逐行實現，作為差異測試的基準"""
+    if not text:
+        return ""
+    cleaned_lines = []
+    for line in text.split('\n'):
+        if clean_commas:
+            line = re.sub(r',(\s*,)+', ',', line)
+            line = re.sub(r'\s+,', ',', line)
+            line = re.sub(r',\s*', ', ', line)
+            line = re.sub(r'^[\s,]+', '', line)
+            line = re.sub(r'[\s,]+$', '', line)
+        if clean_spaces:
+            line = re.sub(r' +', ' ', line)
+        if trim_lines:
+            line = line.strip()
+        if not remove_empty_lines or line:
+            cleaned_lines.append(line)
+    return '\n'.join(cleaned_lines)
+
+
+# 固定樣例 + 隨機組合（含製表符、換行、全角空格、不換行空格等 Unicode 空白）
+FIXED_SAMPLES = [
+    "", " ", ",", " , , ", "a,b", "a , b", "a,,b", "a, ,\t, b", "  a  b  ", "a\n,\nb", ",a,", "\t,\ta\t,\t",
+    "1girl, , solo,  long hair ,,, smile,", "a  ,  b", "a \t ,b", "a　,　b", "a\xa0\xa0b  c",
+    "a" + " " * 1000 + "b", "a" + " \t" * 500 + ",b", "a" + "\t" * 1000,
+]
+ALPHABET = ["a", "bc", " ", "  ", ",", "\t", "\n", "\r\n", "　", "\xa0", "，", "(x:1.2)"]
+
+
+def _samples(count=2000, seed=0):
+    rng = random.Random(seed)
+    return FIXED_SAMPLES + ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 24))) for _ in range(count)]
+
+
+SAMPLES = _samples()
+LINE_SAMPLES = ["\n".join(SAMPLES[i:i + 8]) for i in range(0, len(SAMPLES), 8)] + ["a\x00,b\n,c"]
+OPTIONS = list(itertools.product((True, False), (True, False)))
+LINE_OPTIONS = list(itertools.product((True, False), repeat=4))
+
+
+@pytest.mark.parametrize("remove, normalize", OPTIONS)
+def test_cleanup_matches_legacy(remove, normalize):
+    for text in SAMPLES:
+        assert cleanup(text, remove, normalize) == legacy_cleanup(text, remove, normalize), text
+
+
+@pytest.mark.parametrize("remove, normalize", OPTIONS)
+def test_cleanup_many_matches_legacy(remove, normalize):
+    expected = [legacy_cleanup(text, remove, normalize) for text in SAMPLES]
+    assert cleanup_many(SAMPLES, remove, normalize, chunk_chars=4096) == expected
+
+
+def test_cleanup_many_with_sentinel_in_text():
+    texts = ["a ,, b", "x\x00, y", " , "]
+    assert cleanup_many(texts) == [legacy_cleanup(text) for text in texts]
+
+
+@pytest.mark.parametrize("options", LINE_OPTIONS)
+def test_cleanup_lines_matches_legacy(options):
+    for text in LINE_SAMPLES:
+        assert cleanup_lines(text, *options) == legacy_cleanup_lines(text, *options), text
+
+
+@pytest.mark.parametrize("options", [(True, True, False, True), (True, True, True, True), (False, True, True, False)])
+def test_cleanup_lines_across_small_blocks(options, tmp_path):
+    """小塊大小下跨塊的切分，以及文件模式"""
+    src_path = tmp_path / "in.txt"
+    dst_path = tmp_path / "out.txt"
+    for text in LINE_SAMPLES[:100]:
+        expected = legacy_cleanup_lines(text, *options)
+        assert cleanup_lines(text, *options, block_chars=7) == expected, text
+        with open(src_path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        cleanup_lines_file(str(src_path), str(dst_path), *options, block_chars=7)
+        with open(dst_path, "r", encoding="utf-8", newline="") as f:
+            assert f.read() == expected, text
+
+
+def test_large_prompt_matches_legacy():
+    """通配符展開後的大型提示詞"""
+    rng = random.Random(1)
+    tags = ["1girl", "solo", "long hair", "looking at viewer", "smile", "(masterpiece:1.2)", "best quality"]
+    separators = [", ", ",", " , ", ",, ", ",  ,", "  ", "\n", ", \n"]
+    prompt = "".join(rng.choice(tags) + rng.choice(separators) for _ in range(5000))
+    assert cleanup(prompt) == legacy_cleanup(prompt)
+
+
+@pytest.mark.parametrize("text, mode, expected", [
+    ("masterpiece, best quality, masterpiece, (best quality:1.2)", "dedup", "masterpiece, best quality"),
+    ("masterpiece, best quality, masterpiece, (best quality:1.2)", "merge", "masterpiece, (best quality:1.2)"),
+    ("(red, blue:1.1), red, <lora:a,b:0.8>, <lora:a,b:0.8>", "dedup", "(red, blue:1.1), red, <lora:a,b:0.8>"),
+    ("((smile)), smile, [smile]", "merge", "((smile))"),
+    ("smile, [smile], ((smile))", "merge", "(smile:1.21)"),
+    ("a, BREAK, a, BREAK, b", "dedup", "a, BREAK, BREAK, b"),
+    ("\\(x\\), (x), (a) (b), (a) (b)", "dedup", "\\(x\\), (x), (a) (b)"),
+])
+def test_normalize_tags(text, mode, expected):
+    assert normalize_tags(text, mode) == expected
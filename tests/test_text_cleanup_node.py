@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from nodes import text_cleanup_node
+from nodes.text_cleanup_node import TextCleanupAdvancedNode, resolve_data_path
+
+
+@pytest.fixture
+def comfy_dirs(tmp_path, monkeypatch):
+    dirs = {"input": tmp_path / "input", "output": tmp_path / "output"}
+    for path in dirs.values():
+        path.mkdir()
+    monkeypatch.setattr(text_cleanup_node, "get_comfyui_directory", lambda kind: str(dirs[kind]))
+    return dirs
+
+
+def test_resolve_data_path_stays_inside_base(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    assert resolve_data_path("a/b.txt", str(base)) == os.path.join(str(base.resolve()), "a", "b.txt")
+    assert resolve_data_path(str(base / "c.txt"), str(base)) == str((base / "c.txt").resolve())
+
+
+@pytest.mark.parametrize("path", ["../escape.txt", "a/../../escape.txt", "/etc/passwd", "."])
+def test_resolve_data_path_rejects_escapes(tmp_path, path):
+    base = tmp_path / "base"
+    base.mkdir()
+    with pytest.raises(ValueError):
+        resolve_data_path(path, str(base))
+
+
+def test_resolve_data_path_does_not_expand_home(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    assert resolve_data_path("~/.bashrc", str(base)) == os.path.join(str(base.resolve()), "~", ".bashrc")
+
+
+def test_resolve_data_path_rejects_symlink_escape(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    (base / "link").symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        resolve_data_path("link/escape.txt", str(base))
+
+
+def test_file_mode_reads_input_and_writes_output(comfy_dirs):
+    (comfy_dirs["input"] / "tags.txt").write_text("a,,b ,\n ,c  d\n", encoding="utf-8")
+    (result,) = TextCleanupAdvancedNode().cleanup_text_advanced(input_path="tags.txt", output_path="out/tags.txt")
+    assert result == str((comfy_dirs["output"] / "out" / "tags.txt").resolve())
+    assert (comfy_dirs["output"] / "out" / "tags.txt").read_text(encoding="utf-8") == "a, b\nc d\n"
+
+
+def test_file_mode_rejects_paths_outside_comfyui(comfy_dirs, tmp_path):
+    node = TextCleanupAdvancedNode()
+    with pytest.raises(ValueError):
+        node.cleanup_text_advanced(text="a", output_path=str(tmp_path / "victim.txt"))
+    with pytest.raises(ValueError):
+        node.cleanup_text_advanced(input_path="../output/x.txt")
+    assert not (tmp_path / "victim.txt").exists()
@@ -0,0 +1,38 @@
+from nodes.text_combine_node import TextCombineBatchNode, iter_combinations
+
+
+def test_product_order():
+    combinations, total = iter_combinations([["a", "b"], ["x", "y", "z"]], "product")
+    assert total == 6
+    assert list(combinations)[:2] == [("a", "x"), ("a", "y")]
+
+
+def test_zip_broadcasts_single_items():
+    combinations, total = iter_combinations([["a", "b", "c"], ["q"], ["1", "2"]], "zip")
+    assert total == 2
+    assert list(combinations) == [("a", "q", "1"), ("b", "q", "2")]
+
+
+def test_zip_all_single_items_yields_one():
+    combinations, total = iter_combinations([["a"], ["b"]], "zip")
+    assert total == 1
+    assert list(combinations) == [("a", "b")]
+
+
+def test_zip_empty_slot_yields_nothing():
+    combinations, total = iter_combinations([["a", "b"], []], "zip")
+    assert total == 0
+    assert list(combinations) == []
+
+
+def test_batch_node_zip_single_items():
+    texts, tokens = TextCombineBatchNode().combine_texts_batch(combine_mode=["zip"], text_1=["a"], text_2=["b"])
+    assert texts == ["a\nb"]
+    assert len(tokens) == 1
+
+
+def test_batch_node_caps_outputs():
+    pools = {f"text_{i}": [str(n) for n in range(10)] for i in (1, 2, 3)}
+    texts, _ = TextCombineBatchNode().combine_texts_batch(["product"], [50], [", "], **pools)
+    assert len(texts) == 50
+    assert texts[:2] == ["0, 0, 0", "0, 0, 1"]
@@ -0,0 +1,53 @@
+import pytest
+
+from nodes import token_budget
+from nodes.text_combine_node import TextCombineNode
+
+
+class FakeTokenizer:
+    """每個以空白分隔的詞算一個 token，並記錄被分詞的文字"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text, add_special_tokens=False):
+        self.calls.append(text)
+        return {"input_ids": text.split()}
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    fake = FakeTokenizer()
+    monkeypatch.setattr(token_budget, "_load_tokenizer", lambda: fake)
+    token_budget.count_tokens.cache_clear()
+    token_budget.estimate_tokens.cache_clear()
+    yield fake
+    token_budget.count_tokens.cache_clear()
+    token_budget.estimate_tokens.cache_clear()
+
+
+def test_count_joined_sums_fragments(tokenizer):
+    assert token_budget.count_joined(["a b", "c"], " , ") == 4
+    assert token_budget.count_joined(["a b", "c"], "\n") == 3
+    assert token_budget.count_joined([], ", ") == 0
+    assert sorted(tokenizer.calls) == [" , ", "a b", "c"]
+
+
+def test_budget_off_skips_tokenizer(tokenizer):
+    combined, tokens = TextCombineNode().combine_texts(separator=", ", text_1="masterpiece", text_2="1girl, solo")
+    assert combined == "masterpiece, 1girl, solo"
+    assert tokens == token_budget.approximate_tokens(combined)
+    assert tokenizer.calls == []
+
+
+def test_budget_on_counts_fragments_only(tokenizer):
+    _, tokens = TextCombineNode().combine_texts(separator="\n", budget_mode="drop", text_1="a b", text_2="c d e")
+    assert tokens == 5
+    assert "a b\nc d e" not in tokenizer.calls
+
+
+def test_fragment_counts_are_cached(tokenizer):
+    node = TextCombineNode()
+    for tail in ("x", "y", "z"):
+        node.combine_texts(budget_mode="truncate", text_1="shared prefix", text_2=tail)
+    assert tokenizer.calls.count("shared prefix") == 1
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from nodes.trigger_word_store import TriggerWordStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "words.json"
+    path.write_text(json.dumps({"a": "old a", "b": "old b"}), encoding="utf-8")
+    return path
+
+
+def _edit_externally(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    # 確保修改時間與之前不同
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_journal_survives_restart(path):
+    store = TriggerWordStore(str(path))
+    assert store.set("a", "new a")
+    assert store.set("b", "")
+    assert TriggerWordStore(str(path)).get_all() == {"a": "new a"}
+
+
+def test_external_edit_wins_over_journal(path):
+    store = TriggerWordStore(str(path))
+    store.set("a", "journaled a")
+    _edit_externally(path, {"a": "edited a", "c": "edited c"})
+
+    assert store.get_all() == {"a": "edited a", "c": "edited c"}
+    assert os.path.getsize(store.journal_path) == 0
+    # 重啟後不會重放舊日誌
+    assert TriggerWordStore(str(path)).get_all() == {"a": "edited a", "c": "edited c"}
+
+
+def test_edits_after_external_change_are_kept(path):
+    store = TriggerWordStore(str(path))
+    store.set("a", "journaled a")
+    _edit_externally(path, {"a": "edited a"})
+    assert store.set("b", "new b")
+    assert TriggerWordStore(str(path)).get_all() == {"a": "edited a", "b": "new b"}
+
+
+def test_external_edit_is_reported_as_change(path):
+    store = TriggerWordStore(str(path))
+    token, _ = store.snapshot()
+    _edit_externally(path, {"a": "edited a"})
+    _, updated, removed = store.changes_since(token)
+    assert updated == {"a": "edited a"}
+    assert removed == ["b"]
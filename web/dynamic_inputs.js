@@ -2,9 +2,12 @@ import { app } from "../../scripts/app.js";
 
 console.log("[Little Utility] 動態輸入擴展已加載");
 
-// 清理 TextCombineNode 多餘的空插槽
+// 使用動態 text_N 插槽的節點
+const DYNAMIC_NODES = ["TextCombineNode", "TextCombineBatchNode"];
+
+// 清理 TextCombine 節點多餘的空插槽
 function cleanupEmptySlots(node) {
-    if (node.type !== "TextCombineNode") return;
+    if (!DYNAMIC_NODES.includes(node.type)) return;
     
     const prefix = "text_";
     const dynamicInputs = node.inputs.filter(i => i.name.startsWith(prefix));
@@ -43,7 +46,7 @@ app.registerExtension({
     name: "Comfy.LittleUtility.DynamicInputs",
     
     async beforeRegisterNodeDef(nodeType, nodeData) {
-        if (nodeData.name === "TextCombineNode") {
+        if (DYNAMIC_NODES.includes(nodeData.name)) {
             
             // 節點創建時的處理（包括加載工作流時）
             const onNodeCreated = nodeType.prototype.onNodeCreated;
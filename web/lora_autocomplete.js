@@ -6,10 +6,31 @@ console.log("[Little Utility] Lora 自動補全擴展已加載");
 // 緩存 Lora 列表
 let loraCache = null;
 let loraCacheTime = 0;
+let loraVersion = null;
 const CACHE_DURATION = 5000; // 縮短緩存至 5 秒，確保及時更新
 
 // 觸發詞緩存
 let triggerWordsCache = null;
+let triggerWordsVersion = null;
+
+/**
+ * 還原緊湊列式格式的 Lora 列表
+ */
+function decodeCompactLoras(data) {
+  return data.names.map((base, i) => {
+    const folder = data.folders[data.folder_idx[i]];
+    const name = folder ? `${folder}/${base}` : base;
+    const root = data.root_idx ? data.root_idx[i] : 0;
+    return { name, filename: name + data.exts[data.ext_idx[i]], folder, root };
+  });
+}
+
+/**
+ * 增量合併用的識別鍵：多個 lora 根目錄下可能有相同的相對路徑
+ */
+function loraKey(lora) {
+  return `${lora.root ?? 0}:${lora.filename}`;
+}
 
 /**
  * 獲取 Lora 列表（帶緩存）
@@ -21,9 +42,28 @@ async function fetchLoraList() {
   }
 
   try {
-    const response = await api.fetchApi("/little-utility/loras");
+    // 已有緩存時只請求增量變動
+    const url = loraCache && loraVersion
+      ? `/little-utility/loras?since=${encodeURIComponent(loraVersion)}`
+      : "/little-utility/loras?format=compact";
+    const response = await api.fetchApi(url);
     const data = await response.json();
-    loraCache = data.loras || [];
+    if (data.delta) {
+      const changed = new Set([...data.removed, ...data.added].map(loraKey));
+      loraCache = loraCache
+        .filter((lora) => !changed.has(loraKey(lora)))
+        .concat(data.added);
+      loraCache.sort((a, b) => {
+        const x = a.name.toLowerCase();
+        const y = b.name.toLowerCase();
+        return x < y ? -1 : x > y ? 1 : 0;
+      });
+    } else if (data.format === "compact") {
+      loraCache = decodeCompactLoras(data);
+    } else {
+      loraCache = data.loras || [];
+    }
+    loraVersion = data.version || null;
     loraCacheTime = now;
     console.log(`[Little Utility] 已加載 ${loraCache.length} 個 Lora`);
     return loraCache;
@@ -33,14 +73,39 @@ async function fetchLoraList() {
   }
 }
 
+/**
+ * 服務端排序搜索 Lora（只返回一頁結果）
+ */
+async function searchLoras(query, limit = 30) {
+  try {
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    const response = await api.fetchApi(`/little-utility/loras/search?${params}`);
+    const data = await response.json();
+    return data.loras || [];
+  } catch (error) {
+    console.error("[Little Utility] 搜索 Lora 失敗:", error);
+    return [];
+  }
+}
+
 /**
  * 獲取觸發詞配置
  */
 async function fetchTriggerWords() {
   try {
-    const response = await api.fetchApi("/little-utility/trigger-words");
+    // 已有緩存時只請求增量變動
+    const url = triggerWordsCache && triggerWordsVersion
+      ? `/little-utility/trigger-words?since=${encodeURIComponent(triggerWordsVersion)}`
+      : "/little-utility/trigger-words";
+    const response = await api.fetchApi(url);
     const data = await response.json();
-    triggerWordsCache = data.trigger_words || {};
+    if (data.delta) {
+      triggerWordsCache = { ...triggerWordsCache, ...data.updated };
+      data.removed.forEach((name) => delete triggerWordsCache[name]);
+    } else {
+      triggerWordsCache = data.trigger_words || {};
+    }
+    triggerWordsVersion = data.version || null;
     return triggerWordsCache;
   } catch (error) {
     console.error("[Little Utility] 獲取觸發詞失敗:", error);
@@ -390,7 +455,7 @@ function hideDropdown() {
   activeInput = null;
 }
 
-function showDropdown(inputElement, loras, query, onSelect, triggerWords) {
+function showDropdown(inputElement, loras, query, onSelect, triggerWords, ranked = false) {
   const dropdown = getDropdown();
   dropdown.innerHTML = "";
   activeInput = inputElement;
@@ -399,9 +464,9 @@ function showDropdown(inputElement, loras, query, onSelect, triggerWords) {
   const parts = query.split(",");
   const lastPart = parts[parts.length - 1].trim().toLowerCase();
 
-  // 過濾匹配項
+  // 過濾匹配項（服務端已排序的結果不再本地過濾）
   let filtered = loras;
-  if (lastPart) {
+  if (lastPart && !ranked) {
     filtered = loras.filter((lora) =>
       lora.name.toLowerCase().includes(lastPart),
     );
@@ -772,18 +837,33 @@ app.registerExtension({
             node.setDirtyCanvas(true, true);
           };
 
-          inputEl.addEventListener("input", () => {
+          // 只顯示最新一次輸入的搜索結果
+          let searchSeq = 0;
+          inputEl.addEventListener("input", async () => {
             const query = inputEl.value;
-            // 直接傳遞 null 作為 triggerWords 參數，讓 showDropdown 使用全局緩存
-            showDropdown(inputEl, loras, query, onSelect, null);
+            const parts = query.split(",");
+            const lastPart = parts[parts.length - 1].trim();
+            if (!lastPart) {
+              // 作廢仍在進行中的搜索，避免其結果覆蓋當前下拉列表
+              ++searchSeq;
+              // 直接傳遞 null 作為 triggerWords 參數，讓 showDropdown 使用全局緩存
+              showDropdown(inputEl, loras, query, onSelect, null);
+              return;
+            }
+            const seq = ++searchSeq;
+            const results = await searchLoras(lastPart);
+            if (seq !== searchSeq) return;
+            showDropdown(inputEl, results, query, onSelect, null, true);
           });
 
           inputEl.addEventListener("focus", async () => {
+            const seq = ++searchSeq;
             loras = await fetchLoraList();
             // 確保緩存存在
             if (!triggerWordsCache) {
               await fetchTriggerWords();
             }
+            if (seq !== searchSeq) return;
             const query = inputEl.value;
             showDropdown(inputEl, loras, query, onSelect, null);
           });